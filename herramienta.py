@@ -1,18 +1,26 @@
 # ---------------------------------------------------IMPORTS------------------------------------------------------#
 # python -m streamlit run tu_archivo.py
 # streamlit run herramienta.py
-import calendar
+# La lógica de cálculo y las figuras viven en el paquete mmm (sin Streamlit); aquí solo
+# quedan los widgets. Los módulos de cada página se importan al entrar en ella.
+import os
+import functools
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
 import numpy as np
-import seaborn as sns
-import plotly.figure_factory as ff
 from streamlit_option_menu import option_menu
-from plotly.subplots import make_subplots
 from datetime import datetime
+from mmm import figures
+from mmm.ingest import dataset_lineage, latest_source, load_dataset, read_cube, read_only
+from mmm.columns import CANALES, VENTAS
+from mmm.schema import PAGE_COLUMNS
+from mmm.model import latest_model
+from mmm.timeindex import build_time_index
+from mmm.profiling import Profiler
+from mmm.jobs import PENDIENTES, JobQueue, job_key
+from mmm.partitions import (brands, combined_cube, combined_rows, discover, regions, select,
+                            selection_version)
+from mmm.aggregates import build_cube, period_change, year_totals, yearly_totals, years
 
 # ------------------------------------------Título de la página------------------------------------------------------#
 # Configuración de la página
@@ -37,16 +45,175 @@ st.markdown("<h1 class='title'>MARKETING MIX MODELING</h1>",
 st.sidebar.image(
     'https://mms.businesswire.com/media/20231031341381/en/1930065/22/GlobalLogo_NTTDATA_FutureBlue_RGB.jpg', use_column_width=True)
 
-# Load the dataset
+# Perfilado opcional de cada rerun (también se activa con MMM_PROFILE=1): tiempos por
+# sección, aciertos de caché y memoria, en el panel lateral y en .mmm_cache/profile.jsonl
+profiling = st.sidebar.checkbox('Profile reruns', value=os.environ.get('MMM_PROFILE') == '1')
+prof = Profiler(enabled=profiling)
 
+# Load the dataset
 
-@st.cache_data
-def load_data():
-    data = pd.read_excel('bbdd_mmm_20240111.xlsx')
-    return data
+
+# Último extracto bbdd_mmm_AAAAMMDD.xlsx; la fecha de modificación invalida la caché si se sobrescribe
+source = latest_source()
+
+
+# Un único DataFrame de solo lectura por proceso, compartido por todas las sesiones
+# (cache_resource no lo copia en cada rerun como cache_data). Con copy-on-write, lo que
+# cada página derive de él se copia solo si se modifica.
+pd.set_option('mode.copy_on_write', True)
+
+
+def profiled_cache(name):
+    # st.cache_resource con aciertos y fallos contados en el panel de perfilado: el cuerpo
+    # de la función cacheada solo se ejecuta cuando falla la caché
+    def decorar(fn):
+        @functools.wraps(fn)
+        def calcular(*args, **kwargs):
+            prof.add(f'{name}_misses')
+            return fn(*args, **kwargs)
+
+        cacheada = st.cache_resource(calcular)
+
+        @functools.wraps(fn)
+        def consultar(*args, **kwargs):
+            fallos = prof.counters.get(f'{name}_misses', 0)
+            resultado = cacheada(*args, **kwargs)
+            if prof.counters.get(f'{name}_misses', 0) == fallos:
+                prof.add(f'{name}_hits')
+            return resultado
+        return consultar
+    return decorar
+
+
+@profiled_cache('load_data')
+def load_data(source, mtime, columns=None):
+    # Lee el almacén columnar (.arrow); solo se parsea el Excel si ha cambiado, y si el
+    # extracto nuevo únicamente añade semanas se ingieren solo esas filas. Cada página lee
+    # solo sus columnas (schema.PAGE_COLUMNS), ya tipadas en la ingesta
+    return load_dataset(source, columns=list(columns) if columns is not None else None)
+
+
+# El cubo año × mes se mantiene en el almacén de forma incremental
+@profiled_cache('load_cube')
+def load_cube(version):
+    cube = read_cube(source)
+    if cube is None:
+        # Sin almacén columnar: se agrega a partir de todas las columnas
+        cube = read_only(build_cube(load_data(source, os.path.getmtime(source))[0]))
+    return cube
+
+
+def current_model():
+    # Modelo de la sesión o el último guardado; si es de una versión anterior del
+    # dataset se devuelve marcado como stale (no se reajusta automáticamente)
+    model = st.session_state.get('model')
+    if model is None or model.data_version != version:
+        prof.add('model_misses')
+        model = latest_model(version, lineage=lineage)
+    else:
+        prof.add('model_hits')
+    if model is not None and model.stale:
+        st.warning('The model was fitted on an earlier version of the data. '
+                   'Refit it on the Model page to include the latest weeks.')
+    return model
+
+
+# Posiciones de cada año/mes en los datos ordenados por fecha (rangos por búsqueda binaria)
+@profiled_cache('load_time_index')
+def load_time_index(version, _data):
+    return build_time_index(_data)
+
+
+# Variación interanual de todos los canales y años (se calcula una vez por versión)
+@profiled_cache('load_yoy')
+def load_yoy(version, _cube):
+    return read_only(period_change(yearly_totals(_cube, CANALES)))
+
+
+# Figuras del Business compartidas por todas las sesiones (ver figures.FigureCache)
+@st.cache_resource
+def figure_cache():
+    return figures.FigureCache()
+
+
+# Trabajos en segundo plano compartidos por todas las sesiones (ver mmm.jobs): una petición
+# idéntica de otra sesión reutiliza el mismo cálculo
+@st.cache_resource
+def job_queue():
+    return JobQueue()
+
+
+@st.fragment(run_every=1.0)
+def watch_job(key, label, draw_partial=None):
+    # Progreso de un trabajo sin bloquear la página; al terminar se vuelve a ejecutar la app
+    estado = jobs.status(key)
+    if estado is None or estado['state'] not in PENDIENTES:
+        # Terminado o podado del disco: la página decide qué mostrar (ver session_job)
+        st.rerun()
+    if draw_partial is not None:
+        parcial = jobs.partial(key)
+        if parcial is not None:
+            draw_partial(parcial)
+    texto = label if estado['state'] == 'running' else f'{label} (queued)'
+    st.progress(estado['progress'], text=texto)
+    if st.button('Cancel', key=f'cancel_{key}'):
+        jobs.cancel(key)
+
+
+def session_job(name):
+    # Trabajo guardado en la sesión y su estado. Si JobQueue lo ha podado del disco se olvida
+    # y la página vuelve a mostrarse como sin calcular
+    key = st.session_state.get(name)
+    estado = None if key is None else jobs.status(key)
+    if estado is None:
+        st.session_state.pop(name, None)
+        return None, None
+    return key, estado
+
+
+# Respuesta y ROI marginal tabulados por modelo y calendario de inversión: los sliders se
+# responden interpolando (la tabla se guarda junto al modelo, ver optimizer.CurveTable)
+@profiled_cache('load_response_table')
+def load_response_table(version, model_key, weeks, _model, _media):
+    from mmm.optimizer import load_curve_table
+    return load_curve_table(_model, _media, weeks)
+
+
+# Almacén particionado por marca/región/año (ver mmm.partitions): el cubo de la selección
+# es la suma de los cubos de cada partición y las filas se leen solo donde hacen falta
+@profiled_cache('load_partition_cube')
+def load_partition_cube(version, _selection):
+    return combined_cube(_selection)
+
+
+@profiled_cache('load_partition_rows')
+def load_partition_rows(version, _selection, columns=None):
+    filas = combined_rows(_selection, columns=list(columns) if columns is not None else None)
+    return filas, build_time_index(filas)
+
+
+def rows_between(start, end):
+    # Filas entre dos fechas; en el almacén particionado solo se leen los años del rango
+    if not partitions:
+        return data.iloc[time_index.date_slice(start, end)]
+    # Un rango sin años en el almacén devuelve un tramo vacío de cualquier partición
+    tramo = [p for p in selection if start.year <= p.year <= end.year] or selection[:1]
+    filas, indice = load_partition_rows(selection_version(tramo), tramo, columns)
+    return filas.iloc[indice.date_slice(start, end)]
+
+
+def date_bounds():
+    if not partitions:
+        return pd.Timestamp(time_index.fechas[0]), pd.Timestamp(time_index.fechas[-1])
+    extremos = []
+    for year in (min(p.year for p in selection), max(p.year for p in selection)):
+        tramo = [p for p in selection if p.year == year]
+        _, indice = load_partition_rows(selection_version(tramo), tramo, columns)
+        extremos.append(indice.fechas)
+    return pd.Timestamp(extremos[0][0]), pd.Timestamp(extremos[1][-1])
 
 
-data = load_data()
+partitions = discover()
 
 # ------------------------ ---------------------------PÁGINA STREAMLIT------------------------------------------------------#
 
@@ -61,6 +228,36 @@ with st.sidebar:
         orientation="vertical",
     )
 
+    if partitions:
+        marcas = brands(partitions)
+        selected_brands = st.multiselect('Brands', marcas, default=marcas[:1])
+        opciones_region = regions(partitions, selected_brands)
+        selected_regions = st.multiselect('Regions', opciones_region, default=opciones_region[:1])
+
+columns = tuple(PAGE_COLUMNS[menu])
+with prof.span('load'):
+    if partitions:
+        selection = select(partitions, selected_brands, selected_regions)
+        if not selection:
+            st.info('Select at least one brand and one region.')
+            st.stop()
+        version = selection_version(selection)
+        cube = load_partition_cube(version, selection)
+        lineage = []
+        # La página Business solo necesita el cubo (y las filas del rango de fechas)
+        if menu == "Business":
+            data = time_index = None
+        else:
+            data, time_index = load_partition_rows(version, selection, columns)
+    else:
+        data, version = load_data(source, os.path.getmtime(source), columns)
+        cube = load_cube(version)
+        time_index = load_time_index(version, data)
+        lineage = dataset_lineage(source)
+    figs = figure_cache()
+    jobs = job_queue()
+figs_antes = figs.stats()
+
 st.markdown("<hr>", unsafe_allow_html=True)  # Insert horizontal line
 
 # Conditional for the opcion "Negocio"
@@ -71,26 +268,22 @@ if menu == "Business":
     # Ajusta el número de columnas según sea necesario
     col1, col2, col4 = st.columns([1, 2, 2])
 
-    with col1:
+    with col1, prof.span('kpis'):
         # Encuentra el último año en tus datos
-        ultimo_año = data['fecha'].dt.year.max()
+        ultimo_año = years(cube).max()
         año_anterior = ultimo_año - 1
 
         # Calcula la inversión total y las ventas para el último año y el año anterior
-        columnas_inversion = [
-            'publicidad_inversion_tv_comercial_pre_covid',
-            'publicidad_inversion_tv_comercial_post_covid',
-            'publicidad_inversion_exterior_comercial',
-            'publicidad_inversion_radio_comercial',
-            'publicidad_inversion_prensa_comercial',
-            'publicidad_inversion_brandformance_total',
-            'publicidad_inversion_agencias_on_comercial_total',
-        ]
+        columnas_inversion = CANALES
+        # Totales del cubo para el último año y el año anterior (inversión por canal y ventas)
+        totales_ultimo_año = year_totals(
+            cube, ultimo_año, columnas_inversion + [VENTAS])
+        totales_año_anterior = year_totals(
+            cube, año_anterior, columnas_inversion + [VENTAS])
+
         # Total de inversiones para el último año y el año anterior
-        inversion_ultimo_año = data.loc[data['fecha'].dt.year ==
-                                        ultimo_año, columnas_inversion].sum().sum()
-        inversion_año_anterior = data.loc[data['fecha'].dt.year ==
-                                          año_anterior, columnas_inversion].sum().sum()
+        inversion_ultimo_año = totales_ultimo_año[columnas_inversion].sum()
+        inversion_año_anterior = totales_año_anterior[columnas_inversion].sum()
 
     # Calcula la diferencia en inversión y ventas
         diferencia_inversion = inversion_ultimo_año - inversion_año_anterior
@@ -106,10 +299,8 @@ if menu == "Business":
         st.write("Inversión por canal respecto al año anterior")
 
         # Total de inversiones para el último año y el año anterior por canal
-        inversiones_ultimo_año = data.loc[data['fecha'].dt.year ==
-                                          ultimo_año, columnas_inversion].sum()
-        inversiones_año_anterior = data.loc[data['fecha'].dt.year ==
-                                            año_anterior, columnas_inversion].sum()
+        inversiones_ultimo_año = totales_ultimo_año[columnas_inversion]
+        inversiones_año_anterior = totales_año_anterior[columnas_inversion]
 
         diferencias_inversion = inversiones_ultimo_año - inversiones_año_anterior
 
@@ -123,10 +314,8 @@ if menu == "Business":
             )
 
         # Total de ventas para el último año y el año anterior
-        ventas_ultimo_año = data.loc[data['fecha'].dt.year ==
-                                     ultimo_año, 'negocio_ventas_presencial'].sum()
-        ventas_año_anterior = data.loc[data['fecha'].dt.year ==
-                                       año_anterior, 'negocio_ventas_presencial'].sum()
+        ventas_ultimo_año = totales_ultimo_año[VENTAS]
+        ventas_año_anterior = totales_año_anterior[VENTAS]
 
         # Calcula la diferencia en ventas
         diferencia_ventas = ventas_ultimo_año - ventas_año_anterior
@@ -141,430 +330,477 @@ if menu == "Business":
     # col2, col3 = st.columns([2, 2])
 
     with col2:
-      # Opción para alternar en Streamlit
-        option_investment = st.selectbox(
-            'Choose the investment view:',
-            ('Total investment', 'Investment by channels')
-        )
-
-        # Lógica condicional para crear y mostrar los gráficos basados en la opción seleccionada
-        if option_investment == 'Total investment':
-            # Group by year and sum the investments
-            investment_by_year = data.set_index('fecha')[[
-                'publicidad_inversion_tv_comercial_pre_covid', 'publicidad_inversion_tv_comercial_post_covid',
-                'publicidad_inversion_exterior_comercial', 'publicidad_inversion_radio_comercial',
-                'publicidad_inversion_prensa_comercial', 'publicidad_inversion_brandformance_total',
-                'publicidad_inversion_agencias_on_comercial_total',]].resample('Y').sum()  # 'Y' es para agrupar por año
-
-        # Total investment per year rounded to two decimals
-            investment_by_year['total_investment'] = investment_by_year.sum(
-                axis=1)
-            investment_by_year = investment_by_year.round(2)
-
-        # Create a bar chart with Plotly
-            fig_investment_per_year = go.Figure()
-            fig_investment_per_year.add_trace(go.Bar(
-                x=investment_by_year.index.year,  # Extrae el año de la fecha
-                y=investment_by_year['total_investment'],
-                text=investment_by_year['total_investment'],
-                textposition='auto',  # Establece el color de las barras
-            ))
-
-        # Style the chart
-            fig_investment_per_year.update_layout(
-                title='Investment over years',
-                xaxis_title='Year',
-                yaxis_title='Total Investment',
-                # Logarithmic scale for large ranges of values
-                yaxis=dict(type='log'),
-                plot_bgcolor='white',  # Colors of plot background
-                title_x=0.5  # Center the chart title
-            )
-            # Show the investment chart
-            st.plotly_chart(fig_investment_per_year)
-
-        elif option_investment == 'Investment by channels':
-            # Group by year and sum the investments by channels
-            investment_by_year_and_channel = data.set_index(
-                'fecha').resample('Y').sum()
-
-            # Crear un gráfico de barras apiladas con Plotly
-            fig_investment_by_channels = go.Figure()
-
-            # Lista de medios para el desglose
-            channels = [
-                'publicidad_inversion_tv_comercial_pre_covid', 'publicidad_inversion_tv_comercial_post_covid',
-                'publicidad_inversion_exterior_comercial', 'publicidad_inversion_radio_comercial',
-                'publicidad_inversion_prensa_comercial', 'publicidad_inversion_brandformance_total',
-                'publicidad_inversion_agencias_on_comercial_total',]
-
-            colors_channels = [
-                # azul marino;
-                "#1f77b4",  # azul moderado
-                "#84c9ff",  # naranja
-                "#2cb49c",  # verde
-                "#fab5b6",  # rosa
-                "#fb3131",  # rojo
-                "#7f7f7f",  # gris
-                "#17becf",  # azul claro
-
-
-            ]
-            # Añadir cada medio como una barra apilada
-            for i, medio in enumerate(channels):
-                fig_investment_by_channels.add_trace(go.Bar(
-                    x=investment_by_year_and_channel.index.year,
-                    y=investment_by_year_and_channel[medio],
-                    name=medio,
-                    # Establece el color correspondiente
-                    marker_color=colors_channels[i]
-                ))
-
-            # Estilizar el gráfico
-            fig_investment_by_channels.update_layout(
-                barmode='stack',  # Modo apilado para las barras
-                title='Investment by Medium Over Years',
-                xaxis_title='Year',
-                yaxis_title='Investment by Medium',
-                plot_bgcolor='white',
-                title_x=0.5  # Centrar el título del gráfico
+        with prof.span('investment'):
+            # Opción para alternar en Streamlit
+            option_investment = st.selectbox(
+                'Choose the investment view:',
+                ('Total investment', 'Investment by channels')
             )
 
-            # Show the investment by channels chart
-            st.plotly_chart(fig_investment_by_channels)
+            # Gráfico de inversión total por año o desglosada por canales
+            if option_investment == 'Total investment':
+                st.plotly_chart(figs.get(version, 'investment_per_year', (),
+                                         figures.investment_per_year, cube))
+            elif option_investment == 'Investment by channels':
+                st.plotly_chart(figs.get(version, 'investment_by_channels', (),
+                                         figures.investment_by_channels, cube))
 
         # ---------------------OMIE----------------------------------#
 
-        # Obtén una lista de los años únicos presentes en tus datos
-        unique_years = sorted(data['fecha'].dt.year.unique(), reverse=True)
-
-        # Crea una lista para guardar las selecciones de años
-        selected_years = []
-
-        selected_years = st.multiselect(
-            'Select years to compare:', unique_years, default=unique_years[1:])
-
-        # Crea la figura de Plotly para el gráfico de líneas
-        fig_omie_month_years = go.Figure()
-
-        # Para cada año seleccionado, filtra los datos, agrupa por mes, calcula la media del precio OMIE y añade una traza al gráfico
-        for year in selected_years:
-            filtered_data = data[data['fecha'].dt.year == year]
-            monthly_prices = filtered_data.groupby(filtered_data['fecha'].dt.month)[
-                'precio_omie'].mean()
-
-            fig_omie_month_years.add_trace(go.Scatter(
-                x=monthly_prices.index,  # El índice después de agrupar será el mes
-                y=monthly_prices.values,
-                mode='lines+markers',  # Líneas con marcadores
-                name=f'Precio OMIE {year}'
-            ))
-
-        # Actualiza la disposición del gráfico
-        fig_omie_month_years.update_layout(
-            title='Valoration of OMIE price per years',
-            xaxis_title='Mes',
-            yaxis_title='Precio OMIE (€/MWh)',
-            xaxis=dict(tickmode='array', tickvals=list(range(1, 13)),
-                       ticktext=list(calendar.month_abbr[1:])),
-            yaxis=dict(tickformat=".2f"),
-            hovermode='x',  # Muestra el tooltip basado en el eje x
-            title_x=0.5  # Centrar el título del gráfico
-        )
+        with prof.span('omie'):
+            # Obtén una lista de los años únicos presentes en tus datos
+            unique_years = sorted(years(cube), reverse=True)
 
-        # Muestra el gráfico en Streamlit
-        st.plotly_chart(fig_omie_month_years)
+            selected_years = st.multiselect(
+                'Select years to compare:', unique_years, default=unique_years[1:])
 
-    with col4:
-        # Asegúrate de que 'fecha' sea tipo datetime
-        data['fecha'] = pd.to_datetime(data['fecha'])
+            # Media mensual del precio OMIE por año seleccionado
+            st.plotly_chart(figs.get(version, 'omie_month_years', selected_years,
+                                     figures.omie_month_years, cube, selected_years))
 
+    with col4, prof.span('sales'):
         # Obtén una lista de los años únicos presentes en tus datos
-        unique_years = sorted(data['fecha'].dt.year.unique(), reverse=True)
+        unique_years = sorted(years(cube), reverse=True)
 
         # Crea un multiselect para que el usuario pueda seleccionar varios años
         selected_years = st.multiselect(
             'Select years to display:', unique_years, default=unique_years[:2])
 
-        # Crea la figura de Plotly para el gráfico de barras
-        fig_sales_month_years = go.Figure()
-
-        # Para cada año seleccionado, filtra los datos, agrupa por mes y suma las ventas
-        for year in selected_years:
-            # Filtra los datos para el año seleccionado
-            filtered_data = data[data['fecha'].dt.year == year]
-
-            # Agrupa los datos por mes y suma las ventas
-            monthly_sales = filtered_data.groupby(filtered_data['fecha'].dt.month)[
-                'negocio_ventas_presencial'].sum()
-
-            # Añade la traza para el gráfico de barras de las ventas mensuales
-            fig_sales_month_years.add_trace(go.Bar(
-                # Nombres abreviados de los meses
-                x=[calendar.month_abbr[month]
-                    for month in monthly_sales.index],
-                y=monthly_sales.values,
-                name=f'Sales {year}'
-            ))
-
-        # Actualiza la disposición del gráfico
-        fig_sales_month_years.update_layout(
-            title='Monthly sales by selected years',
-            xaxis_title='Month',
-            yaxis_title='Total Sales',
-            barmode='group',  # Agrupa las barras en lugar de apilarlas
-            yaxis=dict(tickformat=".2f"),
-            title_x=0.5  # Centrar el título del gráfico
-        )
-
-        # Muestra el gráfico en Streamlit
-        st.plotly_chart(fig_sales_month_years)
+        # Ventas mensuales de los años seleccionados
+        st.plotly_chart(figs.get(version, 'sales_month_years', selected_years,
+                                 figures.sales_month_years, cube, selected_years))
 
         # ---------------------TOTAL-SALES----------------------------------#
-        # Agrupar los datos por año y sumar las ventas (solo negoio_ventas_presencial)
-        sales_by_year = data.set_index('fecha')[['negocio_ventas_presencial']].resample(
-            'Y').sum()  # 'Y' es para agrupar por año
-
-        # Calcular el total de ventas por año redondeando a dos decimales
-        sales_by_year['total_sales'] = sales_by_year.sum(axis=1)
-        sales_by_year = sales_by_year.round(2)
-
-        # Crear un gráfico de barras con Plotly
-        fig_sales_per_year = go.Figure()
-        fig_sales_per_year.add_trace(go.Bar(
-            x=sales_by_year.index.year,  # Extrae el año de la fecha
-            y=sales_by_year['total_sales'],
-            text=sales_by_year['total_sales'],
-            textposition='auto',  # Establece el color de las barras
-        ))
-
-        # Estilizar el gráfico
-        fig_sales_per_year.update_layout(
-            title='Sales over years',
-            xaxis_title='Year',
-            yaxis_title='Total Sales',
-            # Escala logarítmica para grandes rangos de valores
-            yaxis=dict(type='log'),
-            plot_bgcolor='white',  # Color de fondo del gráfico
-            title_x=0.5  # Centrar el título del gráfico
-        )
-        # Mostrar el gráfico en StreamliT DE SALES
-        st.plotly_chart(fig_sales_per_year)
+        st.plotly_chart(figs.get(version, 'sales_per_year', (), figures.sales_per_year, cube))
 
     # ----------------------INVESTMENTS-TIME-MONTH---------------------------------#
-    # Selector de fechas para filtrar datos
-    start_date, end_date = st.date_input(
-        'Select date range', [data['fecha'].min(), data['fecha'].max()])
-    start_date = datetime(start_date.year, start_date.month, start_date.day)
-    end_date = datetime(end_date.year, end_date.month, end_date.day)
-
-    # Filtrar datos por rango de fechas
-    filtered_data = data[(data['fecha'] >= start_date)
-                        & (data['fecha'] <= end_date)]
-
-    # Multiselect para elegir las inversiones a mostrar
-    selected_investments = st.multiselect('Select investment channels:',
-                                        ['publicidad_inversion_tv_comercial_pre_covid',
-                                        'publicidad_inversion_tv_comercial_post_covid',
-                                        'publicidad_inversion_exterior_comercial',
-                                        'publicidad_inversion_radio_comercial',
-                                        'publicidad_inversion_prensa_comercial',
-                                        'publicidad_inversion_brandformance_total',
-                                        'publicidad_inversion_agencias_on_comercial_total'],
-                                        default=['publicidad_inversion_tv_comercial_pre_covid',
-                                                'publicidad_inversion_tv_comercial_post_covid',
-                                                'publicidad_inversion_exterior_comercial',
-                                                'publicidad_inversion_radio_comercial',
-                                                'publicidad_inversion_prensa_comercial',
-                                                'publicidad_inversion_brandformance_total',
-                                                'publicidad_inversion_agencias_on_comercial_total'
-                                                ])
-
-    # Inicializar la figura de Plotly
-    fig_investment_channels_date = make_subplots(
-        specs=[[{"secondary_y": True}]])
-
-    # Añadir trazas para cada tipo de inversión seleccionado
-    for investment in selected_investments:
-        # Agregar traza de línea para la inversión total por fecha
-        fig_investment_channels_date.add_trace(go.Scatter(x=filtered_data['fecha'],
-                                                        y=filtered_data[investment],
-                                                        name=investment,
-                                                        mode='lines',
-                                                        stackgroup='one'),  # se usa para crear el área sombreada
-                                            secondary_y=False)
-
-    # Actualizar los layouts del gráfico
-    fig_investment_channels_date.update_layout(title='Investment by channels over time',
-                                            xaxis_title='Fecha',
-                                            yaxis_title='Inversión Total',
-                                            hovermode='x unified',
-                                            title_x=0.5)
-
-    # Mostrar gráfico
-    st.plotly_chart(fig_investment_channels_date, use_container_width=True)
+    with prof.span('area'):
+        # Selector de fechas para filtrar datos
+        start_date, end_date = st.date_input('Select date range', list(date_bounds()))
+        start_date = datetime(start_date.year, start_date.month, start_date.day)
+        end_date = datetime(end_date.year, end_date.month, end_date.day)
+
+        # Filtrar datos por rango de fechas: tramo contiguo de las filas ordenadas
+        filtered_data = rows_between(start_date, end_date)
+
+        # Multiselect para elegir las inversiones a mostrar
+        selected_investments = st.multiselect('Select investment channels:', CANALES, default=CANALES)
+
+        # Inversión por canal a lo largo del tiempo (áreas apiladas)
+        st.plotly_chart(figs.get(version, 'investment_channels_date',
+                                 (start_date, end_date, selected_investments),
+                                 figures.investment_channels_date, filtered_data, selected_investments),
+                        use_container_width=True)
     # ----------------------------INVESTMENTS-LORENA-YEAR---------------------------------#
 
-    # Agregar multiselect para años
-    selected_years = st.multiselect(
-        'Select years to compare:', sorted(data['fecha'].dt.year.unique()), default=[2021])
-
-    # Agregar multiselect para canales de inversión en publicidad
-    selected_channels = st.multiselect('Select investment channels:',
-                                    ['publicidad_inversion_tv_comercial_pre_covid',
-                                        'publicidad_inversion_tv_comercial_post_covid',
-                                        'publicidad_inversion_exterior_comercial',
-                                        'publicidad_inversion_radio_comercial',
-                                        'publicidad_inversion_prensa_comercial',
-                                        'publicidad_inversion_brandformance_total',
-                                        'publicidad_inversion_agencias_on_comercial_total'],
-                                    default=['publicidad_inversion_tv_comercial_pre_covid',
-                                                'publicidad_inversion_tv_comercial_post_covid',
-                                                'publicidad_inversion_exterior_comercial',
-                                                'publicidad_inversion_radio_comercial',
-                                                'publicidad_inversion_prensa_comercial',
-                                                'publicidad_inversion_brandformance_total',
-                                                'publicidad_inversion_agencias_on_comercial_total'
-                                                ], key = '3')
-                                                
-
-    # Calcular la diferencia porcentual de inversión para los canales seleccionados
-    investment_diff_percentages = {}
-    for channel in selected_channels:
-        channel_data = []
-        for year in selected_years:
-            current_year_investment = data.loc[data['fecha'].dt.year == year, channel].sum(
-            )
-            previous_year_investment = data.loc[data['fecha'].dt.year == (
-                year - 1), channel].sum()
-            percentage_diff = ((current_year_investment - previous_year_investment) /
-                            previous_year_investment) * 100 if previous_year_investment != 0 else 0
-            channel_data.append(percentage_diff)
-        investment_diff_percentages[channel] = channel_data
-
-    fig = go.Figure()
-    increase_color = 'green'
-    decrease_color = 'GREY'
-
-    for channel in selected_channels:
-        for i, year in enumerate(selected_years):
-            # Si el porcentaje es negativo, se muestra hacia la izquierda en rojo, si no, hacia la derecha en verde
-            color = increase_color if investment_diff_percentages[channel][i] > 0 else decrease_color
-            # Se agrega una barra por cada año seleccionado
-            fig.add_trace(go.Bar(
-                y=[channel + ' ' + str(year)],
-                x=[investment_diff_percentages[channel][i]],
-                name=str(year),
-                orientation='h',
-                marker_color=color
-            ))
-
-    fig.update_layout(
-        barmode='relative',
-        title='Yearly Percentage Difference in Advertising Investment by Channel',
-        xaxis_title='Percentage Difference',
-        # Mostrar porcentajes
-        xaxis_tickformat='%{value}%',
-        yaxis_title='Channel',
-        xaxis=dict(
-            zeroline=True,
-            zerolinewidth=2,
-            zerolinecolor='black'),
-        yaxis=dict(
-            autorange='reversed'  # Esto es para que el gráfico comience desde arriba hacia abajo
-        ))
-
-    st.plotly_chart(fig)
-
-    # Waterfall chart para mostral la diferencia en inversión por año y canal
-    # Agregar multiselect para años añadir ke
-
-    selected_years = st.multiselect('Select years to compare:', sorted(
-        data['fecha'].dt.year.unique()), key='1', default=[2020, 2019])
-
-    # Agregar multiselect para canales de inversión en publicidad
-    selected_channels = st.multiselect('Select investment channels:',
-                                    ['publicidad_inversion_tv_comercial_pre_covid',
-                                        'publicidad_inversion_tv_comercial_post_covid',
-                                        'publicidad_inversion_exterior_comercial',
-                                        'publicidad_inversion_radio_comercial',
-                                        'publicidad_inversion_prensa_comercial',
-                                        'publicidad_inversion_brandformance_total',
-                                        'publicidad_inversion_agencias_on_comercial_total'],
-                                    default=['publicidad_inversion_tv_comercial_pre_covid',
-                                                'publicidad_inversion_tv_comercial_post_covid',
-                                                'publicidad_inversion_exterior_comercial',
-                                                'publicidad_inversion_radio_comercial',
-                                                'publicidad_inversion_prensa_comercial',
-                                                'publicidad_inversion_brandformance_total',
-                                                'publicidad_inversion_agencias_on_comercial_total'
-                                                ], key='2')
-
-    # Calcular la diferencia porcentual de inversión para los canales seleccionados
-    investment_diff_percentages = {}
-    for channel in selected_channels:
-        channel_data = []
-        for year in selected_years:
-            current_year_investment = data.loc[data['fecha'].dt.year == year, channel].sum(
-            )
-            previous_year_investment = data.loc[data['fecha'].dt.year == (
-                year - 1), channel].sum()
-            percentage_diff = ((current_year_investment - previous_year_investment) /
-                            previous_year_investment) * 100 if previous_year_investment != 0 else 0
-            channel_data.append(percentage_diff)
-        investment_diff_percentages[channel] = channel_data
-
-    # Crear un DataFrame con los datos de la diferencia porcentual de inversión
-    investment_diff_percentages_df = pd.DataFrame(
-        investment_diff_percentages, index=selected_years)
-    # Transponer el DataFrame para que los canales sean las columnas y los años los índices
-    investment_diff_percentages_df = investment_diff_percentages_df.T
-
-    # Crear un gráfico de barras apiladas con Plotly
-    fig = go.Figure()
-    # Lista de colores para las barras
-    colors = [
-        "#1f77b4",  # azul moderado
-        "#84c9ff",  # naranja
-        "#2cb49c",  # verde
-        "#fab5b6",  # rosa
-        "#fb3131",  # rojo
-        "#7f7f7f",  # gris
-        "#17becf",  # azul claro
-    ]
-    # Lista de años
-    years = investment_diff_percentages_df.columns
-    # Lista de canales
-    channels = investment_diff_percentages_df.index
-    # Agregar cada canal como una barra apilada
-    for i, channel in enumerate(channels):
-        fig.add_trace(go.Bar(
-            x=years,
-            y=investment_diff_percentages_df.loc[channel],
-            name=channel,
-            marker_color=colors[i]  # Establecer el color correspondiente
-        ))
-
-    # Estilizar el gráfico
-    fig.update_layout(
-        barmode='stack',  # Modo apilado para las barras
-        title='Yearly Percentage Difference in Advertising Investment by Channel',
-        xaxis_title='Year',
-        yaxis_title='Percentage Difference',
-        yaxis=dict(tickformat=".2f"),
-        plot_bgcolor='white',
-        title_x=0.5,  # Centrar el título del gráfico
+    with prof.span('yoy'):
+        # Agregar multiselect para años
+        selected_years = st.multiselect(
+            'Select years to compare:', sorted(years(cube)),
+            default=[y for y in [2021] if y in years(cube)])
 
-    )
+        # Agregar multiselect para canales de inversión en publicidad
+        selected_channels = st.multiselect('Select investment channels:', CANALES, default=CANALES,
+                                           key='3')
+
+        # Diferencia porcentual de inversión (año × canal) para la selección, tomada de la tabla YoY
+        investment_diff_percentages = load_yoy(version, cube).loc[selected_years, selected_channels]
+        st.plotly_chart(figs.get(version, 'yoy_horizontal', (selected_years, selected_channels),
+                                 figures.yoy_horizontal, investment_diff_percentages,
+                                 selected_channels, selected_years))
+
+        # Waterfall chart para mostral la diferencia en inversión por año y canal
+        # Agregar multiselect para años añadir ke
 
-    # Mostrar el gráfico en Streamlit
-    st.plotly_chart(fig)
+        selected_years = st.multiselect('Select years to compare:', sorted(
+            years(cube)), key='1', default=[y for y in [2020, 2019] if y in years(cube)])
+
+        # Agregar multiselect para canales de inversión en publicidad
+        selected_channels = st.multiselect('Select investment channels:', CANALES, default=CANALES,
+                                           key='2')
+
+        # Diferencia porcentual de inversión (año × canal) para la selección, tomada de la tabla YoY
+        investment_diff_percentages = load_yoy(version, cube).loc[selected_years, selected_channels]
+        st.plotly_chart(figs.get(version, 'yoy_stacked', (selected_years, selected_channels),
+                                 figures.yoy_stacked, investment_diff_percentages))
 
 
 # Condicional para las otras opciones del menú
 elif menu == "Model":
-    st.write("Aquí va el contenido de Modelo")
+    from mmm.transforms import (adstock, geometric_weights, hill, logistic, scale_media,
+                                weibull_weights)
+    from mmm.model import design_arrays, search
+    from mmm.uncertainty import (block_bootstrap_weights, roi_intervals, roi_replicates,
+                                 rolling_origin_weights)
+    from mmm.validation import HORIZON, cross_validate, summarize
+
+    # ----------------------------TRANSFORMACIONES DE MEDIOS---------------------------------#
+    st.subheader('Media transforms')
+
+    with prof.span('transforms'):
+        # Medios escalados por su máximo para que los parámetros de saturación sean comparables
+        media_scaled, _ = scale_media(data[CANALES].to_numpy())
+
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            adstock_type = st.radio('Adstock', ('Geometric', 'Weibull'))
+            if adstock_type == 'Geometric':
+                decay = st.slider('Decay', 0.0, 0.95, 0.5, 0.05)
+                weights = geometric_weights(np.full(len(CANALES), decay))
+            else:
+                weibull_shape = st.slider('Shape', 0.1, 5.0, 1.5, 0.1)
+                weibull_scale = st.slider('Scale', 0.05, 1.0, 0.3, 0.05)
+                weights = weibull_weights(np.full(len(CANALES), weibull_shape),
+                                          np.full(len(CANALES), weibull_scale), kind='pdf')
+            saturation_type = st.radio('Saturation', ('Hill', 'Logistic'))
+            if saturation_type == 'Hill':
+                half_sat = st.slider('Half saturation', 0.05, 2.0, 0.5, 0.05)
+                slope = st.slider('Slope', 0.5, 4.0, 1.0, 0.1)
+            else:
+                lam = st.slider('Lambda', 0.1, 10.0, 2.0, 0.1)
+
+        # Todos los canales se transforman de una vez
+        media_adstock = adstock(media_scaled, weights)
+        if saturation_type == 'Hill':
+            media_transformed = hill(media_adstock, np.full(len(CANALES), half_sat),
+                                     np.full(len(CANALES), slope))
+        else:
+            media_transformed = logistic(media_adstock, np.full(len(CANALES), lam))
+
+        with col2:
+            channel = st.selectbox('Channel', CANALES)
+            i = CANALES.index(channel)
+            st.plotly_chart(figures.media_transform(data['fecha'], channel, (
+                ('Spend (scaled)', media_scaled[:, i]),
+                ('Adstock', media_adstock[:, i]),
+                ('Adstock + saturation', media_transformed[:, i]))), use_container_width=True)
+
+    # ----------------------------AJUSTE DEL MODELO---------------------------------#
+    st.markdown("<hr>", unsafe_allow_html=True)
+    st.subheader('Model fit')
+
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        n_candidates = st.select_slider('Parameter sets to evaluate',
+                                        options=[1000, 5000, 20000, 50000, 100000], value=20000)
+        ridge_alpha = st.select_slider('Ridge alpha', options=[0.01, 0.1, 1.0, 10.0], value=1.0)
+        positive = st.checkbox('Non-negative media coefficients', value=True)
+        fit_button = st.button('Fit model')
+
+    with prof.span('fit'):
+        # Los modelos ajustados se guardan en disco por (versión de datos, parámetros). La
+        # búsqueda corre como trabajo en segundo plano: sigue aunque se cambie de página
+        model = current_model()
+        if fit_button:
+            parametros = dict(n_candidates=n_candidates, alpha=ridge_alpha, positive=positive)
+            st.session_state['fit_job'] = jobs.submit('fit', search, data, version, retry=True,
+                                                      inputs=dict(version=version, **parametros),
+                                                      **parametros)
+        fit_job, estado = session_job('fit_job')
+        if fit_job is not None:
+            if estado['state'] == 'done':
+                model = jobs.result(fit_job)
+                del st.session_state['fit_job']
+                # Los intervalos y la validación eran del modelo anterior
+                st.session_state.pop('roi_job', None)
+                st.session_state.pop('cv_job', None)
+            elif estado['state'] in PENDIENTES:
+                with col1:
+                    watch_job(fit_job, 'Searching adstock/saturation parameters...')
+            else:
+                col1.warning(f"Model fit {estado['state']}. {estado.get('error', '')}")
+                del st.session_state['fit_job']
+        st.session_state['model'] = model
+
+        with col2:
+            if model is None:
+                st.info('No fitted model for this dataset yet. Choose the search settings and press "Fit model".')
+            else:
+                media, controls, target = design_arrays(data, model.controls)
+                contributions = model.media_contributions(media)
+                predicted = model.baseline(controls) + contributions.sum(axis=1)
+
+                st.metric('R²', f"{model.r2:.3f}")
+                st.plotly_chart(figures.model_fit(data['fecha'], target, predicted),
+                                use_container_width=True)
+
+                # Parámetros, contribución y ROI (ventas por euro invertido) por canal
+                spend_total = media.sum(axis=0)
+                st.dataframe(pd.DataFrame({
+                    'decay': model.decay,
+                    'half_sat': model.half_sat,
+                    'slope': model.slope,
+                    'coef': model.coef_media,
+                    'contribution': contributions.sum(axis=0),
+                    'roi': np.divide(contributions.sum(axis=0), spend_total,
+                                     out=np.zeros_like(spend_total), where=spend_total > 0),
+                }, index=model.channels).round(4))
+
+    # ----------------------------INCERTIDUMBRE DEL ROI---------------------------------#
+    with prof.span('uncertainty'):
+        if model is not None:
+            st.markdown("<hr>", unsafe_allow_html=True)
+            st.subheader('ROI uncertainty')
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                uncertainty_mode = st.radio('Method', ('Block bootstrap', 'Rolling origin'))
+                if uncertainty_mode == 'Block bootstrap':
+                    n_replicates = st.select_slider('Replicates', options=[100, 200, 500, 1000], value=200)
+                    block_length = st.slider('Block length (weeks)', 2, 26, 8)
+                else:
+                    min_train = st.slider('Minimum training window (weeks)', 52, len(data) - 4, 104)
+                    step = st.slider('Origin step (weeks)', 1, 13, 4)
+                estimate_button = st.button('Estimate intervals')
+
+            def draw_roi(roi):
+                # Réplicas pendientes en NaN: los intervalos se redibujan a medida que llegan
+                low, median, high = roi_intervals(roi) * 1000
+                done = int((~np.isnan(roi).any(axis=1)).sum())
+                st.plotly_chart(figures.roi_interval_bars(model.channels, low, median, high, done, len(roi)),
+                                use_container_width=True)
+
+            with col2:
+                if estimate_button:
+                    if uncertainty_mode == 'Block bootstrap':
+                        weights = block_bootstrap_weights(len(data), n_replicates, block_length)
+                    else:
+                        weights = rolling_origin_weights(len(data), min_train, step)
+                    st.session_state['roi_job'] = jobs.submit(
+                        'roi', roi_replicates, model, data, weights, retry=True,
+                        inputs=dict(version=version, model=model, weights=weights))
+                roi_job, estado = session_job('roi_job')
+                if roi_job is not None:
+                    if estado['state'] == 'done':
+                        draw_roi(jobs.result(roi_job))
+                    elif estado['state'] in PENDIENTES:
+                        watch_job(roi_job, 'Refitting replicates...', draw_partial=draw_roi)
+                    else:
+                        st.warning(f"ROI intervals {estado['state']}. {estado.get('error', '')}")
+                        del st.session_state['roi_job']
+
+    # ----------------------------VALIDACIÓN CRUZADA---------------------------------#
+    with prof.span('validation'):
+        if model is not None:
+            st.markdown("<hr>", unsafe_allow_html=True)
+            st.subheader('Cross-validation')
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                # Variantes del modelo ajustado: decay escalado (adstock más corto o más largo) × alpha
+                decay_factors = st.multiselect('Adstock decay (× fitted)', [0.5, 0.75, 1.0, 1.25, 1.5],
+                                               default=[0.5, 1.0, 1.5])
+                cv_alphas = st.multiselect('Ridge alpha', [0.01, 0.1, 1.0, 10.0], default=[0.1, 1.0, 10.0],
+                                           key='cv_alpha')
+                cv_window = st.radio('Training window', ('Expanding', 'Rolling'))
+                cv_min_train = st.slider('Training weeks (minimum, or window size if rolling)', 52,
+                                         len(data) - HORIZON, 104, key='cv_min_train')
+                cv_horizon = st.slider('Holdout weeks per fold', 4, 26, HORIZON)
+                cv_step = st.slider('Weeks between origins', 1, 13, 4, key='cv_step')
+                cv_button = st.button('Run cross-validation')
+
+            with col2:
+                if cv_button and decay_factors and cv_alphas:
+                    configs = [dict(decay=np.minimum(model.decay * factor, 0.95), half_sat=model.half_sat,
+                                    slope=model.slope, alpha=alpha,
+                                    label=f'decay ×{factor:g}, alpha={alpha:g}')
+                               for factor in decay_factors for alpha in cv_alphas]
+                    opciones = dict(min_train=min(cv_min_train, len(data) - cv_horizon), horizon=cv_horizon,
+                                    step=cv_step, window=cv_min_train if cv_window == 'Rolling' else None,
+                                    positive=model.positive, controls=model.controls)
+                    st.session_state['cv_job'] = jobs.submit(
+                        'cv', cross_validate, data, configs, retry=True,
+                        inputs=dict(version=version, configs=configs, **opciones), **opciones)
+                cv_job, estado = session_job('cv_job')
+                if cv_job is not None:
+                    if estado['state'] == 'done':
+                        cv_results = jobs.result(cv_job)
+                        st.dataframe(summarize(cv_results).round(3))
+                        st.plotly_chart(figures.cv_folds(cv_results), use_container_width=True)
+                        with st.expander('Holdout error per fold'):
+                            st.dataframe(cv_results.round(3))
+                    elif estado['state'] in PENDIENTES:
+                        watch_job(cv_job, 'Evaluating folds...')
+                    else:
+                        st.warning(f"Cross-validation {estado['state']}. {estado.get('error', '')}")
+                        del st.session_state['cv_job']
 elif menu == "Simulation":
-    st.write("Aquí va el contenido de Simulación")
+    from mmm.model import design_arrays
+    from mmm.simulation import build_scenarios, channel_response, simulate_plan, simulate_totals
+
+    # El simulador trabaja sobre el último modelo ajustado para esta versión de los datos
+    model = current_model()
+
+    if model is None:
+        st.info('Fit a model on the Model page before running simulations.')
+    else:
+        media, controls, _ = design_arrays(data, model.controls)
+        # Respuesta tabulada sobre todo el histórico: los sliders se responden interpolando
+        table = load_response_table(version, model.key, None, model, media)
+        base_total = model.baseline(controls).sum()
+
+        # ----------------------------ESCENARIO---------------------------------#
+        st.subheader('Budget scenario')
+        multipliers = np.ones((1, len(CANALES)))
+        shifts = np.zeros((1, len(CANALES)), dtype=int)
+        paused = np.zeros((1, len(CANALES)), dtype=bool)
+        lecturas = []
+        for i, channel in enumerate(CANALES):
+            col1, col2, col3 = st.columns([3, 3, 1])
+            with col1:
+                multipliers[0, i] = st.slider(f'{channel} spend (x)', 0.0, 3.0, 1.0, 0.05,
+                                              key=f'mult_{channel}')
+                lecturas.append(st.empty())
+            with col2:
+                shifts[0, i] = st.slider(f'{channel} flighting shift (weeks)', -8, 8, 0,
+                                         key=f'shift_{channel}')
+            with col3:
+                paused[0, i] = st.checkbox('Pause', key=f'pause_{channel}')
+        weekly = st.toggle('Show predicted weekly sales', key='weekly_sales')
+
+        with prof.span('scenario'):
+            # Escenario base (sin cambios) y escenario elegido en una sola llamada
+            escenarios = dict(multipliers=np.vstack([np.ones_like(multipliers), multipliers]),
+                              paused=np.vstack([np.zeros_like(paused), paused]))
+            contributions, marginal = channel_response(table, **escenarios)
+            sales = base_total + contributions.sum(axis=1)
+            if shifts.any() or weekly:
+                # Los desplazamientos cambian el calendario y la vista semanal necesita cada
+                # semana: solo entonces se evalúa el modelo completo
+                weekly_sales, weekly_contributions = simulate_plan(
+                    model, media, controls, shifts=np.vstack([np.zeros_like(shifts), shifts]),
+                    totals=False, **escenarios)
+                sales, contributions = weekly_sales.sum(axis=1), weekly_contributions.sum(axis=1)
+            for i, lectura in enumerate(lecturas):
+                lectura.caption(f'Contribution {contributions[1, i]:,.0f} · marginal ROI '
+                                f'{1000 * marginal[1, i]:,.2f} per 1000 €')
+            if shifts.any():
+                st.caption('Flighting shifts are simulated with the full model; the marginal ROI '
+                           'per channel is read for the unshifted calendar.')
+
+            spend_base = media.sum()
+            spend_scenario = build_scenarios(media, multipliers, shifts, paused).sum()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric('Scenario investment', f"{spend_scenario:,.2f} €",
+                          f"{spend_scenario - spend_base:,.2f} €")
+            with col2:
+                st.metric('Predicted sales', f"{sales[1]:,.0f}",
+                          f"{sales[1] - sales[0]:,.0f}")
+
+            if weekly:
+                st.plotly_chart(figures.scenario_sales(data['fecha'], weekly_sales), use_container_width=True)
+            st.plotly_chart(figures.scenario_channels(CANALES, contributions), use_container_width=True)
+
+        # ----------------------------BARRIDO DE ESCENARIOS---------------------------------#
+        with st.expander('Random scenario sweep'), prof.span('sweep'):
+            n_scenarios = st.select_slider('Scenarios', options=[1000, 10000, 50000], value=10000)
+            spread = st.slider('Spend variation per channel (±%)', 5, 100, 50, 5)
+            rng = np.random.default_rng(0)
+            sweep = rng.uniform(1 - spread / 100, 1 + spread / 100, size=(n_scenarios, len(CANALES)))
+            # Solo multiplicadores: se responde con la tabla de respuesta, sin recalcular el modelo
+            sweep_sales, _ = simulate_totals(table, base_total, multipliers=sweep)
+            sweep_spend = sweep @ media.sum(axis=0)
+
+            st.plotly_chart(figures.scenario_sweep(sweep_spend, sweep_sales, spend_scenario, sales[1]),
+                            use_container_width=True)
 elif menu == "Optimization":
-    st.write("Aquí va el contenido de Optimización")
+    from mmm.model import design_arrays
+    from mmm.optimizer import allocate, efficient_frontier, response_curves
+
+    model = current_model()
+
+    if model is None:
+        st.info('Fit a model on the Model page before optimizing the budget.')
+    else:
+        media, _, _ = design_arrays(data, model.controls)
+
+        # Curvas de respuesta precalculadas para el horizonte (calendario de las últimas semanas)
+        horizon = st.selectbox('Planning horizon (weeks, using the latest flighting)', [13, 26, 52], index=2)
+        curves = response_curves(model, media, weeks=horizon)
+        table = load_response_table(version, model.key, horizon, model, media)
+        historical_budget = float(curves.reference.sum())
+
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            objective = st.radio('Objective', ('Maximize sales', 'Maximize ROI'))
+            total_budget = st.slider('Total budget (€)', 0.0, 3 * historical_budget,
+                                     historical_budget, max(historical_budget / 100, 1.0))
+            st.write('Share of the total budget per channel (%)')
+            bounds = np.array([st.slider(channel, 0, 100, (0, 100), key=f'bounds_{channel}')
+                               for channel in CANALES], dtype=float) / 100
+
+        with prof.span('allocation'):
+            lower, upper = bounds[:, 0] * total_budget, bounds[:, 1] * total_budget
+            # Arranque desde la última solución, si sigue siendo del mismo modelo y horizonte
+            warm_key = (model.key, horizon, objective)
+            x0 = st.session_state.get('allocation') if st.session_state.get('allocation_key') == warm_key else None
+            objetivo = 'roi' if objective == 'Maximize ROI' else 'sales'
+            try:
+                # Reparto sobre la tabla interpolada y ajuste final con puntos exactos
+                # alrededor de la solución
+                allocation = allocate(table, total_budget, lower, upper, objective=objetivo, x0=x0)
+                refined = table.refine(curves, allocation)
+                allocation = allocate(refined, total_budget, lower, upper, objective=objetivo,
+                                      x0=allocation)
+            except ValueError:
+                allocation = None
+                col2.error('The per-channel limits are not compatible with the total budget.')
+
+        if allocation is not None:
+            st.session_state['allocation'] = allocation
+            st.session_state['allocation_key'] = warm_key
+            sales_historical = curves.response(curves.reference).sum()
+            sales_optimal = curves.response(allocation).sum()
+
+            with col2:
+                col21, col22 = st.columns(2)
+                col21.metric('Media-driven sales', f"{sales_optimal:,.0f}",
+                             f"{sales_optimal - sales_historical:,.0f} vs historical")
+                col22.metric('ROI (sales per 1000 €)', f"{1000 * sales_optimal / max(allocation.sum(), 1):,.2f}",
+                             f"{1000 * (sales_optimal / max(allocation.sum(), 1) - sales_historical / max(historical_budget, 1)):,.2f}")
+
+                st.plotly_chart(figures.budget_allocation(CANALES, curves.reference, allocation),
+                                use_container_width=True)
+
+            # ----------------------------CURVAS DE RESPUESTA---------------------------------#
+            with prof.span('curves'):
+                st.plotly_chart(figures.response_curves_chart(refined, allocation), use_container_width=True)
+
+            # ----------------------------FRONTERA EFICIENTE---------------------------------#
+            with st.expander('Efficient frontier'), prof.span('frontier'):
+                # Mismos porcentajes mínimos/máximos por canal aplicados a cada nivel de presupuesto
+                budgets = np.linspace(historical_budget * 0.1, 3 * historical_budget, 40)
+                frontier_lower, frontier_upper = bounds[:, 0] * budgets[:, None], bounds[:, 1] * budgets[:, None]
+                entradas = dict(curves=table, budgets=budgets, lower=frontier_lower, upper=frontier_upper)
+                # Solo se encola a petición: cada movimiento de un slider cambia las entradas y
+                # crearía un trabajo nuevo. Si ya se calculó para estas entradas se muestra sin más
+                frontier_job = job_key('frontier', **entradas)
+                estado = jobs.status(frontier_job)
+                if estado is not None and estado['state'] == 'done':
+                    _, frontier_sales = jobs.result(frontier_job)
+                    st.plotly_chart(figures.frontier(budgets, frontier_sales, historical_budget, sales_historical),
+                                    use_container_width=True)
+                elif estado is not None and estado['state'] in PENDIENTES:
+                    watch_job(frontier_job, 'Solving the efficient frontier...')
+                else:
+                    if estado is not None:
+                        st.warning(f"Efficient frontier {estado['state']}. {estado.get('error', '')}")
+                    if st.button('Compute frontier' if estado is None else 'Retry'):
+                        jobs.submit('frontier', efficient_frontier, table, budgets, frontier_lower,
+                                    frontier_upper, inputs=entradas, retry=True)
+                        st.rerun()
+
+# ----------------------------PERFILADO---------------------------------#
+if prof.enabled:
+    figs_despues = figs.stats()
+    prof.count('figure_cache_hits', figs_despues['hits'] - figs_antes['hits'])
+    prof.count('figure_cache_misses', figs_despues['misses'] - figs_antes['misses'])
+    prof.count('figure_cache_size', figs_despues['size'])
+    registro = prof.record(page=menu, data_version=version)
+    prof.close()
+    prof.append_log(registro)
+    with st.sidebar.expander('Profiling', expanded=True):
+        st.metric('Rerun', f"{registro['total_seconds'] * 1000:,.0f} ms")
+        st.dataframe(pd.DataFrame(registro['spans']).set_index('name').round(4))
+        st.write(registro['counters'])
+        if registro['max_rss_mb'] is not None:
+            st.write(f"Max RSS: {registro['max_rss_mb']:,.0f} MB")
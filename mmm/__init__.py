@@ -0,0 +1,15 @@
+# Núcleo de cálculo del Marketing Mix Modeling (sin dependencias de Streamlit)
+#
+# Los submódulos se cargan al primer acceso (mmm.model, mmm.figures, ...): importar el
+# paquete no arrastra pyarrow, plotly ni multiprocessing hasta que hacen falta.
+import importlib
+
+__all__ = ['aggregates', 'benchmark', 'columns', 'downsample', 'export', 'figures', 'ingest',
+           'jobs', 'model', 'optimizer', 'partitions', 'profiling', 'schema', 'shared',
+           'simulation', 'timeindex', 'transforms', 'uncertainty', 'validation']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f'{__name__}.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,58 @@
+# ---------------------------------------------------AGREGADOS------------------------------------------------------#
+# Cubo año × mes con las sumas de inversión, ventas y OMIE. Se construye una vez por
+# versión del dataset y todos los widgets de la página Business trabajan sobre él.
+import pandas as pd
+
+from mmm.columns import CANALES, FECHA, OMIE, VENTAS
+
+MEDIDAS = CANALES + [VENTAS, OMIE]
+FILAS = 'filas'  # número de registros agregados en cada celda (para medias)
+
+
+def build_cube(data, measures=MEDIDAS):
+    fechas = data[FECHA]  # datetime64 desde la ingesta (schema.validate)
+    cube = data[measures].groupby([fechas.dt.year.rename('year'),
+                                  fechas.dt.month.rename('month')]).sum()
+    cube[FILAS] = data.groupby([fechas.dt.year.rename('year'),
+                                fechas.dt.month.rename('month')]).size()
+    return cube
+
+
+def years(cube):
+    return cube.index.get_level_values('year').unique().sort_values()
+
+
+def yearly_totals(cube, columns):
+    """Sumas por año (índice = año) de las columnas pedidas."""
+    return cube[columns].groupby(level='year').sum()
+
+
+def year_totals(cube, year, columns):
+    """Sumas de un año concreto; un año sin datos devuelve ceros."""
+    if year not in cube.index.get_level_values('year'):
+        return pd.Series(0.0, index=columns)
+    return cube.loc[year, columns].sum()
+
+
+def monthly_values(cube, year, column, how='sum'):
+    """Serie mensual (índice = mes) de un año: suma o media por registro."""
+    if year not in cube.index.get_level_values('year'):
+        return pd.Series(dtype=float)
+    celdas = cube.loc[year]
+    if how == 'mean':
+        return celdas[column] / celdas[FILAS]
+    return celdas[column]
+
+
+def period_change(totals, periods=1, zero_baseline=0.0):
+    """Variación porcentual de cada columna respecto a `periods` años antes, de una vez.
+
+    `totals` viene indexado por año (p. ej. yearly_totals). Los años que faltan cuentan
+    como inversión cero; cuando la base es cero se devuelve `zero_baseline`.
+    """
+    rango = pd.RangeIndex(totals.index.min() - periods, totals.index.max() + 1, name='year')
+    completo = totals.reindex(rango, fill_value=0.0).astype(float)
+    base = completo.shift(periods)
+    cambio = (completo - base) / base.where(base != 0) * 100
+    cambio = cambio.where(base != 0, zero_baseline)
+    return cambio.loc[totals.index.min():]
@@ -0,0 +1,250 @@
+# ---------------------------------------------------BENCHMARK------------------------------------------------------#
+# Mide el coste de cada página de la herramienta sobre datasets sintéticos con el esquema
+# de bbdd_mmm_*.xlsx, sin navegador ni Streamlit:
+#
+#     python -m mmm.benchmark --scales 10 100 1000 --channels 7 100 --out bench.json
+#
+# Cada escala multiplica las filas del extracto real (mismo periodo con más granularidad)
+# y los canales por encima de 7 se añaden como publicidad_inversion_sintetico_NN. Los
+# resultados se guardan en JSON junto con el commit, para comparar entre versiones. En
+# los casos grandes el barrido exacto de escenarios y las curvas de respuesta se acotan
+# (SWEEP_CELLS, CURVE_CELLS) para que la rejilla por defecto termine.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from mmm.columns import CANALES, CONTROLES, FECHA, OMIE, VENTAS
+
+N_WEEKS = 226  # semanas del extracto bbdd_mmm_20240111
+SCALES = (10, 100, 1000)
+CHANNELS = (7, 100)
+STAGES = ('load', 'business', 'figures', 'model', 'simulation', 'optimization')
+SCENARIOS = 1000            # escenarios de los barridos de simulación
+SWEEP_CELLS = 200_000_000   # escenarios × periodos × canales del barrido exacto como máximo
+CURVE_CELLS = 1_000_000     # periodos × canales de las curvas de respuesta como máximo
+
+
+def synthetic_channels(n_channels):
+    extra = [f'publicidad_inversion_sintetico_{i:02d}' for i in range(n_channels - len(CANALES))]
+    return (CANALES + extra)[:n_channels]
+
+
+def synthetic_dataset(scale=1, n_channels=len(CANALES), n_weeks=N_WEEKS, seed=0):
+    """DataFrame con las columnas y tipos del extracto real y n_weeks × scale filas."""
+    from mmm.transforms import geometric_adstock, hill
+
+    rng = np.random.default_rng(seed)
+    n = n_weeks * scale
+    fechas = pd.date_range('2018-01-01', periods=n, freq=pd.Timedelta(weeks=1) / scale)
+    mes = fechas.month.to_numpy()
+    covid = fechas >= pd.Timestamp('2020-03-15')
+    channels = synthetic_channels(n_channels)
+
+    # Inversión por oleadas: cada canal está activo en ~60% de los periodos
+    activo = rng.random((n, n_channels)) < 0.6
+    spend = rng.gamma(0.8, 30000, size=(n, n_channels)) * activo
+    decay = rng.uniform(0.1, 0.7, n_channels)
+    efecto = hill(geometric_adstock(spend / spend.max(axis=0), decay), np.full(n_channels, 0.3),
+                  np.full(n_channels, 1.5))
+    omie = np.clip(60 + np.cumsum(rng.normal(0, 2 / np.sqrt(scale), n)), 15, 300)
+
+    data = {
+        FECHA: fechas,
+        'festivo_navidad': ((mes == 12) & (fechas.day.to_numpy() >= 22)).astype(np.int64),
+        'festivo_viernes_santo': (rng.random(n) < 0.018).astype(np.int64),
+        'jul': (mes == 7).astype(np.int64),
+        'ago': (mes == 8).astype(np.int64),
+        'peso_festivos': np.round(rng.exponential(0.25, n) * (rng.random(n) < 0.3), 1),
+        'feb': (mes == 2).astype(np.int64),
+        'distribucion_numero_tiendas_pre_covid': np.where(covid, 0, 289).astype(np.int64),
+        'distribucion_numero_tiendas_post_covid': np.where(covid, 260, 0).astype(np.int64),
+        'coste_unitario_stores_cust_serv': rng.uniform(10, 50, n),
+        'exog_ucrania': (fechas >= pd.Timestamp('2022-02-24')).astype(float),
+        OMIE: omie,
+        'trafico_visitas_totales_store': rng.integers(20000, 70000, n),
+    }
+    data.update(zip(channels, spend.T))
+    ventas = 800 + 150 * efecto.sum(axis=1) / np.sqrt(n_channels) - 0.5 * omie + rng.normal(0, 60, n)
+    data[VENTAS] = np.maximum(ventas, 0).round().astype(np.int64)
+    return pd.DataFrame(data)
+
+
+def _time(fn, repeat=3):
+    """(mejor tiempo en segundos, resultado de la última ejecución)."""
+    mejor = np.inf
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = fn()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def run_case(scale, n_channels, stages=STAGES, repeat=3, n_candidates=200, workers=None, seed=0):
+    """Tiempos de cada etapa para un dataset sintético; devuelve {etapa.paso: segundos}."""
+    from mmm import aggregates, figures, ingest
+    from mmm.timeindex import build_time_index
+
+    data = synthetic_dataset(scale, n_channels, seed=seed)
+    channels = synthetic_channels(n_channels)
+    tiempos = {}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if 'load' in stages:
+            store = os.path.join(cache_dir, 'bench')
+            os.makedirs(store)
+            tiempos['load.write_store'], _ = _time(
+                lambda: ingest._rebuild(store, data, 'bench', 'bench'), repeat)
+            manifest = ingest._read_manifest(store)
+            tiempos['load.read_store'], _ = _time(lambda: ingest._read_parts(store, manifest), repeat)
+
+        cube = aggregates.build_cube(data, channels + [VENTAS, OMIE])
+        time_index = build_time_index(data)
+        if 'business' in stages:
+            tiempos['business.cube'], _ = _time(
+                lambda: aggregates.build_cube(data, channels + [VENTAS, OMIE]), repeat)
+            tiempos['business.yoy'], _ = _time(
+                lambda: aggregates.period_change(aggregates.yearly_totals(cube, channels)), repeat)
+            tiempos['business.time_index'], _ = _time(lambda: build_time_index(data), repeat)
+            tiempos['business.date_range'], _ = _time(
+                lambda: data.iloc[time_index.date_slice('2019-01-01', '2021-06-30')], repeat)
+
+        if 'figures' in stages:
+            años = list(aggregates.years(cube))
+            yoy = aggregates.period_change(aggregates.yearly_totals(cube, CANALES))
+            constructores = {
+                'investment_per_year': lambda: figures.investment_per_year(cube),
+                'investment_by_channels': lambda: figures.investment_by_channels(cube),
+                'omie_month_years': lambda: figures.omie_month_years(cube, años),
+                'sales_month_years': lambda: figures.sales_month_years(cube, años),
+                'sales_per_year': lambda: figures.sales_per_year(cube),
+                'investment_channels_date': lambda: figures.investment_channels_date(data, CANALES),
+                'yoy_horizontal': lambda: figures.yoy_horizontal(yoy, CANALES, años[1:]),
+                'yoy_stacked': lambda: figures.yoy_stacked(yoy.loc[años[1:], CANALES]),
+            }
+            for nombre, build in constructores.items():
+                # Construcción de la figura y serialización (lo que paga st.plotly_chart)
+                tiempos[f'figures.{nombre}'], _ = _time(lambda: build().to_json(), repeat)
+
+        if not {'model', 'simulation', 'optimization'} & set(stages):
+            return tiempos
+
+        from mmm.model import batch_size, design_arrays, search
+
+        # Tareas del pool acotadas en memoria: candidatos × filas × columnas del diseño
+        chunk_size = batch_size(len(data), n_channels + len(CONTROLES))
+        inicio = time.perf_counter()
+        model = search(data, f'bench-{scale}-{n_channels}', n_candidates=n_candidates, seed=seed,
+                       workers=workers, chunk_size=chunk_size, cache_dir=cache_dir, channels=channels)
+        if 'model' in stages:
+            tiempos['model.search'] = time.perf_counter() - inicio
+            from mmm.validation import cross_validate
+
+            # Validación cruzada del modelo ajustado con tres alphas y ~25 pliegues
+            configs = [dict(decay=model.decay, half_sat=model.half_sat, slope=model.slope, alpha=alpha)
+                       for alpha in (0.1, 1.0, 10.0)]
+            n = len(data)
+            tiempos['model.cv'], _ = _time(
+                lambda: cross_validate(data, configs, min_train=n // 2, horizon=max(1, n // 20),
+                                       step=max(1, n // 50), workers=workers, channels=channels),
+                repeat)
+        media, controls, _ = design_arrays(data, model.controls, channels)
+        from mmm.optimizer import allocate, curve_table, efficient_frontier, response_curves
+
+        # Acotado por caso: en las escalas grandes el barrido exacto y las curvas sobre todos los
+        # periodos tardarían horas. El número de escenarios exactos va en el nombre del paso
+        n_exactos = int(min(SCENARIOS, max(1, SWEEP_CELLS // media.size)))
+        horizonte = int(min(len(media), max(1, CURVE_CELLS // n_channels)))
+
+        if 'simulation' in stages:
+            from mmm.simulation import simulate_plan, simulate_totals
+
+            rng = np.random.default_rng(seed)
+            multipliers = rng.uniform(0.5, 1.5, size=(SCENARIOS, n_channels))
+            tiempos[f'simulation.sweep_{n_exactos}'], _ = _time(
+                lambda: simulate_plan(model, media, controls, multipliers=multipliers[:n_exactos]), repeat)
+            tiempos['simulation.table'], tabla = _time(
+                lambda: curve_table(response_curves(model, media, weeks=horizonte)), repeat)
+            base = model.baseline(controls).sum()
+            tiempos[f'simulation.sweep_{SCENARIOS}_table'], _ = _time(
+                lambda: simulate_totals(tabla, base, multipliers=multipliers), repeat)
+
+        if 'optimization' in stages:
+            curves = response_curves(model, media, weeks=min(52 * scale, horizonte))
+            presupuesto = curves.reference.sum()
+            tiempos['optimization.allocate_sales'], _ = _time(
+                lambda: allocate(curves, presupuesto), repeat)
+            tiempos['optimization.table'], tabla = _time(lambda: curve_table(curves), repeat)
+            tiempos['optimization.allocate_sales_table'], _ = _time(
+                lambda: allocate(tabla, presupuesto), repeat)
+            tiempos['optimization.allocate_roi'], _ = _time(
+                lambda: allocate(curves, presupuesto, objective='roi'), repeat)
+            # Como en la página Optimization, la frontera se resuelve sobre la tabla
+            tiempos['optimization.frontier_40'], _ = _time(
+                lambda: efficient_frontier(tabla, np.linspace(0.1, 3, 40) * presupuesto), repeat)
+    return tiempos
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales=SCALES, channels=CHANNELS, stages=STAGES, repeat=3, n_candidates=200,
+        workers=None, progress=None):
+    """Ejecuta la rejilla escalas × canales y devuelve el informe (dict serializable a JSON)."""
+    casos = []
+    for scale in scales:
+        for n_channels in channels:
+            if progress is not None:
+                progress(f'scale={scale} channels={n_channels}')
+            tiempos = run_case(scale, n_channels, stages, repeat, n_candidates, workers)
+            casos.append({'scale': scale, 'channels': n_channels, 'rows': N_WEEKS * scale,
+                          'seconds': tiempos})
+    return {
+        'commit': _commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'cpu_count': os.cpu_count(),
+        'repeat': repeat,
+        'n_candidates': n_candidates,
+        'cases': casos,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de la herramienta MMM sobre datos sintéticos')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--channels', type=int, nargs='+', default=list(CHANNELS))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--candidates', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=None, help='fichero JSON de resultados (por defecto stdout)')
+    args = parser.parse_args(argv)
+
+    informe = run(args.scales, args.channels, args.stages, args.repeat, args.candidates, args.workers,
+                  progress=lambda mensaje: print(mensaje, file=sys.stderr))
+    texto = json.dumps(informe, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+# Nombres de las columnas del dataset que usa la herramienta
+FECHA = 'fecha'
+OMIE = 'precio_omie'
+VENTAS = 'negocio_ventas_presencial'
+
+CANALES = [
+    'publicidad_inversion_tv_comercial_pre_covid',
+    'publicidad_inversion_tv_comercial_post_covid',
+    'publicidad_inversion_exterior_comercial',
+    'publicidad_inversion_radio_comercial',
+    'publicidad_inversion_prensa_comercial',
+    'publicidad_inversion_brandformance_total',
+    'publicidad_inversion_agencias_on_comercial_total',
+]
+
+COLORES_CANALES = [
+    "#1f77b4",  # azul moderado
+    "#84c9ff",  # naranja
+    "#2cb49c",  # verde
+    "#fab5b6",  # rosa
+    "#fb3131",  # rojo
+    "#7f7f7f",  # gris
+    "#17becf",  # azul claro
+]
+
+# Variables de control del modelo (no publicitarias)
+CONTROLES = [
+    'precio_omie',
+    'peso_festivos',
+    'festivo_navidad',
+    'festivo_viernes_santo',
+    'distribucion_numero_tiendas_pre_covid',
+    'distribucion_numero_tiendas_post_covid',
+    'exog_ucrania',
+]
@@ -0,0 +1,66 @@
+# ---------------------------------------------------SUBMUESTREO------------------------------------------------------#
+# Reducción de series temporales largas antes de enviarlas al navegador. Un gráfico no
+# puede mostrar más de unos pocos puntos por píxel, así que se envían como mucho
+# MAX_POINTS por traza:
+#   - líneas: Largest-Triangle-Three-Buckets (LTTB), que conserva picos y forma
+#   - áreas apiladas: medias por tramo con el mismo eje x para todas las series, de modo
+#     que el total apilado de cada tramo es la media del total original
+# Las series con menos puntos que el límite se devuelven sin tocar.
+import numpy as np
+
+# Presupuesto fijo: el servidor no conoce el ancho real del contenedor, así que se toma
+# el de un gráfico a todo el ancho de la página
+CHART_WIDTH_PX = 1200
+POINTS_PER_PIXEL = 2
+MAX_POINTS = CHART_WIDTH_PX * POINTS_PER_PIXEL
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, n_out):
+    """Posiciones de los n_out puntos que elige LTTB (incluye siempre el primero y el último)."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    xs, ys = _numeric(x), np.asarray(y, dtype=float)
+    # Tramos interiores; el primer y el último punto forman su propio tramo
+    bordes = np.linspace(1, n - 1, n_out - 1).astype(int)
+    elegidos = np.empty(n_out, dtype=int)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Vértice C: media del tramo siguiente (o el último punto)
+        sig_inicio, sig_fin = fin, bordes[i + 2] if i + 2 < len(bordes) else n
+        cx, cy = xs[sig_inicio:sig_fin].mean(), ys[sig_inicio:sig_fin].mean()
+        # Se elige el punto del tramo que forma el triángulo de mayor área con A y C
+        area = np.abs((xs[a] - cx) * (ys[inicio:fin] - ys[a])
+                      - (xs[a] - xs[inicio:fin]) * (cy - ys[a]))
+        a = inicio + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def downsample_line(x, y, n_out=MAX_POINTS):
+    """(x, y) reducidos con LTTB; sin cambios si la serie ya cabe."""
+    if len(y) <= n_out:
+        return x, y
+    elegidos = lttb_indices(x, y, n_out)
+    return np.asarray(x)[elegidos], np.asarray(y)[elegidos]
+
+
+def downsample_stacked(x, values, n_out=MAX_POINTS):
+    """Medias por tramo de values (T, C) con un x común; x es el punto central del tramo."""
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n <= n_out:
+        return np.asarray(x), values
+    inicios = np.linspace(0, n, n_out + 1).astype(int)[:-1]
+    cuenta = np.diff(np.append(inicios, n))
+    medias = np.add.reduceat(values, inicios, axis=0) / cuenta[:, None]
+    return np.asarray(x)[inicios + cuenta // 2], medias
@@ -0,0 +1,221 @@
+# ---------------------------------------------------EXPORTACIÓN------------------------------------------------------#
+# Exportación por lotes de los gráficos de la página Business, sin Streamlit ni navegador:
+#
+#     python -m mmm.export bbdd_mmm_20240111.xlsx --out informes
+#     python -m mmm.export --partitions particiones --brands marca --formats html png
+#
+# Se genera un informe por Excel (ver report_names) y por cada marca/región del almacén
+# particionado, en OUT/<informe>/<gráfico>.html|png, con las mismas figuras
+# (mmm.figures) y selecciones por defecto que la página. Los gráficos se dibujan en un
+# pool de procesos. OUT/<informe>/export.json guarda el hash de las entradas de cada
+# gráfico (versión de los datos y selección): si no han cambiado desde la última
+# exportación, el gráfico no se vuelve a generar. PNG necesita kaleido.
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from mmm.columns import CANALES, FECHA
+from mmm.jobs import job_key
+from mmm.shared import pool_context
+
+OUT_DIR = 'informes'
+FORMATS = ('html', 'png')
+EXPORT_MANIFEST = 'export.json'
+
+
+@dataclass(frozen=True)
+class Target:
+    name: str
+    version: str
+    source: object  # ruta del Excel o lista de particiones
+
+
+def report_names(paths):
+    """Nombre del informe de cada Excel: el del fichero (con su fecha) o, si dos coinciden,
+    su ruta desde la carpeta común (a/bbdd_mmm_20240111.xlsx -> a-bbdd_mmm_20240111)."""
+    reales = [os.path.realpath(path) for path in paths]
+    nombres = [os.path.splitext(os.path.basename(path))[0] for path in reales]
+    if len(set(nombres)) == len(nombres):
+        return nombres
+    comun = os.path.commonpath([os.path.dirname(path) for path in reales])
+    return [os.path.splitext(os.path.relpath(path, comun))[0].replace(os.sep, '-') for path in reales]
+
+
+def workbook_targets(paths):
+    from mmm.ingest import load_dataset
+
+    # Un mismo fichero pedido dos veces es un solo informe
+    paths = list({os.path.realpath(path): path for path in paths}.values())
+    # La ingesta deja el almacén columnar al día; aquí solo hace falta la versión
+    return [Target(nombre, load_dataset(path, columns=[FECHA])[1], path)
+            for nombre, path in zip(report_names(paths), paths)]
+
+
+def partition_targets(root, selected_brands=None, selected_regions=None):
+    from mmm.partitions import brands, discover, regions, select, selection_version
+
+    partitions = discover(root)
+    targets = []
+    for brand in selected_brands or brands(partitions):
+        for region in selected_regions or regions(partitions, [brand]):
+            selection = select(partitions, [brand], [region])
+            if selection:
+                targets.append(Target(f'{brand}-{region}', selection_version(selection), selection))
+    return targets
+
+
+def _inputs(target):
+    """Cubo año × mes y filas (fecha + canales) de un informe."""
+    from mmm.schema import PAGE_COLUMNS
+
+    if isinstance(target.source, str):
+        from mmm.aggregates import build_cube
+        from mmm.ingest import load_dataset, read_cube
+
+        # Primero la ingesta: dos extractos fechados de la misma carpeta comparten almacén y
+        # el cubo guardado puede ser del otro (read_cube lo comprueba con el hash del Excel)
+        rows, _ = load_dataset(target.source, columns=PAGE_COLUMNS['Business'])
+        cube = read_cube(target.source)
+        if cube is None:
+            # Sin almacén columnar: se agrega a partir de todas las columnas
+            cube = build_cube(load_dataset(target.source)[0])
+        return cube, rows
+    from mmm.partitions import combined_cube, combined_rows
+
+    return combined_cube(target.source), combined_rows(target.source, columns=PAGE_COLUMNS['Business'])
+
+
+def business_charts(cube, rows):
+    """{gráfico: (selección, argumentos)} con las selecciones por defecto de la página Business."""
+    from mmm.aggregates import period_change, yearly_totals, years
+
+    años = sorted(years(cube), reverse=True)
+    yoy = period_change(yearly_totals(cube, CANALES))
+    # Variación interanual: el último año en barras y todos los que tienen año anterior apilados
+    comparables = sorted(años)[1:]
+    return {
+        'investment_per_year': ((), (cube,)),
+        'investment_by_channels': ((), (cube,)),
+        'omie_month_years': (años[1:], (cube, años[1:])),
+        'sales_month_years': (años[:2], (cube, años[:2])),
+        'sales_per_year': ((), (cube,)),
+        'investment_channels_date': (CANALES, (rows, CANALES)),
+        'yoy_horizontal': ((años[:1], CANALES), (yoy.loc[años[:1], CANALES], CANALES, años[:1])),
+        'yoy_stacked': ((comparables, CANALES), (yoy.loc[comparables, CANALES],)),
+    }
+
+
+def _render(chart, args, carpeta, formats):
+    # Se ejecuta en el pool: construye la figura y la escribe en cada formato
+    from mmm import figures
+
+    fig = getattr(figures, chart)(*args)
+    escritos = []
+    for formato in formats:
+        path = os.path.join(carpeta, f'{chart}.{formato}')
+        if formato == 'html':
+            # plotly.min.js se escribe una vez por carpeta y los informes funcionan sin conexión
+            fig.write_html(path, include_plotlyjs='directory')
+        else:
+            fig.write_image(path)
+        escritos.append(path)
+    return escritos
+
+
+def _read_manifest(carpeta):
+    try:
+        with open(os.path.join(carpeta, EXPORT_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def export(targets, out_dir=OUT_DIR, formats=('html',), workers=None, force=False, progress=None):
+    """Exporta los gráficos de cada informe; devuelve {informe: {'exported', 'skipped', 'failed'}}."""
+    repetidos = sorted(nombre for nombre, n in Counter(t.name for t in targets).items() if n > 1)
+    if repetidos:
+        raise ValueError(f'Varios informes se escribirían en la misma carpeta: {", ".join(repetidos)}')
+    informe = {}
+    pendientes = []
+    for target in targets:
+        carpeta = os.path.join(out_dir, target.name)
+        os.makedirs(carpeta, exist_ok=True)
+        anterior = _read_manifest(carpeta)
+        manifest = {}
+        informe[target.name] = {'exported': [], 'skipped': [], 'failed': {}, 'manifest': manifest}
+        # Cubo y filas salen del almacén (memory-map): prepararlos es barato, lo caro es dibujar
+        for chart, (seleccion, args) in business_charts(*_inputs(target)).items():
+            clave = job_key(chart, version=target.version, formats=list(formats),
+                            selection=json.dumps(seleccion, default=int))
+            existe = all(os.path.exists(os.path.join(carpeta, f'{chart}.{f}')) for f in formats)
+            if not force and existe and anterior.get(chart) == clave:
+                manifest[chart] = clave
+                informe[target.name]['skipped'].append(chart)
+            else:
+                pendientes.append((target.name, chart, clave, args, carpeta))
+
+    if pendientes:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+            futures = {pool.submit(_render, chart, args, carpeta, formats): (nombre, chart, clave)
+                       for nombre, chart, clave, args, carpeta in pendientes}
+            for future in as_completed(futures):
+                nombre, chart, clave = futures[future]
+                try:
+                    future.result()
+                except Exception as error:  # p. ej. PNG sin kaleido: se reintenta en la próxima exportación
+                    informe[nombre]['failed'][chart] = repr(error)
+                else:
+                    informe[nombre]['manifest'][chart] = clave
+                    informe[nombre]['exported'].append(chart)
+                if progress is not None:
+                    progress(f'{nombre}/{chart}')
+
+    for target in targets:
+        manifest = informe[target.name].pop('manifest')
+        with open(os.path.join(out_dir, target.name, EXPORT_MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    return informe
+
+
+def main(argv=None):
+    from mmm.ingest import latest_source
+    from mmm.partitions import PARTITIONS_DIR
+
+    parser = argparse.ArgumentParser(description='Exporta los gráficos de la página Business sin Streamlit')
+    parser.add_argument('sources', nargs='*', help='Excel bbdd_mmm_*.xlsx (por defecto el más reciente, '
+                                                   'si no se pide el almacén particionado)')
+    parser.add_argument('--partitions', nargs='?', const=PARTITIONS_DIR, default=None,
+                        help='almacén particionado: un informe por marca/región')
+    parser.add_argument('--brands', nargs='+', default=None)
+    parser.add_argument('--regions', nargs='+', default=None)
+    parser.add_argument('--out', default=OUT_DIR)
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['html'])
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='regenera también los gráficos sin cambios')
+    args = parser.parse_args(argv)
+    if 'png' in args.formats:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            parser.error('exportar a PNG requiere kaleido (pip install "kaleido>=1")')
+
+    sources = args.sources or ([] if args.partitions else [latest_source()])
+    targets = workbook_targets(sources)
+    if args.partitions:
+        targets += partition_targets(args.partitions, args.brands, args.regions)
+    informe = export(targets, args.out, args.formats, args.workers, args.force,
+                     progress=lambda mensaje: print(mensaje, file=sys.stderr))
+    for nombre, resultado in informe.items():
+        print(f"{nombre}: {len(resultado['exported'])} exported, {len(resultado['skipped'])} unchanged, "
+              f"{len(resultado['failed'])} failed")
+        for chart, error in resultado['failed'].items():
+            print(f'  {chart}: {error}')
+    return 1 if any(r['failed'] for r in informe.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,445 @@
+# ---------------------------------------------------FIGURAS------------------------------------------------------#
+# Construcción de las figuras de Plotly de cada página, sin dependencias de Streamlit.
+# Plotly se importa dentro de cada función (como pyarrow en mmm.ingest): importar el
+# paquete no lo carga, y los workers o los procesos por lotes que solo calculan no lo pagan.
+import calendar
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from mmm.aggregates import monthly_values, yearly_totals
+from mmm.columns import CANALES, COLORES_CANALES, FECHA, OMIE, VENTAS
+from mmm.downsample import MAX_POINTS, downsample_line, downsample_stacked
+
+FIGURE_CACHE_SIZE = 256  # figuras guardadas como máximo (se descartan las menos usadas)
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, np.ndarray):
+        return tuple(value.tolist())
+    return value
+
+
+class FigureCache:
+    """Caché LRU de figuras con clave (versión de datos, id del gráfico, selecciones).
+
+    Una sola instancia se comparte entre sesiones (st.cache_resource), así que un cambio
+    en un widget solo reconstruye el gráfico que depende de él y los analistas que miran
+    la misma selección reutilizan la figura. Las figuras guardadas no deben modificarse.
+    """
+
+    def __init__(self, maxsize=FIGURE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, chart_id, selections, build, *args):
+        """Figura de build(*args), construyéndola solo si la clave no está en la caché."""
+        key = (version, chart_id, _hashable(selections))
+        with self._lock:
+            if key in self._figuras:
+                self._figuras.move_to_end(key)
+                self.hits += 1
+                return self._figuras[key]
+        # Se construye fuera del cerrojo para no bloquear a las demás sesiones
+        fig = build(*args)
+        with self._lock:
+            self.misses += 1
+            self._figuras[key] = fig
+            self._figuras.move_to_end(key)
+            while len(self._figuras) > self.maxsize:
+                self._figuras.popitem(last=False)
+        return fig
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._figuras)}
+
+    def clear(self):
+        with self._lock:
+            self._figuras.clear()
+
+
+# ---------------------------------------------------NEGOCIO------------------------------------------------------#
+
+def investment_per_year(cube):
+    import plotly.graph_objects as go
+
+    # Inversión total por año redondeada a dos decimales
+    investment_by_year = yearly_totals(cube, CANALES)
+    investment_by_year['total_investment'] = investment_by_year.sum(axis=1)
+    investment_by_year = investment_by_year.round(2)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=investment_by_year.index,  # El índice del agregado es el año
+        y=investment_by_year['total_investment'],
+        text=investment_by_year['total_investment'],
+        textposition='auto',
+    ))
+    fig.update_layout(
+        title='Investment over years',
+        xaxis_title='Year',
+        yaxis_title='Total Investment',
+        # Logarithmic scale for large ranges of values
+        yaxis=dict(type='log'),
+        plot_bgcolor='white',  # Colors of plot background
+        title_x=0.5  # Center the chart title
+    )
+    return fig
+
+
+def investment_by_channels(cube):
+    import plotly.graph_objects as go
+
+    investment_by_year_and_channel = yearly_totals(cube, CANALES)
+
+    # Cada medio como una barra apilada
+    fig = go.Figure()
+    for i, medio in enumerate(CANALES):
+        fig.add_trace(go.Bar(
+            x=investment_by_year_and_channel.index,
+            y=investment_by_year_and_channel[medio],
+            name=medio,
+            marker_color=COLORES_CANALES[i]
+        ))
+    fig.update_layout(
+        barmode='stack',  # Modo apilado para las barras
+        title='Investment by Medium Over Years',
+        xaxis_title='Year',
+        yaxis_title='Investment by Medium',
+        plot_bgcolor='white',
+        title_x=0.5  # Centrar el título del gráfico
+    )
+    return fig
+
+
+def omie_month_years(cube, selected_years):
+    import plotly.graph_objects as go
+
+    # Una línea por año con la media mensual del precio OMIE tomada del cubo
+    fig = go.Figure()
+    for year in selected_years:
+        monthly_prices = monthly_values(cube, year, OMIE, how='mean')
+        fig.add_trace(go.Scatter(
+            x=monthly_prices.index,  # El índice del cubo es el mes
+            y=monthly_prices.values,
+            mode='lines+markers',  # Líneas con marcadores
+            name=f'Precio OMIE {year}'
+        ))
+    fig.update_layout(
+        title='Valoration of OMIE price per years',
+        xaxis_title='Mes',
+        yaxis_title='Precio OMIE (€/MWh)',
+        xaxis=dict(tickmode='array', tickvals=list(range(1, 13)),
+                   ticktext=list(calendar.month_abbr[1:])),
+        yaxis=dict(tickformat=".2f"),
+        hovermode='x',  # Muestra el tooltip basado en el eje x
+        title_x=0.5  # Centrar el título del gráfico
+    )
+    return fig
+
+
+def sales_month_years(cube, selected_years):
+    import plotly.graph_objects as go
+
+    # Ventas mensuales de cada año seleccionado, en barras agrupadas
+    fig = go.Figure()
+    for year in selected_years:
+        monthly_sales = monthly_values(cube, year, VENTAS)
+        fig.add_trace(go.Bar(
+            # Nombres abreviados de los meses
+            x=[calendar.month_abbr[month] for month in monthly_sales.index],
+            y=monthly_sales.values,
+            name=f'Sales {year}'
+        ))
+    fig.update_layout(
+        title='Monthly sales by selected years',
+        xaxis_title='Month',
+        yaxis_title='Total Sales',
+        barmode='group',  # Agrupa las barras en lugar de apilarlas
+        yaxis=dict(tickformat=".2f"),
+        title_x=0.5  # Centrar el título del gráfico
+    )
+    return fig
+
+
+def sales_per_year(cube):
+    import plotly.graph_objects as go
+
+    # Ventas totales por año redondeadas a dos decimales
+    sales_by_year = yearly_totals(cube, [VENTAS])
+    sales_by_year['total_sales'] = sales_by_year.sum(axis=1)
+    sales_by_year = sales_by_year.round(2)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=sales_by_year.index,  # El índice del agregado es el año
+        y=sales_by_year['total_sales'],
+        text=sales_by_year['total_sales'],
+        textposition='auto',
+    ))
+    fig.update_layout(
+        title='Sales over years',
+        xaxis_title='Year',
+        yaxis_title='Total Sales',
+        # Escala logarítmica para grandes rangos de valores
+        yaxis=dict(type='log'),
+        plot_bgcolor='white',  # Color de fondo del gráfico
+        title_x=0.5  # Centrar el título del gráfico
+    )
+    return fig
+
+
+def investment_channels_date(filtered_data, selected_investments, max_points=MAX_POINTS):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    # Con más semanas que puntos caben en el gráfico se envían medias por tramo; al
+    # estrechar el rango de fechas se vuelve a resolver con más detalle
+    fechas, valores = filtered_data[FECHA], filtered_data[selected_investments]
+    if len(filtered_data) > max_points:
+        fechas, medias = downsample_stacked(fechas, valores, max_points)
+        valores = dict(zip(selected_investments, medias.T))
+
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    # Un área apilada por cada tipo de inversión seleccionado
+    for investment in selected_investments:
+        fig.add_trace(go.Scatter(x=fechas,
+                                 y=valores[investment],
+                                 name=investment,
+                                 mode='lines',
+                                 stackgroup='one'),  # se usa para crear el área sombreada
+                      secondary_y=False)
+    fig.update_layout(title='Investment by channels over time',
+                      xaxis_title='Fecha',
+                      yaxis_title='Inversión Total',
+                      hovermode='x unified',
+                      title_x=0.5)
+    return fig
+
+
+def yoy_horizontal(investment_diff_percentages, selected_channels, selected_years):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    increase_color = 'green'
+    decrease_color = 'GREY'
+    for channel in selected_channels:
+        for year in selected_years:
+            # Si el porcentaje es negativo, se muestra hacia la izquierda en gris, si no, hacia la derecha en verde
+            color = increase_color if investment_diff_percentages.loc[year, channel] > 0 else decrease_color
+            fig.add_trace(go.Bar(
+                y=[channel + ' ' + str(year)],
+                x=[investment_diff_percentages.loc[year, channel]],
+                name=str(year),
+                orientation='h',
+                marker_color=color
+            ))
+    fig.update_layout(
+        barmode='relative',
+        title='Yearly Percentage Difference in Advertising Investment by Channel',
+        xaxis_title='Percentage Difference',
+        # Mostrar porcentajes
+        xaxis_tickformat='%{value}%',
+        yaxis_title='Channel',
+        xaxis=dict(
+            zeroline=True,
+            zerolinewidth=2,
+            zerolinecolor='black'),
+        yaxis=dict(
+            autorange='reversed'  # Esto es para que el gráfico comience desde arriba hacia abajo
+        ))
+    return fig
+
+
+def yoy_stacked(investment_diff_percentages):
+    import plotly.graph_objects as go
+
+    # Canales como índice y años como columnas
+    investment_diff_percentages_df = investment_diff_percentages.T
+    chart_years = investment_diff_percentages_df.columns
+
+    # Cada canal como una barra apilada
+    fig = go.Figure()
+    for i, channel in enumerate(investment_diff_percentages_df.index):
+        fig.add_trace(go.Bar(
+            x=chart_years,
+            y=investment_diff_percentages_df.loc[channel],
+            name=channel,
+            marker_color=COLORES_CANALES[i]
+        ))
+    fig.update_layout(
+        barmode='stack',  # Modo apilado para las barras
+        title='Yearly Percentage Difference in Advertising Investment by Channel',
+        xaxis_title='Year',
+        yaxis_title='Percentage Difference',
+        yaxis=dict(tickformat=".2f"),
+        plot_bgcolor='white',
+        title_x=0.5,  # Centrar el título del gráfico
+    )
+    return fig
+
+
+# ---------------------------------------------------MODELO------------------------------------------------------#
+
+def media_transform(fechas, channel, series, max_points=MAX_POINTS):
+    """Líneas de un canal en cada etapa de la transformación; series: [(nombre, (T,))]."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for nombre, serie in series:
+        x, y = downsample_line(fechas, serie, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, name=nombre, mode='lines'))
+    fig.update_layout(title=f'Transformed media: {channel}',
+                      xaxis_title='Fecha',
+                      hovermode='x unified',
+                      title_x=0.5)
+    return fig
+
+
+def model_fit(fechas, target, predicted, max_points=MAX_POINTS):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for nombre, serie in (('Actual', target), ('Predicted', predicted)):
+        x, y = downsample_line(fechas, serie, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, name=nombre, mode='lines'))
+    fig.update_layout(title='Actual vs predicted sales',
+                      xaxis_title='Fecha',
+                      yaxis_title='Ventas',
+                      hovermode='x unified',
+                      title_x=0.5)
+    return fig
+
+
+def cv_folds(results):
+    """Error de validación (RMSE) de cada configuración en cada pliegue, por fecha de origen."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for label, pliegues in results.groupby('label', sort=False):
+        fig.add_trace(go.Scatter(x=pliegues['origin'], y=pliegues['rmse'], name=label,
+                                 mode='lines+markers'))
+    fig.update_layout(title='Holdout RMSE per fold',
+                      xaxis_title='Inicio de la validación',
+                      yaxis_title='RMSE (ventas)',
+                      hovermode='x unified',
+                      title_x=0.5)
+    return fig
+
+
+def roi_interval_bars(channels, low, median, high, done, total):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Bar(
+        x=channels, y=median,
+        error_y=dict(type='data', symmetric=False,
+                     array=high - median, arrayminus=median - low)))
+    fig.update_layout(title=f'ROI per channel (sales per 1000 €), 90% interval - {done}/{total} refits',
+                      yaxis_title='ROI',
+                      title_x=0.5)
+    return fig
+
+
+# ---------------------------------------------------SIMULACIÓN------------------------------------------------------#
+
+def scenario_sales(fechas, sales, max_points=MAX_POINTS):
+    """Ventas semanales del escenario base (fila 0) y del elegido (fila 1)."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for nombre, serie in (('Baseline', sales[0]), ('Scenario', sales[1])):
+        x, y = downsample_line(fechas, serie, max_points)
+        fig.add_trace(go.Scatter(x=x, y=y, name=nombre, mode='lines'))
+    fig.update_layout(title='Predicted weekly sales',
+                      xaxis_title='Fecha',
+                      yaxis_title='Ventas',
+                      hovermode='x unified',
+                      title_x=0.5)
+    return fig
+
+
+def scenario_channels(channels, contributions):
+    """Contribución total por canal (2, C) del escenario base y del elegido."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for j, nombre in enumerate(('Baseline', 'Scenario')):
+        fig.add_trace(go.Bar(x=channels, y=contributions[j], name=nombre))
+    fig.update_layout(title='Sales contribution by channel',
+                      barmode='group',
+                      yaxis_title='Ventas',
+                      title_x=0.5)
+    return fig
+
+
+def scenario_sweep(sweep_spend, sweep_sales, spend_scenario, sales_scenario):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(x=sweep_spend, y=sweep_sales, mode='markers',
+                               marker=dict(size=3, opacity=0.5), name='Scenarios'))
+    fig.add_trace(go.Scatter(x=[spend_scenario], y=[sales_scenario], mode='markers',
+                             marker=dict(size=12, color='red'), name='Current scenario'))
+    fig.update_layout(title='Investment vs predicted sales',
+                      xaxis_title='Total investment',
+                      yaxis_title='Predicted sales',
+                      title_x=0.5)
+    return fig
+
+
+# ---------------------------------------------------OPTIMIZACIÓN------------------------------------------------------#
+
+def budget_allocation(channels, historical, optimal):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=channels, y=historical, name='Historical'))
+    fig.add_trace(go.Bar(x=channels, y=optimal, name='Optimal'))
+    fig.update_layout(title='Budget allocation by channel',
+                      barmode='group',
+                      yaxis_title='Inversión',
+                      title_x=0.5)
+    return fig
+
+
+def response_curves_chart(curves, allocation, channels=CANALES):
+    """Curva de respuesta de cada canal con el reparto elegido marcado encima."""
+    import plotly.graph_objects as go
+
+    spend_grid, response_grid = curves.table()
+    respuesta = curves.response(allocation)
+    fig = go.Figure()
+    for i, channel in enumerate(channels):
+        color = COLORES_CANALES[i % len(COLORES_CANALES)]
+        fig.add_trace(go.Scatter(x=spend_grid[:, i], y=response_grid[:, i], name=channel,
+                                 mode='lines', line=dict(color=color)))
+        fig.add_trace(go.Scatter(x=[allocation[i]], y=[respuesta[i]],
+                                 mode='markers', showlegend=False,
+                                 marker=dict(size=10, color=color)))
+    fig.update_layout(title='Response curves',
+                      xaxis_title='Inversión',
+                      yaxis_title='Ventas',
+                      title_x=0.5)
+    return fig
+
+
+def frontier(budgets, frontier_sales, historical_budget, sales_historical):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=np.asarray(budgets), y=frontier_sales, mode='lines+markers',
+                             name='Optimal allocation'))
+    fig.add_trace(go.Scatter(x=[historical_budget], y=[sales_historical], mode='markers',
+                             marker=dict(size=12, color='red'), name='Historical'))
+    fig.update_layout(title='Efficient frontier',
+                      xaxis_title='Total budget',
+                      yaxis_title='Media-driven sales',
+                      title_x=0.5)
+    return fig
@@ -0,0 +1,297 @@
+# ---------------------------------------------------INGESTA------------------------------------------------------#
+# Convierte el Excel de origen a ficheros Arrow (Feather v2) tipados que se leen con
+# memory-map, sin volver a pasar por openpyxl en cada arranque.
+#
+# Cada dataset tiene un almacén en CACHE_DIR/<nombre>-<carpeta>/ (ver store_dir):
+#   manifest.json   versión, hash del último extracto, fecha máxima, partes y linaje
+#   part-NNNNN.arrow filas en orden de llegada (una parte por extracción incremental)
+#   cube.arrow      cubo año × mes (mmm.aggregates) mantenido de forma incremental
+# Cuando llega un extracto nuevo que solo añade semanas, se escriben únicamente las filas
+# nuevas y se suman al cubo; si cambia el histórico se reconstruye todo. Las filas se
+# guardan ordenadas por fecha (mmm.timeindex filtra rangos con búsqueda binaria).
+import glob
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+from mmm.aggregates import build_cube
+from mmm.columns import FECHA
+from mmm.schema import SCHEMA_VERSION, compact, validate
+
+SOURCE_PATTERN = 'bbdd_mmm_*.xlsx'
+SOURCE_PATH = 'bbdd_mmm_20240111.xlsx'
+CACHE_DIR = '.mmm_cache'
+MAX_PARTS = 16  # a partir de aquí las partes se compactan en una sola
+
+
+def source_fingerprint(path):
+    """Hash del contenido del fichero de origen (identifica la versión del dataset)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def latest_source(pattern=SOURCE_PATTERN):
+    """Extracto más reciente (los ficheros llevan la fecha AAAAMMDD en el nombre)."""
+    candidatos = sorted(glob.glob(pattern))
+    return candidatos[-1] if candidatos else SOURCE_PATH
+
+
+def dataset_name(path):
+    """Nombre estable del dataset: el del fichero sin el sufijo de fecha del extracto."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r'_\d{8}$', '', stem)
+
+
+def store_dir(path, cache_dir=CACHE_DIR):
+    """Almacén del dataset: su nombre y un hash de la carpeta real del fichero.
+
+    Los extractos fechados de una misma carpeta comparten almacén (la ingesta incremental
+    encadena uno tras otro); un fichero con el mismo nombre en otra carpeta es otro dataset.
+    """
+    carpeta = hashlib.sha1(os.path.dirname(os.path.realpath(path)).encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f'{dataset_name(path)}-{carpeta}')
+
+
+def _write_arrow(data, target):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    # Sin compresión: así el fichero se puede mapear en memoria sin copias
+    tmp = target + '.tmp'
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, target)
+
+
+def _read_table(target, columns=None):
+    import pyarrow as pa
+
+    # El mapa se mantiene vivo mientras algo referencie sus buffers; las columnas que no
+    # se seleccionan no llegan a leerse del disco
+    tabla = pa.ipc.open_file(pa.memory_map(target, 'r')).read_all()
+    return tabla.select(columns) if columns is not None else tabla
+
+
+def _read_arrow(target, columns=None):
+    return _read_table(target, columns).to_pandas(split_blocks=True)
+
+
+def read_only(data):
+    """Copia del marco con cada columna en un array de solo lectura.
+
+    Lo leído del almacén ya viene así (buffers Arrow mapeados en memoria); esto es para los
+    marcos construidos en memoria que se van a compartir entre sesiones, de modo que una
+    escritura accidental falle en lugar de modificar los datos de todos.
+    """
+    columnas = {}
+    for columna in data.columns:
+        valores = data[columna].to_numpy(copy=True)
+        valores.flags.writeable = False
+        columnas[columna] = valores
+    return pd.DataFrame(columnas, index=data.index, copy=False)
+
+
+def _read_manifest(store):
+    path = os.path.join(store, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(store, manifest):
+    path = os.path.join(store, 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _read_parts(store, manifest, columns=None):
+    import pyarrow as pa
+
+    if len(manifest['parts']) == 1:
+        return _read_arrow(os.path.join(store, manifest['parts'][0]), columns)
+    tablas = [_read_table(os.path.join(store, parte), columns) for parte in manifest['parts']]
+    if all(tabla.schema.equals(tablas[0].schema) for tabla in tablas):
+        # Las partes se unen en buffers Arrow nuevos: pandas los recibe sin copia y de
+        # solo lectura, igual que con una sola parte
+        return pa.concat_tables(tablas).combine_chunks().to_pandas(split_blocks=True)
+    # Alguna parte trae un tipo más amplio: pandas promueve las columnas al concatenar
+    return read_only(pd.concat([tabla.to_pandas() for tabla in tablas], ignore_index=True))
+
+
+def _write_cube(store, cube):
+    _write_arrow(cube.reset_index(), os.path.join(store, 'cube.arrow'))
+
+
+def _read_cube(store):
+    return _read_arrow(os.path.join(store, 'cube.arrow')).set_index(['year', 'month'])
+
+
+def read_cube(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    """Cubo año × mes guardado en el almacén del dataset.
+
+    None si no existe o si el almacén tiene ingerido otro extracto (p. ej. uno posterior de
+    la misma carpeta): hay que pasar antes por load_dataset(path).
+    """
+    store = store_dir(path, cache_dir)
+    manifest = _read_manifest(store)
+    if (manifest is None or manifest.get('schema') != SCHEMA_VERSION
+            or manifest['source_hash'] != source_fingerprint(path)
+            or not os.path.exists(os.path.join(store, 'cube.arrow'))):
+        return None
+    return _read_cube(store)
+
+
+def dataset_lineage(path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    """Versiones ingeridas de forma incremental sobre el mismo histórico (de la más antigua a la actual)."""
+    manifest = _read_manifest(store_dir(path, cache_dir))
+    return manifest['lineage'] if manifest else []
+
+
+def _rebuild(store, data, version, source_hash):
+    for nombre in os.listdir(store):
+        if nombre.endswith('.arrow'):
+            os.remove(os.path.join(store, nombre))
+    # El cubo se agrega con la precisión original; las filas se guardan compactadas
+    _write_arrow(compact(data), os.path.join(store, 'part-00000.arrow'))
+    _write_cube(store, build_cube(data))
+    _write_manifest(store, {
+        'version': version,
+        'source_hash': source_hash,
+        'last_fecha': str(data[FECHA].max()),
+        'n_rows': len(data),
+        'columns': list(data.columns),
+        'parts': ['part-00000.arrow'],
+        'lineage': [version],
+        'schema': SCHEMA_VERSION,
+    })
+
+
+def _append(store, manifest, delta, version):
+    """Añade filas nuevas al almacén: una parte más, el cubo actualizado y una versión nueva.
+
+    Los modelos ajustados no se recalculan: quedan asociados a versiones anteriores del
+    linaje y se sirven marcados como desactualizados (ver model.latest_model).
+    """
+    parte = f'part-{len(manifest["parts"]):05d}.arrow'
+    # Cada extracto infiere sus tipos; la parte nueva se guarda con el esquema de las
+    # anteriores, pero el cubo se agrega con la precisión original, como en _rebuild
+    primera = _read_table(os.path.join(store, manifest['parts'][0]))
+    _write_arrow(_as_stored(delta, primera.schema.empty_table().to_pandas().dtypes),
+                 os.path.join(store, parte))
+
+    # Las celdas del cubo son sumas y recuentos, así que basta con sumar las del delta
+    # (concat + groupby en lugar de add: las columnas enteras no pasan a float)
+    cube = pd.concat([_read_cube(store), build_cube(delta)]).groupby(level=['year', 'month']).sum()
+    _write_cube(store, cube)
+
+    manifest = dict(manifest)
+    manifest.update(version=version, last_fecha=str(delta[FECHA].max()),
+                    n_rows=manifest['n_rows'] + len(delta),
+                    parts=manifest['parts'] + [parte],
+                    lineage=manifest['lineage'] + [version])
+    if len(manifest['parts']) > MAX_PARTS:
+        data = _read_parts(store, manifest)
+        for nombre in manifest['parts']:
+            os.remove(os.path.join(store, nombre))
+        _write_arrow(data, os.path.join(store, 'part-00000.arrow'))
+        manifest['parts'] = ['part-00000.arrow']
+    _write_manifest(store, manifest)
+    return manifest
+
+
+def _as_stored(delta, dtypes):
+    """Convierte las filas nuevas a los tipos ya almacenados cuando no se pierde información.
+
+    Si una columna necesita un tipo más amplio (p. ej. aparecen decimales en una columna
+    que hasta ahora era entera) se deja como viene y se unifica al leer las partes.
+    """
+    tipado = delta.copy()
+    for columna, dtype in dtypes.items():
+        try:
+            convertida = delta[columna].astype(dtype)
+            pd.testing.assert_series_equal(convertida, delta[columna], check_dtype=False)
+        except (AssertionError, TypeError, ValueError):
+            continue
+        tipado[columna] = convertida
+    return tipado
+
+
+def _delta(stored, data):
+    """Filas de `data` posteriores a lo ya ingerido, o None si el histórico ha cambiado."""
+    if list(stored.columns) != list(data.columns):
+        return None
+    ultima = stored[FECHA].max()
+    anteriores = data[data[FECHA] <= ultima].reset_index(drop=True)
+    if len(anteriores) != len(stored):
+        return None
+    try:
+        pd.testing.assert_frame_equal(anteriores, stored.reset_index(drop=True),
+                                      check_dtype=False, check_exact=False)
+    except AssertionError:
+        return None
+    return data[data[FECHA] > ultima].reset_index(drop=True)
+
+
+def load_dataset(path=SOURCE_PATH, cache_dir=CACHE_DIR, columns=None):
+    """Devuelve (data, version), ingiriendo el extracto en el almacén columnar si es nuevo.
+
+    `columns` limita las columnas que se leen (ver schema.PAGE_COLUMNS). Las columnas de
+    `data` son de solo lectura: el marco se puede compartir entre sesiones y procesos sin
+    copias (las vistas derivadas se copian al escribir).
+    """
+    source_hash = source_fingerprint(path)
+    store = store_dir(path, cache_dir)
+    manifest = _read_manifest(store)
+    if manifest and manifest.get('schema') != SCHEMA_VERSION:
+        manifest = None  # almacén escrito con otro esquema: se reconstruye
+
+    if manifest and manifest['source_hash'] == source_hash:
+        return _read_parts(store, manifest, columns), manifest['version']
+
+    # Validación y tipado una sola vez, al ingerir
+    data = validate(pd.read_excel(path)).sort_values(FECHA, kind='stable', ignore_index=True)
+    try:
+        os.makedirs(store, exist_ok=True)
+        delta = None if manifest is None else _delta(_read_parts(store, manifest), data)
+        if delta is None:
+            # Primera ingesta, o ha cambiado el histórico (o el esquema): reconstrucción completa
+            _rebuild(store, data, source_hash, source_hash)
+            return _read_parts(store, _read_manifest(store), columns), source_hash
+        if len(delta):
+            manifest = _append(store, manifest, delta, source_hash)
+        manifest['source_hash'] = source_hash
+        _write_manifest(store, manifest)
+        return _read_parts(store, manifest, columns), manifest['version']
+    except ImportError:
+        # Sin pyarrow seguimos funcionando, solo que sin almacén columnar
+        data = compact(data)
+        return read_only(data[columns] if columns is not None else data), source_hash
+
+
+def append_rows(delta, path=SOURCE_PATH, cache_dir=CACHE_DIR):
+    """Añade al almacén un extracto que solo trae semanas nuevas; devuelve la nueva versión."""
+    store = store_dir(path, cache_dir)
+    manifest = _read_manifest(store)
+    if manifest is None:
+        raise ValueError(f'No hay datos ingeridos para {dataset_name(path)}')
+    if list(delta.columns) != manifest['columns']:
+        raise ValueError('Las columnas del extracto no coinciden con las del dataset')
+    delta = validate(delta)
+    if pd.to_datetime(delta[FECHA]).min() <= pd.Timestamp(manifest['last_fecha']):
+        raise ValueError(f"El extracto incluye fechas ya ingeridas (hasta {manifest['last_fecha']})")
+
+    delta = delta.sort_values(FECHA, kind='stable', ignore_index=True)
+
+    digest = hashlib.sha256(manifest['version'].encode())
+    digest.update(pd.util.hash_pandas_object(delta, index=False).to_numpy().tobytes())
+    version = digest.hexdigest()[:16]
+    _append(store, manifest, delta, version)
+    return version
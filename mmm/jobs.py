@@ -0,0 +1,231 @@
+# ---------------------------------------------------TRABAJOS------------------------------------------------------#
+# Cola local de trabajos en segundo plano (ajustes, bootstrap, barridos del optimizador).
+# Los trabajos se ejecutan en un pool de procesos, de modo que un rerun o un cambio de
+# página en Streamlit no los interrumpe, y su estado y resultado se guardan en disco:
+#
+#   CACHE_DIR/jobs/<clave>/status.json   estado, progreso, tiempos y error
+#   CACHE_DIR/jobs/<clave>/partial.pkl   resultado parcial (si el trabajo lo publica)
+#   CACHE_DIR/jobs/<clave>/result.pkl    resultado final
+#   CACHE_DIR/jobs/<clave>/cancel        marca de cancelación
+#
+# La clave es el hash de las entradas del trabajo: dos peticiones idénticas (de la misma
+# o de distintas sesiones) comparten un único cálculo, y un resultado ya guardado se
+# reutiliza sin volver a calcularlo. Las funciones que se encolan reciben un callback
+# `progress(fracción, parcial=None)` que lanza JobCancelled si se ha pedido cancelar.
+#
+# Las carpetas de los trabajos que ya no se ejecutan se borran al encolar uno nuevo
+# cuando tienen más de MAX_JOB_AGE o cuando pasan de MAX_JOBS (primero las más antiguas).
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mmm.ingest import CACHE_DIR
+from mmm.shared import pool_context
+
+JOBS_DIR = 'jobs'
+JOB_WORKERS = 2  # cada trabajo abre a su vez su propio pool para el cálculo
+PENDIENTES = ('queued', 'running')
+MAX_JOB_AGE = 7 * 24 * 3600  # segundos
+MAX_JOBS = 200
+
+
+class JobCancelled(Exception):
+    """Se lanza desde el callback de progreso cuando se ha pedido cancelar el trabajo."""
+
+
+def job_key(kind, **inputs):
+    """Clave de un trabajo: tipo + hash de sus entradas (arrays por contenido, objetos por pickle)."""
+    digest = hashlib.sha256(kind.encode())
+    for nombre in sorted(inputs):
+        valor = inputs[nombre]
+        digest.update(nombre.encode())
+        if isinstance(valor, np.ndarray):
+            valor = np.ascontiguousarray(valor)
+            digest.update(f'{valor.dtype.str}{valor.shape}'.encode())
+            digest.update(valor.tobytes())
+        elif isinstance(valor, (str, int, float, bool, type(None))):
+            digest.update(json.dumps(valor).encode())
+        else:
+            # Listas y dicts con arrays dentro (p. ej. configuraciones) también van por pickle
+            digest.update(pickle.dumps(valor))
+    return f'{kind}-{digest.hexdigest()[:16]}'
+
+
+def _write_json(path, contenido):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(contenido, f)
+    os.replace(tmp, path)
+
+
+def _write_pickle(path, valor):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(valor, f)
+    os.replace(tmp, path)
+
+
+def _read_pickle(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _read_status(folder):
+    try:
+        with open(os.path.join(folder, 'status.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _update_status(folder, **cambios):
+    estado = _read_status(folder) or {}
+    estado.update(cambios)
+    _write_json(os.path.join(folder, 'status.json'), estado)
+    return estado
+
+
+class _Reporter:
+    """Callback de progreso que se ejecuta en el worker (tiene que poder serializarse)."""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def __call__(self, fraction, partial=None):
+        if os.path.exists(os.path.join(self.folder, 'cancel')):
+            raise JobCancelled()
+        if partial is not None:
+            _write_pickle(os.path.join(self.folder, 'partial.pkl'), partial)
+        _update_status(self.folder, progress=float(fraction))
+
+
+def _run(folder, fn, args, kwargs):
+    # Se ejecuta en el proceso del pool; los errores quedan en status.json
+    _update_status(folder, state='running', started=time.time(), pid=os.getpid())
+    try:
+        resultado = fn(*args, progress=_Reporter(folder), **kwargs)
+    except JobCancelled:
+        _update_status(folder, state='cancelled', finished=time.time())
+        return 'cancelled'
+    except Exception as error:
+        _update_status(folder, state='failed', finished=time.time(), error=repr(error),
+                       traceback=traceback.format_exc())
+        return 'failed'
+    _write_pickle(os.path.join(folder, 'result.pkl'), resultado)
+    _update_status(folder, state='done', progress=1.0, finished=time.time())
+    return 'done'
+
+
+class JobQueue:
+    """Cola de trabajos del proceso: `key = queue.submit('fit', search, data, inputs={...})`.
+
+    `inputs` son los valores que identifican el resultado (versión de los datos y
+    parámetros); los argumentos posicionales y con nombre restantes se pasan a `fn`.
+    Un trabajo con la misma clave se reutiliza en cualquier estado (pendiente, terminado,
+    fallido o cancelado) salvo que se pida `retry=True`; los interrumpidos se relanzan.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, workers=JOB_WORKERS, max_age=MAX_JOB_AGE, max_jobs=MAX_JOBS):
+        self.root = os.path.join(cache_dir, JOBS_DIR)
+        self.workers = workers
+        self.max_age = max_age
+        self.max_jobs = max_jobs
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _folder(self, key):
+        return os.path.join(self.root, key)
+
+    def submit(self, kind, fn, *args, inputs, retry=False, **kwargs):
+        key = job_key(kind, **inputs)
+        folder = self._folder(key)
+        with self._lock:
+            estado = self.status(key)
+            if estado is not None:
+                if estado['state'] in PENDIENTES or estado['state'] == 'done':
+                    return key
+                if not retry and estado.get('error') != 'interrupted':
+                    return key
+            # Trabajo nuevo, reintentado o interrumpido (p. ej. por un reinicio del servidor)
+            self._prune(keep=key)
+            os.makedirs(folder, exist_ok=True)
+            for nombre in ('cancel', 'partial.pkl', 'result.pkl'):
+                if os.path.exists(os.path.join(folder, nombre)):
+                    os.remove(os.path.join(folder, nombre))
+            _write_json(os.path.join(folder, 'status.json'),
+                        {'kind': kind, 'state': 'queued', 'progress': 0.0, 'submitted': time.time()})
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=pool_context())
+            self._futures[key] = self._pool.submit(_run, folder, fn, args, kwargs)
+        return key
+
+    def prune(self):
+        """Borra las carpetas de los trabajos que no se están ejecutando y sobran; devuelve sus claves."""
+        with self._lock:
+            return self._prune()
+
+    def _prune(self, keep=None):
+        if not os.path.isdir(self.root):
+            return []
+        ahora = time.time()
+        parados = []
+        for key in os.listdir(self.root):
+            future = self._futures.get(key)
+            if key == keep or (future is not None and not future.done()):
+                continue
+            folder = self._folder(key)
+            estado = _read_status(folder) or {}
+            cuando = estado.get('finished') or estado.get('submitted') or os.path.getmtime(folder)
+            if estado.get('state') in PENDIENTES and ahora - cuando <= self.max_age:
+                continue  # puede estar ejecutándolo otro proceso del servidor
+            parados.append((cuando, key))
+        parados.sort(reverse=True)
+        # Se conservan los max_jobs más recientes que no hayan caducado
+        borrar = [key for i, (cuando, key) in enumerate(parados)
+                  if i >= self.max_jobs or ahora - cuando > self.max_age]
+        for key in borrar:
+            shutil.rmtree(self._folder(key), ignore_errors=True)
+            self._futures.pop(key, None)
+        return borrar
+
+    def status(self, key):
+        """Estado del trabajo (dict de status.json) o None si no existe."""
+        estado = _read_status(self._folder(key))
+        if estado is not None and estado['state'] in PENDIENTES:
+            future = self._futures.get(key)
+            if future is None or (future.done() and future.exception() is not None):
+                # Nadie lo está ejecutando en este proceso: se perdió al reiniciar o al caer el worker
+                estado = {**estado, 'state': 'failed', 'error': 'interrupted'}
+        return estado
+
+    def result(self, key):
+        return _read_pickle(os.path.join(self._folder(key), 'result.pkl'))
+
+    def partial(self, key):
+        return _read_pickle(os.path.join(self._folder(key), 'partial.pkl'))
+
+    def cancel(self, key):
+        """Pide cancelar el trabajo: si aún no ha empezado se descarta; si no, para en el próximo progreso."""
+        folder = self._folder(key)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and future.cancel():
+                _update_status(folder, state='cancelled', finished=time.time())
+            elif os.path.isdir(folder):
+                open(os.path.join(folder, 'cancel'), 'w').close()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
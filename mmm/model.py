@@ -0,0 +1,293 @@
+# ---------------------------------------------------MODELO------------------------------------------------------#
+# Regresión ridge (con coeficientes de medios no negativos) sobre los medios transformados
+# y las variables de control, con búsqueda aleatoria de los parámetros de adstock y
+# saturación por canal repartida en un pool de procesos.
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+
+from mmm.columns import CANALES, CONTROLES, VENTAS
+from mmm.ingest import CACHE_DIR
+from mmm.shared import init_worker, pool_context, share_arrays, worker_arrays
+from mmm.transforms import MAX_LAG, geometric_adstock, hill, scale_media
+
+MODELS_DIR = 'models'
+MAX_DESIGN_BYTES = 256 << 20  # memoria temporal por tarea del pool (matrices de diseño)
+
+# Rangos de la búsqueda aleatoria (medios escalados por su máximo)
+RANGOS = {
+    'decay': (0.0, 0.9),
+    'half_sat': (0.1, 1.5),
+    'slope': (0.5, 3.0),
+}
+
+
+@dataclass
+class FittedModel:
+    channels: list
+    controls: list
+    decay: np.ndarray
+    half_sat: np.ndarray
+    slope: np.ndarray
+    media_scale: np.ndarray
+    control_mean: np.ndarray
+    control_std: np.ndarray
+    y_scale: float
+    coef_media: np.ndarray
+    coef_controls: np.ndarray
+    intercept: float
+    alpha: float
+    r2: float
+    data_version: str
+    max_lag: int = MAX_LAG
+    positive: bool = True
+    stale: bool = False  # ajustado sobre una versión anterior de los datos
+    key: str = ''        # clave con la que se guardó en disco (ver model_key)
+
+    def transform(self, spend):
+        """Inversión (..., T, C) en euros -> medios tras adstock y saturación."""
+        x = np.asarray(spend, dtype=float) / self.media_scale
+        return hill(geometric_adstock(x, self.decay, self.max_lag), self.half_sat, self.slope)
+
+    def media_contributions(self, spend):
+        """Ventas atribuidas a cada canal (..., T, C)."""
+        return self.transform(spend) * (self.coef_media * self.y_scale)
+
+    def baseline(self, controls):
+        """Ventas explicadas por el intercepto y los controles (T,)."""
+        z = (np.asarray(controls, dtype=float) - self.control_mean) / self.control_std
+        return (z @ self.coef_controls + self.intercept) * self.y_scale
+
+    def predict(self, spend, controls):
+        return self.baseline(controls) + self.media_contributions(spend).sum(axis=-1)
+
+
+def design_arrays(data, controls=CONTROLES, channels=CANALES):
+    """Medios (T, C), controles (T, K) y objetivo (T,) como arrays float."""
+    media = data[channels].to_numpy(dtype=float)
+    ctrl = data[controls].to_numpy(dtype=float)
+    y = data[VENTAS].to_numpy(dtype=float)
+    return media, ctrl, y
+
+
+def standardize(ctrl):
+    mean = ctrl.mean(axis=0)
+    std = ctrl.std(axis=0)
+    std = np.where(std > 0, std, 1.0)
+    return (ctrl - mean) / std, mean, std
+
+
+def sample_candidates(n, n_channels, seed=0):
+    rng = np.random.default_rng(seed)
+    return {nombre: rng.uniform(bajo, alto, size=(n, n_channels))
+            for nombre, (bajo, alto) in RANGOS.items()}
+
+
+def batch_size(n_weeks, n_columns, copies=4, max_bytes=MAX_DESIGN_BYTES, limit=500):
+    """Ajustes por tarea para que sus matrices (lote, T, columnas) en float64 quepan en max_bytes.
+
+    `copies` es cuántas matrices de ese tamaño tiene a la vez cada ajuste (en solve_batch:
+    diseño, centrada y ponderada, más los medios transformados).
+    """
+    por_ajuste = n_weeks * n_columns * 8 * copies
+    return int(max(1, min(limit, max_bytes // por_ajuste)))
+
+
+def _nonneg_solve(gram, rhs, lower, n_iter=200, tol=1e-8):
+    """Descenso por coordenadas en lote para min b'Gb/2 - b'r con b >= lower."""
+    b = np.maximum(np.linalg.solve(gram, rhs[..., None])[..., 0], lower)
+    diag = np.diagonal(gram, axis1=-2, axis2=-1)
+    for _ in range(n_iter):
+        cambio = 0.0
+        for j in range(b.shape[-1]):
+            resto = rhs[:, j] - np.einsum('gk,gk->g', gram[:, j, :], b) + diag[:, j] * b[:, j]
+            nuevo = np.maximum(resto / diag[:, j], lower[j])
+            cambio = max(cambio, np.abs(nuevo - b[:, j]).max())
+            b[:, j] = nuevo
+        if cambio < tol:
+            break
+    return b
+
+
+def solve_batch(media_t, controls_s, y_s, alpha=1.0, positive=True, weights=None):
+    """Ajusta G regresiones a la vez. media_t: (G, T, C) -> (coef (G, p), intercepto (G,), sse (G,)).
+
+    controls_s puede ser (T, K) o (G, T, K) e y_s (T,) o (G, T). `weights` (G, T) pondera las
+    semanas de cada ajuste: 0 excluye una semana (ventanas de entrenamiento) y un entero > 1
+    la repite (remuestreo bootstrap), sin copiar ni recortar los datos.
+    """
+    n_lote, n_semanas, _ = media_t.shape
+    z = np.concatenate(
+        [media_t, np.broadcast_to(controls_s, (n_lote, n_semanas, controls_s.shape[-1]))], axis=-1)
+    y_s = np.broadcast_to(y_s, (n_lote, n_semanas))
+    if weights is None:
+        weights = np.ones((n_lote, n_semanas))
+    weights = np.broadcast_to(weights, (n_lote, n_semanas))
+    peso_total = weights.sum(axis=1, keepdims=True)
+
+    z_media = (weights[..., None] * z).sum(axis=1, keepdims=True) / peso_total[..., None]
+    y_media = (weights * y_s).sum(axis=1, keepdims=True) / peso_total
+    zc = z - z_media
+    yc = y_s - y_media
+    zw = zc * weights[..., None]
+
+    zz = np.swapaxes(zw, 1, 2) @ zc
+    rhs = (np.swapaxes(zw, 1, 2) @ yc[..., None])[..., 0]
+    n_coef = zz.shape[-1]
+    gram = zz + alpha * np.eye(n_coef)
+
+    if positive:
+        lower = np.full(n_coef, -np.inf)
+        lower[:media_t.shape[-1]] = 0.0
+        coef = _nonneg_solve(gram, rhs, lower)
+    else:
+        coef = np.linalg.solve(gram, rhs[..., None])[..., 0]
+
+    intercept = y_media[:, 0] - np.einsum('gp,gp->g', z_media[:, 0, :], coef)
+    sse = ((weights * yc ** 2).sum(axis=1) - 2 * np.einsum('gp,gp->g', coef, rhs)
+           + np.einsum('gp,gpq,gq->g', coef, zz, coef))
+    return coef, intercept, sse
+
+
+def evaluate(media_s, controls_s, y_s, decay, half_sat, slope, alpha=1.0, positive=True,
+             max_lag=MAX_LAG):
+    """Error cuadrático de cada combinación de parámetros (G, C) en una sola pasada."""
+    media_t = hill(geometric_adstock(media_s, decay, max_lag), half_sat, slope)
+    return solve_batch(media_t, controls_s, y_s, alpha, positive)[2]
+
+
+def _evaluate_chunk(start, stop, alpha, positive, max_lag):
+    a = worker_arrays
+    sse = evaluate(a['media'], a['controls'], a['y'], a['decay'][start:stop],
+                   a['half_sat'][start:stop], a['slope'][start:stop], alpha, positive, max_lag)
+    return start, sse
+
+
+def model_key(version, **params):
+    """Clave de caché: versión de los datos + hash del conjunto de parámetros."""
+    normalizados = {k: np.asarray(v).tolist() if isinstance(v, np.ndarray) else v
+                    for k, v in sorted(params.items())}
+    digest = hashlib.sha1(json.dumps(normalizados, sort_keys=True).encode()).hexdigest()
+    return f'{version}-{digest[:12]}'
+
+
+def _model_path(key, cache_dir):
+    return os.path.join(cache_dir, MODELS_DIR, f'{key}.pkl')
+
+
+def load_model(key, cache_dir=CACHE_DIR):
+    path = _model_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+    model.key = key
+    return model
+
+
+def save_model(model, key, cache_dir=CACHE_DIR):
+    path = _model_path(key, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp, path)
+
+
+def latest_model(version, cache_dir=CACHE_DIR, lineage=()):
+    """Último modelo guardado para esta versión de los datos (o None).
+
+    Si no hay ninguno y la versión viene de añadir semanas a versiones anteriores
+    (`lineage`, ver ingest.dataset_lineage), devuelve el más reciente de esas versiones
+    marcado como stale, en lugar de forzar un reajuste inmediato.
+    """
+    carpeta = os.path.join(cache_dir, MODELS_DIR)
+    if not os.path.isdir(carpeta):
+        return None
+    anteriores = [v for v in reversed(list(lineage)) if v != version]
+    for candidata in [version] + anteriores:
+        rutas = [os.path.join(carpeta, f) for f in os.listdir(carpeta)
+                 if f.startswith(f'{candidata}-') and f.endswith('.pkl')]
+        if rutas:
+            ruta = max(rutas, key=os.path.getmtime)
+            with open(ruta, 'rb') as f:
+                model = pickle.load(f)
+            model.key = os.path.basename(ruta)[:-len('.pkl')]
+            model.stale = candidata != version
+            return model
+    return None
+
+
+def fit_arrays(media, ctrl, y, decay, half_sat, slope, alpha=1.0, positive=True,
+               controls=CONTROLES, version='', max_lag=MAX_LAG, channels=CANALES):
+    """Ajuste de un único conjunto de parámetros sobre arrays en unidades originales."""
+    media_s, media_scale = scale_media(media)
+    ctrl_s, ctrl_mean, ctrl_std = standardize(ctrl)
+    y_scale = float(y.mean()) or 1.0
+    y_s = y / y_scale
+
+    media_t = hill(geometric_adstock(media_s, decay, max_lag), half_sat, slope)
+    coef, intercept, sse = solve_batch(media_t[None], ctrl_s, y_s, alpha, positive)
+    sst = ((y_s - y_s.mean()) ** 2).sum()
+    n_canales = media.shape[1]
+    return FittedModel(
+        channels=list(channels), controls=list(controls),
+        decay=np.asarray(decay, dtype=float), half_sat=np.asarray(half_sat, dtype=float),
+        slope=np.asarray(slope, dtype=float), media_scale=media_scale,
+        control_mean=ctrl_mean, control_std=ctrl_std, y_scale=y_scale,
+        coef_media=coef[0, :n_canales], coef_controls=coef[0, n_canales:],
+        intercept=float(intercept[0]), alpha=alpha, r2=float(1 - sse[0] / sst),
+        data_version=version, max_lag=max_lag, positive=positive)
+
+
+def search(data, version, n_candidates=20000, alpha=1.0, positive=True, controls=CONTROLES,
+           seed=0, workers=None, chunk_size=500, max_lag=MAX_LAG, cache_dir=CACHE_DIR,
+           progress=None, channels=CANALES):
+    """Búsqueda aleatoria de adstock/saturación por canal en paralelo; devuelve el mejor modelo.
+
+    Los workers reciben medios, controles, objetivo y candidatos por memoria compartida.
+    El resultado se guarda en disco con clave (versión de datos, parámetros de búsqueda).
+    """
+    key = model_key(version, n_candidates=n_candidates, alpha=alpha, positive=positive,
+                    controls=list(controls), seed=seed, max_lag=max_lag, channels=list(channels))
+    model = load_model(key, cache_dir)
+    if model is not None:
+        return model
+
+    media, ctrl, y = design_arrays(data, controls, channels)
+    media_s, _ = scale_media(media)
+    ctrl_s, _, _ = standardize(ctrl)
+    y_s = y / (float(y.mean()) or 1.0)
+    candidatos = sample_candidates(n_candidates, media.shape[1], seed)
+
+    sse = np.empty(n_candidates)
+    with share_arrays(media=media_s, controls=ctrl_s, y=y_s, **candidatos) as specs:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                 initializer=init_worker, initargs=(specs,)) as pool:
+            futures = [pool.submit(_evaluate_chunk, start, min(start + chunk_size, n_candidates),
+                                   alpha, positive, max_lag)
+                       for start in range(0, n_candidates, chunk_size)]
+            try:
+                for hechos, future in enumerate(as_completed(futures), 1):
+                    start, parcial = future.result()
+                    sse[start:start + len(parcial)] = parcial
+                    if progress is not None:
+                        progress(hechos / len(futures))
+            except BaseException:
+                # Error o cancelación desde `progress` (ver mmm.jobs): no se esperan las tareas pendientes
+                for future in futures:
+                    future.cancel()
+                raise
+
+    mejor = int(np.argmin(sse))
+    model = fit_arrays(media, ctrl, y, candidatos['decay'][mejor], candidatos['half_sat'][mejor],
+                       candidatos['slope'][mejor], alpha, positive, controls, version, max_lag,
+                       channels)
+    model.key = key
+    save_model(model, key, cache_dir)
+    return model
@@ -0,0 +1,321 @@
+# ---------------------------------------------------OPTIMIZACIÓN------------------------------------------------------#
+# Reparto del presupuesto entre canales maximizando las ventas previstas (o el ROI)
+# con restricciones de presupuesto total y mínimos/máximos por canal.
+#
+# Cada canal reparte su inversión total s según su calendario histórico p (normalizado a 1).
+# Como el adstock es lineal, los medios adstockados son s · k con k = adstock(p) / escala, y la
+# respuesta y su derivada son analíticas:
+#     R(s)  = β Σ_t hill(s · k_t)
+#     R'(s) = β Σ_t k_t · hill'(s · k_t)
+# Con k precalculado, evaluar cualquier reparto cuesta una pasada sobre (T, C).
+#
+# Para los sliders, R y R' se tabulan además por canal en una rejilla densa de inversión
+# (CurveTable): cada consulta es una interpolación, independiente del número de semanas.
+# La tabla se guarda junto al modelo y se refina con puntos exactos alrededor del reparto
+# elegido.
+import hashlib
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+from mmm.ingest import CACHE_DIR
+from mmm.model import _model_path, batch_size
+from mmm.transforms import geometric_adstock
+
+TABLE_POINTS = 512          # puntos de la rejilla por canal
+TABLE_MAX_MULTIPLIER = 3.0  # hasta 3 × la inversión histórica (los sliders no pasan de ahí)
+TABLE_CHUNK = 32            # puntos de la rejilla por evaluación como máximo
+FRONTIER_CHUNK = 8          # presupuestos por lote de la frontera cuando se informa del progreso
+
+
+@dataclass
+class ResponseCurves:
+    basis: np.ndarray       # k: (T, C) medios adstockados por euro invertido
+    beta: np.ndarray        # (C,) ventas por unidad de medio saturado
+    half_sat: np.ndarray
+    slope: np.ndarray
+    reference: np.ndarray   # (C,) inversión histórica en el horizonte
+
+    def _hill(self, spend):
+        x = np.asarray(spend, dtype=float)[..., None, :] * self.basis
+        xs = np.power(x, self.slope)
+        ks = np.power(self.half_sat, self.slope)
+        return x, xs, ks
+
+    def response(self, spend):
+        """Ventas atribuidas a cada canal para repartos (..., C) -> (..., C)."""
+        _, xs, ks = self._hill(spend)
+        return self.beta * (xs / (xs + ks)).sum(axis=-2)
+
+    def gradient(self, spend):
+        """Ventas marginales por euro adicional en cada canal (..., C)."""
+        x, _, ks = self._hill(spend)
+        # hill'(x) = s · x^(s-1) · K^s / (x^s + K^s)^2; con pendiente < 1 diverge en 0,
+        # así que se evalúa en un x mínimo positivo
+        x = np.maximum(x, 1e-12)
+        xs = np.power(x, self.slope)
+        derivada = self.slope * xs / x * ks / (xs + ks) ** 2
+        return self.beta * (self.basis * derivada).sum(axis=-2)
+
+    def table(self, n_points=101, max_multiplier=3.0):
+        """Curvas de respuesta en una rejilla de inversión de 0 a max_multiplier × histórico."""
+        referencia = np.where(self.reference > 0, self.reference, self.reference.max())
+        rejilla = np.linspace(0, max_multiplier, n_points)[:, None] * referencia
+        return rejilla, self.response(rejilla)
+
+
+def response_curves(model, spend, weeks=None):
+    """Precalcula la base de respuesta del modelo para el calendario de inversión dado (T, C)."""
+    spend = np.asarray(spend, dtype=float)
+    if weeks is not None:
+        spend = spend[-weeks:]
+    total = spend.sum(axis=0)
+    n_semanas = spend.shape[0]
+    # Canales sin histórico: calendario uniforme
+    patron = np.where(total > 0, spend / np.where(total > 0, total, 1.0), 1.0 / n_semanas)
+    basis = geometric_adstock(patron, model.decay, model.max_lag) / model.media_scale
+    return ResponseCurves(basis=basis, beta=model.coef_media * model.y_scale,
+                          half_sat=model.half_sat, slope=model.slope, reference=total)
+
+
+@dataclass
+class CurveTable:
+    """Respuesta R(s) y ROI marginal R'(s) tabulados por canal; se consultan interpolando.
+
+    Tiene la misma interfaz que ResponseCurves (response, gradient, reference, table), así
+    que allocate y efficient_frontier pueden trabajar sobre cualquiera de las dos.
+    """
+    spend: np.ndarray     # (N, C) rejilla creciente de inversión de cada canal
+    sales: np.ndarray     # (N, C) ventas atribuidas R(s)
+    marginal: np.ndarray  # (N, C) ventas por euro adicional R'(s)
+    reference: np.ndarray
+
+    def _lookup(self, spend):
+        spend = np.asarray(spend, dtype=float)
+        # Una búsqueda binaria por canal; R y R' se interpolan con los mismos pesos
+        derecha = np.empty(spend.shape, dtype=np.intp)
+        for c in range(self.spend.shape[1]):
+            derecha[..., c] = np.searchsorted(self.spend[:, c], spend[..., c])
+        derecha = np.clip(derecha, 1, len(self.spend) - 1)
+        canales = np.arange(self.spend.shape[1])
+        x0, x1 = self.spend[derecha - 1, canales], self.spend[derecha, canales]
+        peso = np.clip((spend - x0) / np.where(x1 > x0, x1 - x0, 1.0), 0, 1)
+
+        def interpolar(valores):
+            y0 = valores[derecha - 1, canales]
+            return y0 + peso * (valores[derecha, canales] - y0)
+
+        # Más allá de la rejilla se prolonga con la pendiente del último punto
+        exceso = np.maximum(spend - self.spend[-1], 0)
+        return interpolar(self.sales) + exceso * self.marginal[-1], interpolar(self.marginal)
+
+    def response(self, spend):
+        return self._lookup(spend)[0]
+
+    def gradient(self, spend):
+        return self._lookup(spend)[1]
+
+    def table(self, n_points=101, max_multiplier=TABLE_MAX_MULTIPLIER):
+        referencia = np.where(self.reference > 0, self.reference, self.reference.max())
+        rejilla = np.linspace(0, max_multiplier, n_points)[:, None] * referencia
+        return rejilla, self.response(rejilla)
+
+    def refine(self, curves, spend, width=0.05, n_points=17):
+        """Tabla con puntos exactos de `curves` en ±width alrededor del reparto `spend` (C,)."""
+        spend = np.asarray(spend, dtype=float)
+        # Con un canal a cero, la vecindad se mide respecto a su inversión histórica
+        radio = width * np.where(spend > 0, spend, self.reference)
+        rejilla = np.maximum(spend + np.linspace(-1, 1, n_points)[:, None] * radio, 0)
+        rejilla[n_points // 2] = spend  # el propio punto de trabajo queda exacto
+        columnas = [np.concatenate([actual, nuevo]) for actual, nuevo in
+                    ((self.spend, rejilla), (self.sales, curves.response(rejilla)),
+                     (self.marginal, curves.gradient(rejilla)))]
+        orden = np.argsort(columnas[0], axis=0, kind='stable')
+        return CurveTable(*(np.take_along_axis(c, orden, axis=0) for c in columnas),
+                          reference=self.reference)
+
+
+def _evaluation_batch(curves, limit):
+    # Repartos por evaluación de curves.response/gradient para que sus temporales (lote, T, C)
+    # quepan en model.MAX_DESIGN_BYTES (unos cinco a la vez en gradient). Una CurveTable
+    # interpola sin ese coste
+    if not isinstance(curves, ResponseCurves):
+        return limit
+    return batch_size(*curves.basis.shape, copies=5, limit=limit)
+
+
+def curve_table(curves, n_points=TABLE_POINTS, max_multiplier=TABLE_MAX_MULTIPLIER, chunk_size=None):
+    """Tabula las curvas exactas: rejilla cuadrática (densa cerca de cero, donde la curva cambia
+    más) hasta max_multiplier × la inversión histórica del canal y cola geométrica hasta
+    max_multiplier × el presupuesto histórico total, que es lo más que puede recibir un canal."""
+    total = curves.reference.sum() or 1.0
+    referencia = np.where(curves.reference > 0, curves.reference, total)
+    n_denso = n_points * 3 // 4
+    denso = np.linspace(0, 1, n_denso)[:, None] ** 2 * (max_multiplier * referencia)
+    cola = np.geomspace(max_multiplier * referencia, max_multiplier * np.maximum(total, referencia),
+                        n_points - n_denso + 1)[1:]
+    rejilla = np.concatenate([denso, cola])
+    ventas = np.empty_like(rejilla)
+    marginal = np.empty_like(rejilla)
+    # Por bloques: cada evaluación materializa (bloque, T, C)
+    if chunk_size is None:
+        chunk_size = _evaluation_batch(curves, TABLE_CHUNK)
+    for inicio in range(0, n_points, chunk_size):
+        tramo = slice(inicio, inicio + chunk_size)
+        ventas[tramo] = curves.response(rejilla[tramo])
+        marginal[tramo] = curves.gradient(rejilla[tramo])
+    return CurveTable(rejilla, ventas, marginal, curves.reference)
+
+
+def _table_path(model, spend, cache_dir):
+    # Junto al modelo: models/<clave>.curves-<hash del calendario>.npz
+    digest = hashlib.sha1(np.ascontiguousarray(spend, dtype=float).tobytes()).hexdigest()[:12]
+    return _model_path(model.key, cache_dir)[:-len('.pkl')] + f'.curves-{digest}.npz'
+
+
+def load_curve_table(model, spend, weeks=None, cache_dir=CACHE_DIR):
+    """Tabla de respuesta del modelo para el calendario de inversión (T, C) dado.
+
+    Se calcula una vez por modelo y calendario y se guarda junto al modelo en disco (los
+    modelos sin clave, que no se han guardado, la recalculan cada vez).
+    """
+    spend = np.asarray(spend, dtype=float)
+    if weeks is not None:
+        spend = spend[-weeks:]
+    path = _table_path(model, spend, cache_dir) if model.key else None
+    if path is not None and os.path.exists(path):
+        with np.load(path) as f:
+            return CurveTable(f['spend'], f['sales'], f['marginal'], f['reference'])
+    table = curve_table(response_curves(model, spend))
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, spend=table.spend, sales=table.sales, marginal=table.marginal,
+                     reference=table.reference)
+        os.replace(tmp, path)
+    return table
+
+
+def project(v, lower, upper, budget, equality=True, n_iter=60):
+    """Proyección (en lote) sobre {lower <= x <= upper, Σx = budget} (o Σx <= budget)."""
+    budget = np.asarray(budget, dtype=float)[..., None]
+    # Ningún canal puede superar el total (las cotas inferiores son >= 0); así la bisección
+    # tiene límites finitos aunque upper sea infinito
+    upper = np.minimum(upper, budget)
+    if not equality:
+        recortado = np.clip(v, lower, upper)
+        cabe = recortado.sum(axis=-1, keepdims=True) <= budget
+    # Bisección sobre τ: Σ clip(v - τ) es decreciente en τ
+    bajo = (v - upper).min(axis=-1, keepdims=True)
+    alto = (v - lower).max(axis=-1, keepdims=True)
+    for _ in range(n_iter):
+        tau = (bajo + alto) / 2
+        exceso = np.clip(v - tau, lower, upper).sum(axis=-1, keepdims=True) > budget
+        bajo = np.where(exceso, tau, bajo)
+        alto = np.where(exceso, alto, tau)
+    x = np.clip(v - alto, lower, upper)
+    if not equality:
+        x = np.where(cabe, recortado, x)
+    return x
+
+
+def allocate(curves, total_budget, lower=None, upper=None, objective='sales', x0=None,
+             max_iter=500, tol=1e-5):
+    """Reparto óptimo del presupuesto. Admite un lote de presupuestos (B,) -> (B, C).
+
+    objective='sales' reparte todo el presupuesto maximizando las ventas;
+    objective='roi' maximiza ventas / inversión gastando como mucho el presupuesto
+    (Dinkelbach: se resuelve max R(x) - q·Σx actualizando q = R/Σx).
+    x0 permite arrancar desde la solución anterior (p. ej. al mover un slider).
+    """
+    presupuestos = np.atleast_1d(np.asarray(total_budget, dtype=float))
+    n_canales = len(curves.reference)
+    lower = np.zeros(n_canales) if lower is None else np.asarray(lower, dtype=float)
+    upper = np.full(n_canales, np.inf) if upper is None else np.asarray(upper, dtype=float)
+    # Las cotas pueden ser (C,) o una por presupuesto del lote (B, C)
+    if np.any(lower.sum(axis=-1) > presupuestos + 1e-9) or (
+            objective == 'sales' and np.any(upper.sum(axis=-1) < presupuestos - 1e-9)):
+        raise ValueError('Las restricciones por canal no son compatibles con el presupuesto total')
+    if not np.any(presupuestos > 0):
+        # Sin presupuesto el único reparto posible es no invertir nada
+        x = np.zeros((len(presupuestos), n_canales))
+        return x if np.ndim(total_budget) else x[0]
+    igualdad = objective == 'sales'
+
+    if x0 is None:
+        # Arranque: reparto proporcional al histórico con una parte igual para todos los
+        # canales, para que ninguno empiece en cero (donde una curva en S no tiene gradiente)
+        igual = np.full(n_canales, 1 / n_canales)
+        historico = curves.reference / curves.reference.sum() if curves.reference.sum() > 0 else igual
+        x0 = presupuestos[:, None] * (0.9 * historico + 0.1 * igual)
+    x = project(np.broadcast_to(np.asarray(x0, dtype=float), (len(presupuestos), n_canales)),
+                lower, upper, presupuestos, igualdad)
+
+    q = np.zeros((len(presupuestos), 1))
+    for _ in range(20 if objective == 'roi' else 1):
+        x = _ascend(curves, x, q, lower, upper, presupuestos, igualdad, max_iter, tol)
+        if objective != 'roi':
+            break
+        gasto = x.sum(axis=-1, keepdims=True)
+        q_nuevo = curves.response(x).sum(axis=-1, keepdims=True) / np.where(gasto > 0, gasto, 1.0)
+        if np.allclose(q_nuevo, q, rtol=1e-4):
+            break
+        q = q_nuevo
+
+    return x if np.ndim(total_budget) else x[0]
+
+
+def _ascend(curves, x, q, lower, upper, presupuestos, igualdad, max_iter, tol):
+    """Ascenso por gradiente proyectado con paso adaptativo por fila del lote."""
+    def objetivo(x):
+        return curves.response(x).sum(axis=-1) - q[:, 0] * x.sum(axis=-1)
+
+    f = objetivo(x)
+    g = curves.gradient(x) - q
+    paso = 0.1 * presupuestos / np.maximum(np.abs(g).max(axis=-1), 1e-12)
+    # Las filas del lote con presupuesto cero están fijas en cero y paran en la primera vuelta
+    escala = np.where(presupuestos > 0, presupuestos, 1.0)
+    for _ in range(max_iter):
+        candidato = project(x + paso[:, None] * g, lower, upper, presupuestos, igualdad)
+        f_candidato = objetivo(candidato)
+        mejora = f_candidato >= f
+        cambio = np.abs(candidato - x).max(axis=-1) / escala
+        x = np.where(mejora[:, None], candidato, x)
+        f = np.where(mejora, f_candidato, f)
+        paso = np.where(mejora, paso * 1.5, paso * 0.5)
+        # Cada fila para cuando su último paso aceptado apenas mueve el reparto
+        # o cuando el paso rechazado ya es despreciable
+        quieto = np.where(mejora, cambio < tol, paso * np.abs(g).max(axis=-1) < tol * presupuestos)
+        if quieto.all():
+            break
+        g = curves.gradient(x) - q
+    return x
+
+
+def efficient_frontier(curves, budgets, lower=None, upper=None, progress=None, chunk_size=None):
+    """Ventas óptimas para cada nivel de presupuesto, resueltos en lote.
+
+    Sin `progress` se resuelven todos a la vez, salvo que las curvas exactas de muchas semanas
+    no quepan en model.MAX_DESIGN_BYTES. Con `progress` (p. ej. como trabajo en segundo plano,
+    ver mmm.jobs) se resuelven en lotes de FRONTIER_CHUNK y se informa de la fracción hecha
+    tras cada lote.
+    """
+    budgets = np.asarray(budgets, dtype=float)
+    if chunk_size is None:
+        chunk_size = _evaluation_batch(curves, max(len(budgets), 1) if progress is None else FRONTIER_CHUNK)
+
+    # Las cotas pueden ser una por presupuesto (B, C): se cortan con el lote
+    def lote(cota, tramo):
+        return cota[tramo] if cota is not None and np.ndim(cota) == 2 else cota
+
+    asignaciones = np.empty((len(budgets), len(curves.reference)))
+    ventas = np.empty(len(budgets))
+    for inicio in range(0, len(budgets), chunk_size):
+        tramo = slice(inicio, inicio + chunk_size)
+        asignaciones[tramo] = allocate(curves, budgets[tramo], lote(lower, tramo), lote(upper, tramo))
+        ventas[tramo] = curves.response(asignaciones[tramo]).sum(axis=-1)
+        if progress is not None:
+            progress(min(inicio + chunk_size, len(budgets)) / len(budgets))
+    return asignaciones, ventas
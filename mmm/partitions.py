@@ -0,0 +1,160 @@
+# ---------------------------------------------------PARTICIONES------------------------------------------------------#
+# Almacén particionado para varias marcas y regiones:
+#
+#   PARTITIONS_DIR/brand=<marca>/region=<región>/year=<aaaa>.arrow       filas del año
+#   PARTITIONS_DIR/brand=<marca>/region=<región>/year=<aaaa>.cube.arrow  cubo año × mes
+#
+# Solo se leen las particiones seleccionadas y solo cuando hacen falta: la página Business
+# trabaja con la suma de los cubos de cada partición (sumas y recuentos, así que se pueden
+# sumar) y las filas se cargan para los gráficos temporales y el modelo. Cada fichero se
+# lee una vez por proceso (memory-map) y las particiones se leen en paralelo.
+#
+#     python -m mmm.partitions bbdd_mmm_20240111.xlsx --brand marca --region total
+import argparse
+import glob
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, reduce
+
+import pandas as pd
+
+from mmm.aggregates import FILAS, build_cube
+from mmm.columns import CANALES, FECHA, VENTAS
+from mmm.ingest import _read_arrow, _write_arrow, read_only
+from mmm.schema import compact, validate
+
+PARTITIONS_DIR = os.environ.get('MMM_PARTITIONS', 'particiones')
+SUMADAS = CANALES + [VENTAS]  # al combinar particiones se suman; el resto de columnas se promedian
+_PATRON = re.compile(r'brand=([^/\\]+)[/\\]region=([^/\\]+)[/\\]year=(\d{4})\.arrow$')
+
+
+@dataclass(frozen=True)
+class Partition:
+    brand: str
+    region: str
+    year: int
+    path: str
+
+
+def discover(root=PARTITIONS_DIR):
+    """Particiones disponibles (sin leerlas), ordenadas por marca, región y año."""
+    encontradas = []
+    for path in glob.glob(os.path.join(root, 'brand=*', 'region=*', 'year=*.arrow')):
+        coincide = _PATRON.search(path)
+        if coincide:
+            encontradas.append(Partition(coincide[1], coincide[2], int(coincide[3]), path))
+    return sorted(encontradas, key=lambda p: (p.brand, p.region, p.year))
+
+
+def brands(partitions):
+    return sorted({p.brand for p in partitions})
+
+
+def regions(partitions, selected_brands=None):
+    return sorted({p.region for p in partitions
+                   if selected_brands is None or p.brand in selected_brands})
+
+
+def select(partitions, selected_brands, selected_regions, years=None):
+    return [p for p in partitions
+            if p.brand in selected_brands and p.region in selected_regions
+            and (years is None or p.year in years)]
+
+
+def selection_version(partitions):
+    """Versión de una selección: cambia si cambia cualquiera de sus ficheros."""
+    digest = hashlib.sha256()
+    for p in sorted(partitions, key=lambda p: p.path):
+        digest.update(f'{p.path}:{os.path.getmtime(p.path)}:{os.path.getsize(p.path)}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _cube_path(path):
+    return path[:-len('.arrow')] + '.cube.arrow'
+
+
+def write_partitions(data, brand, region, root=PARTITIONS_DIR):
+    """Divide el dataset de una marca/región en un fichero por año (con su cubo)."""
+    carpeta = os.path.join(root, f'brand={brand}', f'region={region}')
+    os.makedirs(carpeta, exist_ok=True)
+    data = validate(data).sort_values(FECHA, kind='stable', ignore_index=True)
+    paths = []
+    for year, filas in data.groupby(data[FECHA].dt.year):
+        path = os.path.join(carpeta, f'year={year}.arrow')
+        _write_arrow(compact(filas.reset_index(drop=True)), path)
+        _write_arrow(build_cube(filas).reset_index(), _cube_path(path))
+        paths.append(path)
+    return paths
+
+
+# Cachés por proceso con clave (ruta, mtime): un fichero reescrito se vuelve a leer
+@lru_cache(maxsize=256)
+def _rows(path, mtime, columns=None):
+    return _read_arrow(path, list(columns) if columns is not None else None)
+
+
+@lru_cache(maxsize=1024)
+def _cube(path, mtime):
+    cubo = _cube_path(path)
+    if os.path.exists(cubo):
+        return _read_arrow(cubo).set_index(['year', 'month'])
+    return build_cube(_rows(path, mtime))
+
+
+def partition_rows(partition, columns=None):
+    columns = tuple(columns) if columns is not None else None
+    return _rows(partition.path, os.path.getmtime(partition.path), columns)
+
+
+def partition_cube(partition):
+    return _cube(partition.path, os.path.getmtime(partition.path))
+
+
+def _parallel(fn, partitions, workers):
+    # Hilos: la lectura Arrow y las agregaciones de pandas liberan el GIL en buena parte,
+    # y así los resultados quedan en las cachés del proceso
+    if len(partitions) <= 1:
+        return [fn(p) for p in partitions]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, partitions))
+
+
+def combined_cube(partitions, workers=None):
+    """Cubo año × mes de la selección: suma de los cubos de cada partición."""
+    cubos = _parallel(partition_cube, partitions, workers)
+    cube = reduce(lambda a, b: a.add(b, fill_value=0), cubos).sort_index()
+    cube[FILAS] = cube[FILAS].astype(int)
+    return read_only(cube)
+
+
+def combined_rows(partitions, workers=None, columns=None):
+    """Filas semanales de la selección: medios y ventas sumados por fecha, el resto promediado."""
+    partes = _parallel(lambda p: partition_rows(p, columns), partitions, workers)
+    if len({(p.brand, p.region) for p in partitions}) == 1:
+        # Una sola marca/región: los años se concatenan sin agregar
+        return read_only(pd.concat(partes, ignore_index=True).sort_values(FECHA, ignore_index=True))
+    filas = pd.concat(partes, ignore_index=True)
+    grupos = filas.groupby(FECHA, sort=True)
+    columnas = [c for c in filas.columns if c != FECHA]
+    sumadas = [c for c in columnas if c in SUMADAS]
+    combinadas = pd.concat([grupos[sumadas].sum(),
+                            grupos[[c for c in columnas if c not in SUMADAS]].mean()], axis=1)
+    return read_only(combinadas[columnas].reset_index())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Añade un extracto al almacén particionado')
+    parser.add_argument('source', help='Excel bbdd_mmm_*.xlsx de una marca/región')
+    parser.add_argument('--brand', required=True)
+    parser.add_argument('--region', required=True)
+    parser.add_argument('--root', default=PARTITIONS_DIR)
+    args = parser.parse_args(argv)
+    for path in write_partitions(pd.read_excel(args.source), args.brand, args.region, args.root):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
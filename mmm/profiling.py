@@ -0,0 +1,111 @@
+# ---------------------------------------------------PERFILADO------------------------------------------------------#
+# Instrumentación opcional de cada rerun: tramos con nombre (tiempo y pico de memoria),
+# contadores de caché y memoria máxima del proceso. Con el perfilado desactivado los
+# tramos no hacen nada, así que la instrumentación puede quedarse en el código.
+#
+# tracemalloc es global al proceso: con varias sesiones ejecutándose a la vez los picos de
+# un tramo incluyen lo que asignen las demás. Sirve para localizar tramos pesados, no
+# como medida exacta. Por la misma razón se arranca y se para con un recuento de los
+# reruns que lo están usando: una sesión sin perfilado no lo para a otra que lo mide.
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from mmm.ingest import CACHE_DIR
+
+PROFILE_LOG = 'profile.jsonl'
+
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss viene en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Profiler:
+    """Tiempos y memoria de los tramos de un rerun: `with prof.span('kpis'): ...`."""
+
+    _lock = threading.Lock()
+    _activos = 0      # Profilers con memoria sin cerrar, de todas las sesiones del proceso
+    _tracing = False  # tracemalloc lo arrancó un Profiler (y no otra herramienta)
+
+    def __init__(self, enabled=False, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.spans = []
+        self.counters = {}
+        self._inicio = time.perf_counter()
+        if self.trace_memory:
+            with Profiler._lock:
+                if Profiler._activos == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    Profiler._tracing = True
+                Profiler._activos += 1
+
+    def close(self):
+        """Deja de usar tracemalloc; se para cuando ya no lo usa ningún Profiler (al final del rerun)."""
+        if not self.trace_memory:
+            return
+        self.trace_memory = False
+        with Profiler._lock:
+            Profiler._activos -= 1
+            if Profiler._activos == 0 and Profiler._tracing:
+                # Sin reruns perfilándose se deja de pagar el coste de tracemalloc
+                tracemalloc.stop()
+                Profiler._tracing = False
+
+    def __del__(self):
+        # Un rerun interrumpido (st.stop, st.rerun) no llega a cerrar su Profiler
+        self.close()
+
+    def span(self, name):
+        return self._span(name) if self.enabled else nullcontext()
+
+    @contextmanager
+    def _span(self, name):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            registro = {'name': name, 'seconds': time.perf_counter() - inicio}
+            if self.trace_memory:
+                _, pico = tracemalloc.get_traced_memory()
+                registro['peak_mb'] = (pico - base) / 2 ** 20
+            self.spans.append(registro)
+
+    def count(self, name, value):
+        """Guarda un contador (p. ej. aciertos de caché en este rerun)."""
+        if self.enabled:
+            self.counters[name] = value
+
+    def add(self, name, value=1):
+        """Suma al contador (p. ej. un acierto más de una caché)."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, **extra):
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'total_seconds': time.perf_counter() - self._inicio,
+            'spans': self.spans,
+            'counters': self.counters,
+            'max_rss_mb': _max_rss_mb(),
+            **extra,
+        }
+
+    def append_log(self, record, path=None):
+        """Añade el registro del rerun al log JSONL (por defecto CACHE_DIR/profile.jsonl)."""
+        path = path or os.path.join(CACHE_DIR, PROFILE_LOG)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
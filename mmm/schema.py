@@ -0,0 +1,90 @@
+# ---------------------------------------------------ESQUEMA------------------------------------------------------#
+# Tipos declarados de las columnas del dataset. Se validan y aplican una sola vez, al
+# ingerir el extracto (mmm.ingest / mmm.partitions): las páginas reciben columnas ya
+# tipadas y solo las que usan (PAGE_COLUMNS), leídas del fichero Arrow sin tocar el resto.
+#
+# Los importes se guardan en float32 y los indicadores 0/1 en int8 cuando la conversión no
+# pierde información (ver compact); si un extracto no cabe en el tipo declarado, la
+# columna conserva el suyo. Los cálculos (modelo, cubo) siguen haciéndose en float64.
+import numpy as np
+import pandas as pd
+
+from mmm.columns import CANALES, CONTROLES, FECHA, OMIE, VENTAS
+
+SCHEMA_VERSION = 1  # súbelo al cambiar SCHEMA: los almacenes existentes se reconstruyen
+FLOAT32_RTOL = 1e-6
+
+SCHEMA = {
+    FECHA: 'datetime64[ns]',
+    'festivo_navidad': 'int8',
+    'festivo_viernes_santo': 'int8',
+    'jul': 'int8',
+    'ago': 'int8',
+    'feb': 'int8',
+    'peso_festivos': 'float32',
+    'distribucion_numero_tiendas_pre_covid': 'int32',
+    'distribucion_numero_tiendas_post_covid': 'int32',
+    'coste_unitario_stores_cust_serv': 'float32',
+    'exog_ucrania': 'int8',
+    OMIE: 'float32',
+    'trafico_visitas_totales_store': 'int32',
+    **{canal: 'float32' for canal in CANALES},
+    VENTAS: 'float32',
+}
+
+REQUIRED = [FECHA, VENTAS] + CANALES + CONTROLES
+
+# Columnas que lee cada página (la Business toma el resto del cubo año × mes)
+PAGE_COLUMNS = {
+    'Business': [FECHA] + CANALES,
+    'Model': [FECHA] + CANALES + CONTROLES + [VENTAS],
+    'Simulation': [FECHA] + CANALES + CONTROLES + [VENTAS],
+    'Optimization': [FECHA] + CANALES + CONTROLES + [VENTAS],
+}
+
+
+def validate(data):
+    """Comprueba columnas obligatorias y tipos; devuelve el marco con fecha como datetime64.
+
+    Lanza ValueError con todos los problemas encontrados.
+    """
+    problemas = [f'falta la columna {c}' for c in REQUIRED if c not in data.columns]
+    data = data.copy()
+    if FECHA in data.columns:
+        try:
+            data[FECHA] = pd.to_datetime(data[FECHA])
+        except (ValueError, TypeError) as error:
+            problemas.append(f'{FECHA} no es una fecha: {error}')
+    for columna, dtype in SCHEMA.items():
+        if columna in data.columns and columna != FECHA and not pd.api.types.is_numeric_dtype(data[columna]):
+            problemas.append(f'{columna} debería ser numérica ({dtype}) y es {data[columna].dtype}')
+    if problemas:
+        raise ValueError('El extracto no cumple el esquema: ' + '; '.join(problemas))
+    return data
+
+
+def _fits(valores, dtype):
+    dtype = np.dtype(dtype)
+    if valores.isna().any():
+        return dtype.kind == 'f'
+    if dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        enteros = (valores == np.round(valores)).all() if valores.dtype.kind == 'f' else True
+        return bool(enteros and valores.min() >= info.min and valores.max() <= info.max)
+    if dtype.kind == 'f':
+        origen = valores.to_numpy(dtype=float)
+        return bool(np.allclose(origen.astype(dtype), origen, rtol=FLOAT32_RTOL, atol=0))
+    return True
+
+
+def compact(data):
+    """Aplica los tipos declarados donde no se pierde información; texto -> category."""
+    tipos = {}
+    for columna in data.columns:
+        valores = data[columna]
+        dtype = SCHEMA.get(columna)
+        if dtype is not None and columna != FECHA and len(valores) and _fits(valores, dtype):
+            tipos[columna] = dtype
+        elif dtype is None and valores.dtype == object:
+            tipos[columna] = 'category'
+    return data.astype(tipos)
@@ -0,0 +1,102 @@
+# ---------------------------------------------------MEMORIA COMPARTIDA------------------------------------------------------#
+# Reparto de arrays NumPy a los procesos del pool sin serializarlos: el proceso principal
+# copia cada array una vez a un bloque de memoria compartida y los workers lo mapean.
+import multiprocessing
+import sys
+import threading
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Bloques abiertos en este proceso; hay que mantener la referencia mientras se usen las vistas
+_bloques = {}
+_arrays = {}
+
+
+_main_lock = threading.Lock()
+
+
+class _WorkerProcess(multiprocessing.context.SpawnProcess):
+    # Un proceso 'spawn' vuelve a importar el __main__ del padre. Bajo `streamlit run` ese
+    # __main__ es herramienta.py, ejecutado por ruta, y cada worker ejecutaría la app entera
+    # (Streamlit, plotly, carga de datos) antes de su primera tarea. Las tareas de los pools
+    # viven en el paquete mmm, así que un __main__ ejecutado por ruta se oculta al arrancar
+    # el proceso. Uno importado como módulo (`python -m mmm.export`) se deja: el worker lo
+    # importa por nombre, sin ejecutar su bloque `if __name__ == '__main__'`, y las tareas
+    # definidas en él siguen pudiendo deserializarse.
+    def start(self):
+        main = sys.modules['__main__']
+        if getattr(main, '__spec__', None) is not None or not hasattr(main, '__file__'):
+            super().start()
+            return
+        with _main_lock:
+            ruta = main.__dict__.pop('__file__')
+            try:
+                super().start()
+            finally:
+                main.__file__ = ruta
+
+
+class _WorkerContext(multiprocessing.context.SpawnContext):
+    Process = _WorkerProcess
+
+
+_contexto = _WorkerContext()
+
+
+def pool_context():
+    # 'spawn' en lugar de 'fork': hacer fork de un servidor Streamlit con hilos no es seguro
+    return _contexto
+
+
+@contextmanager
+def share_arrays(**arrays):
+    """Copia los arrays a memoria compartida y devuelve sus descriptores {nombre: (bloque, forma, dtype)}.
+
+    Los bloques se liberan al salir del contexto.
+    """
+    bloques = []
+    specs = {}
+    try:
+        for nombre, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            bloques.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            specs[nombre] = (shm.name, array.shape, array.dtype.str)
+        yield specs
+    finally:
+        for shm in bloques:
+            shm.close()
+            shm.unlink()
+
+
+def _attach(nombre_bloque):
+    # Los workers 'spawn' comparten el resource tracker del proceso principal, que es
+    # quien libera el bloque; en 3.13+ se evita además registrarlo desde el worker
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nombre_bloque, track=False)
+    return shared_memory.SharedMemory(name=nombre_bloque)
+
+
+def attach_arrays(specs):
+    """Vistas de solo lectura sobre los bloques descritos por `specs` (se reutilizan en el proceso)."""
+    arrays = {}
+    for nombre, (nombre_bloque, forma, dtype) in specs.items():
+        if nombre_bloque not in _bloques:
+            _bloques[nombre_bloque] = _attach(nombre_bloque)
+            vista = np.ndarray(forma, dtype=np.dtype(dtype), buffer=_bloques[nombre_bloque].buf)
+            vista.flags.writeable = False
+            _arrays[nombre_bloque] = vista
+        arrays[nombre] = _arrays[nombre_bloque]
+    return arrays
+
+
+# Arrays mapeados por init_worker, accesibles desde las funciones que ejecuta el pool
+worker_arrays = {}
+
+
+def init_worker(specs):
+    """Initializer del pool: mapea los bloques una vez por worker."""
+    worker_arrays.update(attach_arrays(specs))
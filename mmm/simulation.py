@@ -0,0 +1,143 @@
+# ---------------------------------------------------SIMULACIÓN------------------------------------------------------#
+# Evaluación de escenarios de presupuesto contra el modelo ajustado. Los escenarios se
+# representan como un único array (escenarios × semanas × canales) y se puntúan todos
+# en la misma llamada vectorizada.
+import numpy as np
+
+from mmm.model import batch_size
+from mmm.transforms import geometric_adstock, hill
+
+CHUNK_SIZE = 1024  # escenarios por bloque como máximo
+
+
+def _chunk_size(n_semanas, n_canales):
+    # Escenarios por bloque para que sus temporales quepan en model.MAX_DESIGN_BYTES: cada
+    # uno tiene vivos a la vez unos cinco arrays (T, C) (medios, potencia, suma, cociente y
+    # contribución)
+    return batch_size(n_semanas, n_canales, copies=5, limit=CHUNK_SIZE)
+
+
+def _plan(n_canales, multipliers, shifts, paused):
+    """Factor de inversión (S, C) y desplazamientos (S, C) con los valores por defecto rellenos."""
+    dados = [np.asarray(a) for a in (multipliers, shifts, paused) if a is not None]
+    n_escenarios = dados[0].shape[0] if dados else 1
+    if multipliers is None:
+        multipliers = np.ones((n_escenarios, n_canales))
+    if shifts is None:
+        shifts = np.zeros((n_escenarios, n_canales), dtype=int)
+    if paused is None:
+        paused = np.zeros((n_escenarios, n_canales), dtype=bool)
+    factor = np.asarray(multipliers, dtype=float) * ~np.asarray(paused, dtype=bool)
+    return factor, np.asarray(shifts, dtype=int)
+
+
+def build_scenarios(spend, multipliers=None, shifts=None, paused=None):
+    """Escenarios (S, T, C) a partir de la inversión histórica (T, C).
+
+    multipliers: (S, C) factor sobre la inversión de cada canal.
+    shifts:      (S, C) semanas que se desplaza la planificación (positivo = más tarde);
+                 las semanas que quedan fuera del histórico se rellenan con cero.
+    paused:      (S, C) booleano, canal apagado en el escenario.
+    """
+    spend = np.asarray(spend, dtype=float)
+    n_semanas, n_canales = spend.shape
+    factor, shifts = _plan(n_canales, multipliers, shifts, paused)
+
+    origen = np.arange(n_semanas)[None, :, None] - shifts[:, None, :]
+    dentro = (origen >= 0) & (origen < n_semanas)
+    escenarios = spend[np.clip(origen, 0, n_semanas - 1), np.arange(n_canales)] * dentro
+    return escenarios * factor[:, None, :]
+
+
+def simulate(model, scenarios, controls, totals=False, chunk_size=None):
+    """Ventas previstas y contribución por canal de cada escenario.
+
+    Con totals=False devuelve (ventas (S, T), contribuciones (S, T, C)); con totals=True
+    devuelve las sumas sobre las semanas (ventas (S,), contribuciones (S, C)) sin
+    materializar los arrays semanales completos, por bloques de chunk_size escenarios
+    (por defecto, los que caben en model.MAX_DESIGN_BYTES).
+    """
+    scenarios = np.asarray(scenarios, dtype=float)
+    base = model.baseline(controls)
+    n_escenarios = scenarios.shape[0]
+
+    if not totals:
+        contribuciones = model.media_contributions(scenarios)
+        return base + contribuciones.sum(axis=-1), contribuciones
+
+    if chunk_size is None:
+        chunk_size = _chunk_size(*scenarios.shape[1:])
+    ventas = np.empty(n_escenarios)
+    contribuciones = np.empty((n_escenarios, scenarios.shape[-1]))
+    for start in range(0, n_escenarios, chunk_size):
+        bloque = model.media_contributions(scenarios[start:start + chunk_size]).sum(axis=-2)
+        contribuciones[start:start + chunk_size] = bloque
+        ventas[start:start + chunk_size] = base.sum() + bloque.sum(axis=-1)
+    return ventas, contribuciones
+
+
+def simulate_totals(table, base_total, multipliers=None, paused=None):
+    """Ventas totales (S,) y contribuciones (S, C) interpolando la tabla de respuesta.
+
+    `table` es la optimizer.CurveTable del modelo sobre todo el histórico y `base_total`
+    la suma de model.baseline(controls). Sin desplazamientos, la contribución de un canal
+    solo depende de su inversión total, así que cada escenario cuesta una interpolación
+    por canal en lugar del adstock y la saturación de todas las semanas.
+    """
+    contribuciones, _ = channel_response(table, multipliers, paused)
+    return base_total + contribuciones.sum(axis=-1), contribuciones
+
+
+def channel_response(table, multipliers=None, paused=None):
+    """Contribución (S, C) y ventas por euro adicional (S, C) de cada canal según la tabla.
+
+    Es lo que muestra cada slider de la página Simulation (sin desplazamientos).
+    """
+    factor, _ = _plan(len(table.reference), multipliers, None, paused)
+    gasto = factor * table.reference
+    return table.response(gasto), table.gradient(gasto)
+
+
+def simulate_plan(model, spend, controls, multipliers=None, shifts=None, paused=None,
+                  totals=True, chunk_size=None):
+    """Igual que simulate(build_scenarios(...)) pero sin recalcular el adstock por escenario.
+
+    El adstock es lineal: adstock(m · x) = m · adstock(x). Basta con calcularlo una vez por
+    cada desplazamiento distinto y escalarlo, de modo que cada escenario solo cuesta la
+    saturación. Es la vía que usan los sliders y los barridos de miles de escenarios; la
+    saturación se evalúa por bloques de chunk_size escenarios, como en simulate.
+    """
+    spend = np.asarray(spend, dtype=float)
+    n_semanas, n_canales = spend.shape
+    factor, shifts = _plan(n_canales, multipliers, shifts, paused)
+    n_escenarios = factor.shape[0]
+
+    # Adstock de la inversión desplazada, una vez por desplazamiento distinto: (K, C, T)
+    desplazamientos = np.unique(shifts)
+    desplazada = build_scenarios(spend, shifts=np.repeat(desplazamientos[:, None], n_canales, axis=1))
+    adstocked = np.swapaxes(
+        geometric_adstock(desplazada / model.media_scale, model.decay, model.max_lag), 1, 2)
+    posicion = np.searchsorted(desplazamientos, shifts)
+    canales = np.arange(n_canales)
+    escala = model.coef_media * model.y_scale
+    base = model.baseline(controls)
+
+    if chunk_size is None:
+        chunk_size = _chunk_size(n_semanas, n_canales)
+    if totals:
+        ventas = np.empty(n_escenarios)
+        contribuciones = np.empty((n_escenarios, n_canales))
+    else:
+        ventas = np.empty((n_escenarios, n_semanas))
+        contribuciones = np.empty((n_escenarios, n_semanas, n_canales))
+    for start in range(0, n_escenarios, chunk_size):
+        stop = min(start + chunk_size, n_escenarios)
+        medios = adstocked[posicion[start:stop], canales] * factor[start:stop, :, None]
+        bloque = hill(np.swapaxes(medios, 1, 2), model.half_sat, model.slope) * escala
+        if totals:
+            contribuciones[start:stop] = bloque.sum(axis=1)
+            ventas[start:stop] = base.sum() + contribuciones[start:stop].sum(axis=1)
+        else:
+            contribuciones[start:stop] = bloque
+            ventas[start:stop] = base + bloque.sum(axis=-1)
+    return ventas, contribuciones
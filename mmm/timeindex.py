@@ -0,0 +1,31 @@
+# ---------------------------------------------------ÍNDICE TEMPORAL------------------------------------------------------#
+# Los datos se guardan ordenados por fecha (ver mmm.ingest), así que un rango de fechas
+# es siempre un tramo contiguo de filas. El índice guarda las fechas como datetime64;
+# filtrar es una búsqueda binaria (O(log n)) y un data.iloc[tramo] sin construir máscaras
+# sobre toda la columna. Los filtros por año y mes de la página Business van sobre el
+# cubo (mmm.aggregates), no sobre las filas.
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from mmm.columns import FECHA
+
+
+@dataclass(frozen=True)
+class TimeIndex:
+    fechas: np.ndarray  # (T,) datetime64[ns] ordenadas
+
+    def date_slice(self, start, end):
+        """Tramo de filas con start <= fecha <= end (ambos incluidos)."""
+        inicio = np.searchsorted(self.fechas, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        fin = np.searchsorted(self.fechas, np.datetime64(pd.Timestamp(end), 'ns'), side='right')
+        return slice(int(inicio), int(max(inicio, fin)))
+
+
+def build_time_index(data):
+    """Índice temporal de un DataFrame ordenado por fecha (ValueError si no lo está)."""
+    fechas = data[FECHA].to_numpy(dtype='datetime64[ns]')
+    if len(fechas) > 1 and (fechas[1:] < fechas[:-1]).any():
+        raise ValueError(f'Los datos deben estar ordenados por {FECHA}')
+    return TimeIndex(fechas=fechas)
@@ -0,0 +1,112 @@
+# ---------------------------------------------------TRANSFORMACIONES------------------------------------------------------#
+# Adstock (geométrico / Weibull) y saturación (Hill / logística) vectorizados con NumPy.
+#
+# Convención de dimensiones:
+#   - medios:     (..., T, C)  semanas × canales, con dimensiones de lote delante
+#   - parámetros: (..., C)     un valor por canal, con las mismas dimensiones de lote
+# De esta forma una rejilla de G combinaciones de parámetros (G, C) sobre los datos (T, C)
+# se transforma en una única operación que devuelve (G, T, C).
+import numpy as np
+
+MAX_LAG = 13  # semanas de arrastre que se tienen en cuenta por defecto
+
+
+def scale_media(x):
+    """Escala cada canal por su máximo; devuelve (x_escalado, escala)."""
+    x = np.asarray(x, dtype=float)
+    escala = x.max(axis=-2)
+    escala = np.where(escala > 0, escala, 1.0)
+    return x / escala[..., None, :], escala
+
+
+def geometric_weights(decay, max_lag=MAX_LAG):
+    """Pesos decay**l para l = 0..max_lag-1 -> (..., L, C)."""
+    decay = np.asarray(decay, dtype=float)
+    lags = np.arange(max_lag, dtype=float)[:, None]
+    return decay[..., None, :] ** lags
+
+
+def weibull_weights(shape, scale, max_lag=MAX_LAG, kind='cdf'):
+    """Pesos Weibull -> (..., L, C).
+
+    kind='cdf' usa la función de supervivencia (decaimiento monótono, peso 1 en el retardo 0);
+    kind='pdf' usa la densidad normalizada a máximo 1 (permite efecto retardado).
+    `scale` es relativo a max_lag (0-1).
+    """
+    shape = np.asarray(shape, dtype=float)[..., None, :]
+    lam = np.maximum(np.asarray(scale, dtype=float), 1e-6)[..., None, :] * max_lag
+    lags = np.arange(max_lag, dtype=float)[:, None]
+    if kind == 'cdf':
+        return np.exp(-(lags / lam) ** shape)
+    if kind == 'pdf':
+        x = lags + 1
+        pdf = (shape / lam) * (x / lam) ** (shape - 1) * np.exp(-(x / lam) ** shape)
+        maximo = pdf.max(axis=-2, keepdims=True)
+        return pdf / np.where(maximo > 0, maximo, 1.0)
+    raise ValueError(f"kind debe ser 'cdf' o 'pdf', no {kind!r}")
+
+
+def _lagged(x, n_lags):
+    """Vista (..., C, L, T) de los medios desplazados 0..L-1 semanas (solo se copia el relleno)."""
+    xt = np.swapaxes(x, -1, -2)
+    ceros = np.zeros(xt.shape[:-1] + (n_lags - 1,), dtype=xt.dtype)
+    pad = np.concatenate([ceros, xt], axis=-1)
+    ventanas = np.lib.stride_tricks.sliding_window_view(pad, x.shape[-2], axis=-1)
+    return ventanas[..., ::-1, :]
+
+
+def adstock(x, weights):
+    """Convolución causal de los medios con los pesos por retardo.
+
+    x: (..., T, C), weights: (..., L, C) -> (..., T, C) con las dimensiones de lote difundidas.
+    """
+    x = np.asarray(x)
+    weights = np.asarray(weights)
+    n_semanas, n_canales = x.shape[-2:]
+    n_lags = min(weights.shape[-2], n_semanas)
+    weights = weights[..., :n_lags, :]
+    dtype = np.result_type(x, weights)
+
+    if x.ndim == 2:
+        # Mismos medios para todo el lote de parámetros: un producto matricial por canal
+        # (C, G, L) @ (C, L, T) -> (C, G, T), que va directo a BLAS
+        lote = weights.shape[:-2]
+        w = np.moveaxis(weights, -1, 0).reshape(n_canales, -1, n_lags).astype(dtype, copy=False)
+        out = w @ _lagged(x.astype(dtype, copy=False), n_lags)
+        return np.moveaxis(out.reshape((n_canales,) + lote + (n_semanas,)), 0, -1)
+
+    # Medios con lote propio (p. ej. escenarios): se recorre solo el eje de retardos,
+    # trabajando en disposición (..., C, T) para que el bucle interno sea sobre semanas
+    xt = np.ascontiguousarray(np.swapaxes(x, -1, -2))
+    wt = np.swapaxes(weights, -1, -2)
+    lote = np.broadcast_shapes(xt.shape[:-2], wt.shape[:-2])
+    out = np.zeros(lote + xt.shape[-2:], dtype=dtype)
+    tmp = np.empty_like(out)
+    for lag in range(n_lags):
+        destino = out[..., lag:]
+        parcial = tmp[..., lag:]
+        np.multiply(wt[..., lag:lag + 1], xt[..., :n_semanas - lag], out=parcial)
+        np.add(destino, parcial, out=destino)
+    return np.swapaxes(out, -1, -2)
+
+
+def geometric_adstock(x, decay, max_lag=MAX_LAG):
+    return adstock(x, geometric_weights(decay, max_lag))
+
+
+def weibull_adstock(x, shape, scale, max_lag=MAX_LAG, kind='cdf'):
+    return adstock(x, weibull_weights(shape, scale, max_lag, kind))
+
+
+def hill(x, half_sat, slope):
+    """Saturación de Hill x^s / (x^s + k^s), parámetros (..., C) sobre x (..., T, C)."""
+    slope = np.asarray(slope, dtype=float)[..., None, :]
+    half_sat = np.asarray(half_sat, dtype=float)[..., None, :]
+    xs = np.power(x, slope)
+    return xs / (xs + np.power(half_sat, slope))
+
+
+def logistic(x, lam):
+    """Saturación logística (1 - e^(-λx)) / (1 + e^(-λx))."""
+    e = np.exp(-np.asarray(lam, dtype=float)[..., None, :] * x)
+    return (1 - e) / (1 + e)
@@ -0,0 +1,98 @@
+# ---------------------------------------------------INCERTIDUMBRE------------------------------------------------------#
+# Intervalos de confianza del ROI por canal mediante reajustes del modelo en un pool de procesos:
+#   - bootstrap por bloques móviles (respeta la autocorrelación semanal)
+#   - reajuste con origen móvil (ventanas de entrenamiento crecientes)
+# Los parámetros de adstock/saturación se mantienen fijos, así que la matriz de diseño
+# transformada se calcula una vez y los workers la leen de memoria compartida. Cada réplica
+# es solo un vector de pesos por semana sobre esa matriz (ver model.solve_batch).
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+
+import numpy as np
+
+from mmm.model import design_arrays, solve_batch, standardize
+from mmm.shared import init_worker, pool_context, share_arrays, worker_arrays
+
+BLOCK_LENGTH = 8  # semanas por bloque en el bootstrap
+CHUNK_SIZE = 25   # réplicas por tarea del pool
+
+
+def block_bootstrap_weights(n_weeks, n_replicates, block_length=BLOCK_LENGTH, seed=0):
+    """Pesos (R, T): cuántas veces aparece cada semana en cada remuestreo por bloques móviles."""
+    rng = np.random.default_rng(seed)
+    n_bloques = -(-n_weeks // block_length)
+    inicios = rng.integers(0, n_weeks - block_length + 1, size=(n_replicates, n_bloques))
+    semanas = (inicios[..., None] + np.arange(block_length)).reshape(n_replicates, -1)[:, :n_weeks]
+    pesos = np.zeros((n_replicates, n_weeks))
+    np.add.at(pesos, (np.arange(n_replicates)[:, None], semanas), 1.0)
+    return pesos
+
+
+def rolling_origin_weights(n_weeks, min_train=104, step=4):
+    """Pesos (R, T) de ventanas de entrenamiento crecientes [0, origen)."""
+    origenes = np.arange(min(min_train, n_weeks), n_weeks + 1, step)
+    return (np.arange(n_weeks)[None, :] < origenes[:, None]).astype(float)
+
+
+def _refit_chunk(start, stop, alpha, positive):
+    a = worker_arrays
+    pesos = a['weights'][start:stop]
+    media_t = np.broadcast_to(a['media'], (len(pesos),) + a['media'].shape)
+    coef, _, _ = solve_batch(media_t, a['controls'], a['y'], alpha, positive, weights=pesos)
+    # ROI = ventas atribuidas en todo el histórico / inversión total del canal
+    n_canales = a['media'].shape[1]
+    roi = coef[:, :n_canales] * a['media_sum'] / a['spend']
+    return start, roi
+
+
+def refit_roi(model, data, weights, workers=None, chunk_size=CHUNK_SIZE):
+    """Reajusta el modelo con cada fila de `weights` (R, T) y va devolviendo el ROI.
+
+    Es un generador: produce (hechas, total, roi) cada vez que termina una tarea, con roi
+    (R, C) actualizado en el sitio y NaN en las réplicas pendientes, para que la interfaz
+    pueda ir mostrando los intervalos a medida que llegan. El ROI son ventas por euro.
+    """
+    media, ctrl, y = design_arrays(data, model.controls, model.channels)
+    media_t = model.transform(media)
+    ctrl_s, _, _ = standardize(ctrl)
+    spend = media.sum(axis=0)
+
+    n_replicas = len(weights)
+    roi = np.full((n_replicas, media.shape[1]), np.nan)
+    with share_arrays(media=media_t, controls=ctrl_s, y=y / model.y_scale, weights=weights,
+                      media_sum=media_t.sum(axis=0) * model.y_scale,
+                      spend=np.where(spend > 0, spend, np.inf)) as specs:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                   initializer=init_worker, initargs=(specs,))
+        try:
+            futures = [pool.submit(_refit_chunk, start, min(start + chunk_size, n_replicas),
+                                   model.alpha, model.positive)
+                       for start in range(0, n_replicas, chunk_size)]
+            hechas = 0
+            for future in as_completed(futures):
+                start, parcial = future.result()
+                roi[start:start + len(parcial)] = parcial
+                hechas += len(parcial)
+                yield hechas, n_replicas, roi
+        finally:
+            # Si el consumidor deja de iterar, se descartan las tareas pendientes
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def roi_replicates(model, data, weights, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """ROI (R, C) de todas las réplicas; `progress(fracción, roi)` recibe los resultados parciales.
+
+    Versión de refit_roi para ejecutar como trabajo en segundo plano (ver mmm.jobs).
+    """
+    roi = None
+    with closing(refit_roi(model, data, weights, workers, chunk_size)) as reajustes:
+        for hechas, total, roi in reajustes:
+            if progress is not None:
+                progress(hechas / total, roi)
+    return roi
+
+
+def roi_intervals(roi, level=0.9):
+    """Mediana e intervalo central por canal ignorando las réplicas pendientes (NaN)."""
+    cola = (1 - level) / 2 * 100
+    return np.nanpercentile(roi, [cola, 50, 100 - cola], axis=0)
@@ -0,0 +1,155 @@
+# ---------------------------------------------------VALIDACIÓN------------------------------------------------------#
+# Validación cruzada temporal con origen móvil para elegir entre configuraciones del
+# modelo (parámetros de adstock/saturación y alpha del ridge). Cada pliegue entrena con
+# las semanas anteriores a su origen (ventana creciente, o de tamaño fijo con `window`)
+# y mide el error en las `horizon` semanas siguientes.
+#
+# Cada pliegue reproduce un ajuste independiente (model.fit_arrays) sobre su ventana de
+# entrenamiento: la escala de los medios, la media y desviación de los controles y la
+# escala de las ventas salen solo de esas semanas, nunca de las de validación.
+#
+# El adstock es causal (la semana t solo depende de las anteriores) y lineal, así que el
+# de la serie completa sin escalar se calcula una vez por configuración y cada pliegue
+# solo lo divide por su escala antes de la saturación; las semanas de entrenamiento son un
+# vector de pesos (ver model.solve_batch). Con `window`, el adstock de las primeras semanas
+# de la ventana incluye el arrastre de la inversión anterior, como en producción.
+# Configuraciones × bloques de pliegues se reparten en un pool de procesos que lee los
+# arrays de memoria compartida.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from mmm.columns import CANALES, CONTROLES, FECHA
+from mmm.model import batch_size, design_arrays, solve_batch, standardize
+from mmm.shared import init_worker, pool_context, share_arrays, worker_arrays
+from mmm.transforms import MAX_LAG, geometric_adstock, hill, scale_media
+
+HORIZON = 13      # semanas de validación tras cada origen
+CHUNK_SIZE = 8    # pliegues por tarea del pool como mucho (menos si no caben en memoria)
+
+
+def fold_weights(n_weeks, min_train=104, horizon=HORIZON, step=4, window=None):
+    """Orígenes (F,) y pesos de entrenamiento y validación (F, T) de cada pliegue.
+
+    El pliegue con origen o entrena con [o - window, o) (o [0, o) si window es None) y
+    se valida en [o, o + horizon).
+    """
+    origenes = np.arange(min_train, n_weeks - horizon + 1, step)
+    semanas = np.arange(n_weeks)[None, :]
+    train = (semanas >= _train_starts(origenes, window)[:, None]) & (semanas < origenes[:, None])
+    holdout = (semanas >= origenes[:, None]) & (semanas < origenes[:, None] + horizon)
+    return origenes, train.astype(float), holdout.astype(float)
+
+
+def _train_starts(origenes, window):
+    return np.zeros_like(origenes) if window is None else np.maximum(origenes - window, 0)
+
+
+def _fold_scales(media, ctrl, y, inicios, origenes):
+    """Escalas de cada pliegue calculadas solo con su ventana de entrenamiento (como fit_arrays)."""
+    escalas = np.empty((len(origenes), media.shape[1]))
+    medias = np.empty((len(origenes), ctrl.shape[1]))
+    desviaciones = np.empty_like(medias)
+    y_escala = np.empty(len(origenes))
+    for f, (inicio, origen) in enumerate(zip(inicios, origenes)):
+        _, escalas[f] = scale_media(media[inicio:origen])
+        _, medias[f], desviaciones[f] = standardize(ctrl[inicio:origen])
+        y_escala[f] = float(y[inicio:origen].mean()) or 1.0
+    return escalas, medias, desviaciones, y_escala
+
+
+def config_label(config):
+    if 'label' in config:
+        return config['label']
+    return f"alpha={config['alpha']:g}, decay={np.mean(config['decay']):.2f}"
+
+
+def _cv_chunk(g, start, stop, alpha, positive):
+    a = worker_arrays
+    tramo = slice(start, stop)
+    train, holdout = a['train'][tramo], a['holdout'][tramo]
+    # Medios, controles y ventas de cada pliegue con sus propias escalas: (F, T, ·)
+    media_t = hill(a['adstock'][g] / a['media_scale'][tramo, None, :], a['half_sat'][g], a['slope'][g])
+    ctrl_s = (a['controls'] - a['control_mean'][tramo, None, :]) / a['control_std'][tramo, None, :]
+    y_scale = a['y_scale'][tramo, None]
+    coef, intercept, _ = solve_batch(media_t, ctrl_s, a['y'] / y_scale, alpha, positive, weights=train)
+    # Predicción de cada pliegue sobre toda la serie; el error solo cuenta en su validación
+    z = np.concatenate([media_t, ctrl_s], axis=-1)
+    prediccion = (np.einsum('ftp,fp->ft', z, coef) + intercept[:, None]) * y_scale
+    error = (prediccion - a['y']) * holdout
+    n = holdout.sum(axis=1)
+    rmse = np.sqrt((error ** 2).sum(axis=1) / n)
+    mape = (np.abs(error) / np.abs(np.where(a['y'] != 0, a['y'], np.nan))).sum(axis=1) / n
+    return g, start, rmse, mape
+
+
+def cross_validate(data, configs, min_train=104, horizon=HORIZON, step=4, window=None,
+                   positive=True, controls=CONTROLES, channels=CANALES, max_lag=MAX_LAG,
+                   workers=None, chunk_size=None, progress=None):
+    """Error de validación de cada configuración en cada pliegue.
+
+    `configs` es una lista de dicts con decay, half_sat y slope (por canal) y alpha, y
+    opcionalmente label. Devuelve un DataFrame con una fila por (configuración, pliegue):
+    config, label, fold, origin (primera semana de validación), train_weeks, rmse (en
+    unidades de ventas) y mape. `progress(fracción)` se llama al terminar cada tarea.
+    Sin `chunk_size`, cada tarea toma hasta CHUNK_SIZE pliegues, menos si sus matrices
+    (pliegues × semanas × columnas) no caben en model.MAX_DESIGN_BYTES.
+    """
+    media, ctrl, y = design_arrays(data, controls, channels)
+    origenes, train, holdout = fold_weights(len(y), min_train, horizon, step, window)
+    if not len(origenes):
+        raise ValueError('No hay semanas suficientes para ningún pliegue con ese entrenamiento mínimo')
+    escalas, medias, desviaciones, y_escala = _fold_scales(
+        media, ctrl, y, _train_starts(origenes, window), origenes)
+
+    # Adstock (sin escalar) una vez por configuración, compartido por todos sus pliegues
+    adstock = np.stack([geometric_adstock(media, np.asarray(c['decay'], dtype=float), max_lag)
+                        for c in configs])
+    half_sat = np.stack([np.asarray(c['half_sat'], dtype=float) for c in configs])
+    slope = np.stack([np.asarray(c['slope'], dtype=float) for c in configs])
+
+    n_pliegues = len(origenes)
+    if chunk_size is None:
+        # Cada pliegue tiene además sus propios medios y controles escalados (ver _cv_chunk)
+        chunk_size = batch_size(len(y), media.shape[1] + ctrl.shape[1], copies=6, limit=CHUNK_SIZE)
+    rmse = np.empty((len(configs), n_pliegues))
+    mape = np.empty((len(configs), n_pliegues))
+    with share_arrays(adstock=adstock, half_sat=half_sat, slope=slope, controls=ctrl, y=y,
+                      media_scale=escalas, control_mean=medias, control_std=desviaciones,
+                      y_scale=y_escala, train=train, holdout=holdout) as specs:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                                   initializer=init_worker, initargs=(specs,))
+        try:
+            futures = [pool.submit(_cv_chunk, g, start, min(start + chunk_size, n_pliegues),
+                                   float(c['alpha']), positive)
+                       for g, c in enumerate(configs)
+                       for start in range(0, n_pliegues, chunk_size)]
+            for hechas, future in enumerate(as_completed(futures), 1):
+                g, start, parcial_rmse, parcial_mape = future.result()
+                rmse[g, start:start + len(parcial_rmse)] = parcial_rmse
+                mape[g, start:start + len(parcial_mape)] = parcial_mape
+                if progress is not None:
+                    progress(hechas / len(futures))
+        finally:
+            # Error o cancelación desde `progress` (ver mmm.jobs): se descartan las tareas pendientes
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    fechas = data[FECHA].to_numpy()
+    semanas_train = train.sum(axis=1).astype(int)
+    return pd.DataFrame({
+        'config': np.repeat(np.arange(len(configs)), n_pliegues),
+        'label': np.repeat([config_label(c) for c in configs], n_pliegues),
+        'fold': np.tile(np.arange(n_pliegues), len(configs)),
+        'origin': np.tile(fechas[origenes], len(configs)),
+        'train_weeks': np.tile(semanas_train, len(configs)),
+        'rmse': rmse.ravel(),
+        'mape': mape.ravel(),
+    })
+
+
+def summarize(results):
+    """Error medio y dispersión entre pliegues por configuración, de mejor a peor RMSE."""
+    resumen = results.groupby(['config', 'label'])[['rmse', 'mape']].agg(['mean', 'std'])
+    resumen.columns = [f'{medida}_{estadistico}' for medida, estadistico in resumen.columns]
+    return resumen.reset_index(level='label').sort_values('rmse_mean')
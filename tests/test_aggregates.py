@@ -0,0 +1,28 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from mmm.aggregates import period_change
+
+
+def _totales():
+    # 2021 sin datos y un canal sin inversión en 2019
+    return pd.DataFrame({'a': [100.0, 150.0, 90.0], 'b': [0.0, 40.0, 60.0]},
+                        index=pd.Index([2019, 2020, 2022], name='year'))
+
+
+def test_period_change_with_zero_or_missing_base_years():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        cambio = period_change(_totales())
+        a_dos = period_change(_totales(), periods=2, zero_baseline=np.nan)
+    # El año que falta cuenta como cero: -100 % respecto al anterior y base cero para el siguiente
+    esperado = pd.DataFrame({'a': [0.0, 50.0, -100.0, 0.0], 'b': [0.0, 0.0, -100.0, 0.0]},
+                            index=pd.RangeIndex(2019, 2023, name='year'))
+    pd.testing.assert_frame_equal(cambio, esperado)
+
+    np.testing.assert_array_equal(a_dos.index, [2019, 2020, 2021, 2022])
+    assert a_dos.loc[[2019, 2020]].isna().all().all()
+    assert a_dos.loc[2021, 'a'] == -100.0 and a_dos.loc[2022, 'a'] == -40.0
+    assert a_dos.loc[2022, 'b'] == 50.0
@@ -0,0 +1,13 @@
+import numpy as np
+
+from mmm.benchmark import CHANNELS, SCALES, STAGES, run
+
+
+def test_smallest_grid_point_runs_every_stage():
+    informe = run(scales=SCALES[:1], channels=CHANNELS[:1], repeat=1, n_candidates=20, workers=1)
+    (caso,) = informe['cases']
+    assert (caso['scale'], caso['channels']) == (SCALES[0], CHANNELS[0])
+    etapas = {paso.split('.')[0] for paso in caso['seconds']}
+    assert etapas == set(STAGES)
+    assert all(np.isfinite(t) and t >= 0 for t in caso['seconds'].values())
+    assert 'simulation.sweep_1000' in caso['seconds'] and 'optimization.frontier_40' in caso['seconds']
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from mmm.downsample import downsample_line, downsample_stacked, lttb_indices
+
+
+def _serie(n=20_000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(size=n))
+    # Un pico y un valle aislados: un punto cada uno, lo primero que pierde un submuestreo ingenuo
+    y[7_321] += 500
+    y[15_002] -= 500
+    return pd.date_range('2018-01-01', periods=n, freq='h').to_numpy(), y
+
+
+def test_lttb_keeps_endpoints_and_extremes_within_the_budget():
+    x, y = _serie()
+    for n_out in (3, 50, 1000):
+        elegidos = lttb_indices(x, y, n_out)
+        assert len(elegidos) == n_out
+        assert elegidos[0] == 0 and elegidos[-1] == len(y) - 1
+        assert np.all(np.diff(elegidos) > 0)
+    elegidos = lttb_indices(x, y, 50)
+    assert {7_321, 15_002} <= set(elegidos)
+    assert y[elegidos].max() == y.max() and y[elegidos].min() == y.min()
+
+
+def test_short_series_are_returned_untouched():
+    x, y = np.arange(100), np.random.default_rng(2).normal(size=100)
+    rx, ry = downsample_line(x, y, n_out=100)
+    assert rx is x and ry is y
+    rx, ry = downsample_line(x, y, n_out=40)
+    assert len(rx) == len(ry) == 40 and rx[0] == x[0] and rx[-1] == x[-1]
+
+
+def test_stacked_buckets_preserve_totals():
+    rng = np.random.default_rng(1)
+    valores = rng.gamma(1.0, 100.0, (10_001, 4))
+    x = np.arange(len(valores))
+    rx, medias = downsample_stacked(x, valores, n_out=300)
+    assert medias.shape == (300, 4) and len(rx) == 300 and np.all(np.diff(rx) > 0)
+    # Cada tramo es la media de sus filas: media × filas del tramo recupera la suma de cada canal
+    cuenta = np.diff(np.linspace(0, len(x), 301).astype(int))
+    np.testing.assert_allclose((medias * cuenta[:, None]).sum(axis=0), valores.sum(axis=0), rtol=1e-12)
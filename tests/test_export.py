@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from mmm.aggregates import build_cube
+from mmm.columns import CANALES, FECHA, VENTAS
+from mmm.export import Target, _inputs, export, workbook_targets
+from mmm.schema import validate
+
+FUENTE = os.path.join(os.path.dirname(__file__), '..', 'bbdd_mmm_20240111.xlsx')
+
+
+@pytest.fixture(scope='module')
+def extracto():
+    return pd.read_excel(FUENTE).sort_values(FECHA, kind='stable', ignore_index=True)
+
+
+def test_same_named_workbooks_get_their_own_report_and_store(tmp_path, monkeypatch, extracto):
+    monkeypatch.chdir(tmp_path)
+    otra_marca = extracto.copy()
+    otra_marca[CANALES + [VENTAS]] *= 3
+    # Mismo nombre en dos carpetas y, en la primera, el extracto anterior del mismo dataset
+    datos = {os.path.join('a', 'bbdd_mmm_20240111.xlsx'): extracto,
+             os.path.join('b', 'bbdd_mmm_20240111.xlsx'): otra_marca,
+             os.path.join('a', 'bbdd_mmm_20240104.xlsx'): extracto.iloc[:-1]}
+    for path, data in datos.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data.to_excel(path, index=False)
+
+    targets = workbook_targets(list(datos))
+    assert [t.name for t in targets] == ['a-bbdd_mmm_20240111', 'b-bbdd_mmm_20240111',
+                                         'a-bbdd_mmm_20240104']
+    informe = export(targets, 'informes', workers=1)
+    assert set(informe) == {t.name for t in targets}
+    for target in targets:
+        assert len(informe[target.name]['exported']) == 8 and not informe[target.name]['failed']
+        assert os.path.exists(os.path.join('informes', target.name, 'export.json'))
+        # Cada informe se dibuja con su propio cubo, no con el del otro Excel del mismo nombre
+        cube, rows = _inputs(target)
+        esperado = build_cube(validate(datos[target.source]))
+        pd.testing.assert_frame_equal(cube[esperado.columns], esperado, check_dtype=False, rtol=1e-9)
+        assert len(rows) == len(datos[target.source])
+
+    # Sin cambios en los Excel, la siguiente exportación no vuelve a dibujar nada
+    informe = export(workbook_targets(list(datos)), 'informes', workers=1)
+    assert all(not r['exported'] and len(r['skipped']) == 8 for r in informe.values())
+
+
+def test_duplicate_report_names_are_rejected(tmp_path):
+    target = Target('bbdd_mmm', 'v1', FUENTE)
+    with pytest.raises(ValueError):
+        export([target, target], str(tmp_path))
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+from mmm.aggregates import build_cube
+from mmm.columns import FECHA
+from mmm.ingest import append_rows, dataset_lineage, load_dataset, read_cube
+from mmm.model import FittedModel, latest_model, save_model
+from mmm.schema import validate
+
+FUENTE = os.path.join(os.path.dirname(__file__), '..', 'bbdd_mmm_20240111.xlsx')
+
+
+@pytest.fixture(scope='module')
+def extracto():
+    return pd.read_excel(FUENTE).sort_values(FECHA, kind='stable', ignore_index=True)
+
+
+def _workbook(carpeta, data, fecha):
+    path = os.path.join(carpeta, f'bbdd_mmm_{fecha}.xlsx')
+    data.to_excel(path, index=False)
+    return path
+
+
+def test_columns_stay_read_only_after_append(tmp_path, extracto):
+    cache = str(tmp_path / 'cache')
+    path = _workbook(tmp_path, extracto.iloc[:-8], '20240101')
+    load_dataset(path, cache)
+    append_rows(extracto.iloc[-8:-4], path, cache)
+    append_rows(extracto.iloc[-4:], path, cache)
+    for columns in (None, [FECHA, 'negocio_ventas_presencial']):
+        data, _ = load_dataset(path, cache, columns=columns)
+        assert len(data) == len(extracto)
+        for columna in data.columns:
+            assert not data[columna].to_numpy().flags.writeable, columna
+
+
+def test_cube_after_appends_equals_rebuild(tmp_path, extracto):
+    cache = str(tmp_path / 'cache')
+    # Extractos sucesivos (ruta _delta) y filas sueltas (append_rows)
+    load_dataset(_workbook(tmp_path, extracto.iloc[:-20], '20240101'), cache)
+    path = _workbook(tmp_path, extracto.iloc[:-8], '20240105')
+    load_dataset(path, cache)
+    append_rows(extracto.iloc[-8:], path, cache)
+    reconstruido = build_cube(validate(extracto))
+    pd.testing.assert_frame_equal(read_cube(path, cache), reconstruido, check_exact=False, rtol=1e-12)
+
+
+def test_lineage_grows_with_new_weeks_and_resets_on_history_change(tmp_path, extracto):
+    cache = str(tmp_path / 'cache')
+    _, v1 = load_dataset(_workbook(tmp_path, extracto.iloc[:-8], '20240101'), cache)
+    path = _workbook(tmp_path, extracto, '20240108')
+    data, v2 = load_dataset(path, cache)
+    assert v2 != v1 and len(data) == len(extracto)
+    assert dataset_lineage(path, cache) == [v1, v2]
+    # Mismo extracto otra vez: ni versión nueva ni reingesta
+    assert load_dataset(path, cache)[1] == v2
+
+    corregido = extracto.copy()
+    corregido.loc[0, 'negocio_ventas_presencial'] += 1
+    _, v3 = load_dataset(_workbook(tmp_path, corregido, '20240115'), cache)
+    assert dataset_lineage(path, cache) == [v3]
+
+
+def test_stale_model_is_served_from_an_earlier_version(tmp_path, extracto):
+    cache = str(tmp_path / 'cache')
+    _, v1 = load_dataset(_workbook(tmp_path, extracto.iloc[:-8], '20240101'), cache)
+    path = _workbook(tmp_path, extracto, '20240108')
+    _, v2 = load_dataset(path, cache)
+    modelo = FittedModel(channels=[], controls=[], decay=None, half_sat=None, slope=None,
+                         media_scale=None, control_mean=None, control_std=None, y_scale=1.0,
+                         coef_media=None, coef_controls=None, intercept=0.0, alpha=1.0, r2=0.5,
+                         data_version=v1)
+    save_model(modelo, f'{v1}-abc', cache)
+    servido = latest_model(v2, cache, lineage=dataset_lineage(path, cache))
+    assert servido.stale and servido.data_version == v1 and servido.key == f'{v1}-abc'
+    assert latest_model(v2, cache) is None
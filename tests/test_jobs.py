@@ -0,0 +1,94 @@
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from mmm.jobs import PENDIENTES, JobQueue, job_key
+
+
+def _sumar(a, b, progress):
+    progress(0.5, partial=a)
+    return a + b
+
+
+def _lento(n, progress):
+    for i in range(n):
+        time.sleep(0.05)
+        progress(i / n)
+    return n
+
+
+def _fallar(progress):
+    raise RuntimeError('sin datos')
+
+
+def _esperar(cola, key, timeout=60):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        estado = cola.status(key)
+        if estado['state'] not in PENDIENTES:
+            return estado
+        time.sleep(0.05)
+    raise TimeoutError(key)
+
+
+@pytest.fixture
+def cola(tmp_path):
+    cola = JobQueue(cache_dir=str(tmp_path), workers=1)
+    yield cola
+    cola.shutdown()
+
+
+def test_job_key_depends_on_array_contents():
+    a = np.arange(5.0)
+    assert job_key('fit', x=a, alpha=1.0) == job_key('fit', alpha=1.0, x=a.copy())
+    assert job_key('fit', x=a, alpha=1.0) != job_key('fit', x=a + 1, alpha=1.0)
+    assert job_key('fit', x=a) != job_key('roi', x=a)
+
+
+def test_identical_requests_share_one_result(cola):
+    key = cola.submit('suma', _sumar, np.ones(3), 2.0, inputs={'a': np.ones(3), 'b': 2.0})
+    assert cola.submit('suma', _sumar, np.ones(3), 2.0, inputs={'a': np.ones(3), 'b': 2.0}) == key
+    assert _esperar(cola, key)['state'] == 'done'
+    np.testing.assert_array_equal(cola.result(key), np.full(3, 3.0))
+    np.testing.assert_array_equal(cola.partial(key), np.ones(3))
+    # Ya terminado: se reutiliza sin volver a encolarlo
+    assert cola.submit('suma', _sumar, np.ones(3), 2.0, inputs={'a': np.ones(3), 'b': 2.0}) == key
+    assert cola.status(key)['state'] == 'done'
+
+
+def test_cancel_and_failure_are_recorded_and_retry_reruns(cola):
+    key = cola.submit('lento', _lento, 200, inputs={'n': 200})
+    while cola.status(key)['state'] != 'running':
+        time.sleep(0.05)
+    cola.cancel(key)
+    assert _esperar(cola, key)['state'] == 'cancelled'
+    assert cola.result(key) is None
+
+    fallido = cola.submit('fallo', _fallar, inputs={})
+    estado = _esperar(cola, fallido)
+    assert estado['state'] == 'failed' and 'sin datos' in estado['error']
+
+    assert cola.submit('lento', _lento, 2, inputs={'n': 200}) == key  # sin retry no se relanza
+    assert cola.status(key)['state'] == 'cancelled'
+    cola.submit('lento', _lento, 2, inputs={'n': 200}, retry=True)
+    assert _esperar(cola, key)['state'] == 'done' and cola.result(key) == 2
+
+
+def test_prune_removes_expired_and_excess_jobs(tmp_path):
+    cola = JobQueue(cache_dir=str(tmp_path), max_age=3600, max_jobs=2)
+    ahora = time.time()
+    for nombre, estado, cuando in [('viejo', 'done', ahora - 7200), ('a', 'done', ahora - 30),
+                                   ('b', 'failed', ahora - 20), ('c', 'cancelled', ahora - 10),
+                                   ('otro_proceso', 'running', ahora - 60)]:
+        carpeta = os.path.join(cola.root, nombre)
+        os.makedirs(carpeta)
+        with open(os.path.join(carpeta, 'status.json'), 'w') as f:
+            registro = {'state': estado, 'submitted': cuando - 1}
+            if estado not in PENDIENTES:
+                registro['finished'] = cuando
+            json.dump(registro, f)
+    assert sorted(cola.prune()) == ['a', 'viejo']
+    assert sorted(os.listdir(cola.root)) == ['b', 'c', 'otro_proceso']
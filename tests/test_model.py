@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from mmm.model import batch_size, fit_arrays, solve_batch
+from mmm.transforms import geometric_adstock, hill, scale_media
+
+
+def _problema(seed=0, n_lote=4, n_semanas=80, n_canales=4, n_controles=2):
+    rng = np.random.default_rng(seed)
+    media = rng.uniform(0, 1, (n_lote, n_semanas, n_canales))
+    controles = rng.normal(size=(n_semanas, n_controles))
+    # Un canal con efecto negativo: la restricción tiene que activarse
+    beta = np.array([1.0, 0.5, -0.8, 0.0])[:n_canales]
+    y = media[0] @ beta + controles @ np.array([0.3, -0.2]) + 2 + rng.normal(0, 0.05, n_semanas)
+    return media, controles, y
+
+
+def _gradiente(media, controles, y, coef, intercept, alpha, pesos=None):
+    # Gradiente de Σ w (y - ŷ)² / 2 + alpha |b|² / 2 respecto a los coeficientes
+    z = np.concatenate([media, controles], axis=-1)
+    pesos = np.ones(len(y)) if pesos is None else pesos
+    residuo = y - z @ coef - intercept
+    return -(z * pesos[:, None]).T @ residuo + alpha * coef
+
+
+def test_nonneg_solution_satisfies_kkt():
+    media, controles, y = _problema()
+    coef, intercept, _ = solve_batch(media, controles, y, alpha=0.5, positive=True)
+    n_canales = media.shape[-1]
+    for g in range(len(media)):
+        grad = _gradiente(media[g], controles, y, coef[g], intercept[g], 0.5)
+        assert np.all(coef[g, :n_canales] >= 0)
+        activos = coef[g] > 1e-8
+        activos[n_canales:] = True  # los controles no tienen restricción
+        np.testing.assert_allclose(grad[activos], 0, atol=1e-5)
+        # En la cota, el gradiente solo puede empujar hacia valores negativos
+        assert np.all(grad[:n_canales][~activos[:n_canales]] >= -1e-5)
+    assert coef[0, 2] == 0.0
+
+
+def test_unconstrained_matches_ridge_closed_form():
+    media, controles, y = _problema()
+    coef, intercept, sse = solve_batch(media[:1], controles, y, alpha=0.5, positive=False)
+    z = np.concatenate([media[0], controles], axis=-1)
+    zc, yc = z - z.mean(axis=0), y - y.mean()
+    esperado = np.linalg.solve(zc.T @ zc + 0.5 * np.eye(z.shape[1]), zc.T @ yc)
+    np.testing.assert_allclose(coef[0], esperado, rtol=1e-10)
+    residuo = y - z @ coef[0] - intercept[0]
+    assert sse[0] == pytest.approx((residuo ** 2).sum())
+
+
+def test_integer_weights_equal_repeated_weeks():
+    media, controles, y = _problema(n_lote=1)
+    pesos = np.random.default_rng(1).integers(0, 3, len(y)).astype(float)
+    coef, intercept, _ = solve_batch(media, controles, y, alpha=0.5, weights=pesos[None])
+    filas = np.repeat(np.arange(len(y)), pesos.astype(int))
+    coef_rep, intercept_rep, _ = solve_batch(media[:, filas], controles[filas], y[filas], alpha=0.5)
+    np.testing.assert_allclose(coef, coef_rep, atol=1e-7)
+    np.testing.assert_allclose(intercept, intercept_rep, atol=1e-7)
+
+
+def test_fitted_model_predicts_in_original_units():
+    rng = np.random.default_rng(2)
+    gasto = rng.uniform(0, 1000, (120, 2))
+    controles = rng.normal(size=(120, 2))
+    decay, half_sat, slope = np.array([0.3, 0.6]), np.array([0.5, 0.7]), np.array([1.2, 2.0])
+    medios = hill(geometric_adstock(scale_media(gasto)[0], decay), half_sat, slope)
+    ventas = 5000 + medios @ np.array([800.0, 400.0]) + controles @ np.array([50.0, 0.0])
+    modelo = fit_arrays(gasto, controles, ventas, decay, half_sat, slope, alpha=1e-8,
+                        controls=['a', 'b'], channels=['x', 'y'])
+    assert modelo.r2 == pytest.approx(1.0)
+    np.testing.assert_allclose(modelo.predict(gasto, controles), ventas, rtol=1e-6)
+
+
+def test_batch_size_keeps_each_task_within_the_memory_budget():
+    assert batch_size(100, 10, max_bytes=1 << 30) == 500
+    tamaño = batch_size(10_000, 110, max_bytes=256 << 20)
+    assert tamaño == 7 and tamaño * 10_000 * 110 * 8 * 4 <= 256 << 20
+    assert batch_size(10 ** 7, 110) == 1
+    assert batch_size(100, 10, limit=8) == 8
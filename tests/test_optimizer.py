@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from mmm.optimizer import ResponseCurves, allocate, efficient_frontier
+
+
+def _curves(seed=0):
+    rng = np.random.default_rng(seed)
+    return ResponseCurves(basis=rng.uniform(0.5, 1.5, (52, 3)) / 1000,
+                          beta=np.array([3000.0, 2000.0, 1000.0]),
+                          half_sat=np.array([0.5, 0.8, 0.3]),
+                          slope=np.array([1.5, 2.0, 0.8]),
+                          reference=np.array([1000.0, 2000.0, 500.0]))
+
+
+def test_allocate_spends_budget_within_bounds_and_equalizes_marginal_sales():
+    curves = _curves()
+    lower, upper = np.array([100.0, 0.0, 0.0]), np.array([np.inf, np.inf, 400.0])
+    x = allocate(curves, 3500.0, lower, upper, tol=1e-8, max_iter=5000)
+    assert x.sum() == pytest.approx(3500.0)
+    assert np.all(x >= lower - 1e-9) and np.all(x <= upper + 1e-9)
+    # En el óptimo, los canales que no tocan sus cotas tienen el mismo ROI marginal
+    libres = (x > lower + 1e-6) & (x < upper - 1e-6)
+    marginal = curves.gradient(x)[libres]
+    assert libres.sum() >= 2
+    assert marginal.max() == pytest.approx(marginal.min(), rel=1e-3)
+    # y ningún reparto cercano que respete las restricciones vende más
+    for i, j in [(0, 1), (1, 0), (0, 2), (2, 1)]:
+        otro = x.copy()
+        otro[i] -= 10.0
+        otro[j] += 10.0
+        if np.all(otro >= lower) and np.all(otro <= upper):
+            assert curves.response(otro).sum() <= curves.response(x).sum() + 1e-6
+
+
+def test_allocate_batch_matches_single_budgets():
+    curves = _curves()
+    presupuestos = np.array([1500.0, 3500.0, 6000.0])
+    lote = allocate(curves, presupuestos)
+    for presupuesto, fila in zip(presupuestos, lote):
+        individual = allocate(curves, presupuesto)
+        assert curves.response(fila).sum() == pytest.approx(curves.response(individual).sum(), rel=1e-6)
+
+
+def test_roi_objective_spends_at_most_the_budget():
+    curves = _curves()
+    x = allocate(curves, 6000.0, objective='roi')
+    assert x.sum() <= 6000.0 + 1e-6
+    roi = curves.response(x).sum() / x.sum()
+    todo = allocate(curves, 6000.0)
+    assert roi >= curves.response(todo).sum() / todo.sum() - 1e-9
+
+
+def test_allocate_rejects_incompatible_bounds():
+    with pytest.raises(ValueError):
+        allocate(_curves(), 1000.0, lower=np.array([600.0, 600.0, 0.0]))
+
+
+def test_frontier_in_chunks_matches_one_batch():
+    curves = _curves()
+    presupuestos = np.linspace(500.0, 6000.0, 11)
+    _, ventas = efficient_frontier(curves, presupuestos)
+    avances = []
+    _, por_lotes = efficient_frontier(curves, presupuestos, progress=avances.append, chunk_size=4)
+    np.testing.assert_allclose(por_lotes, ventas, rtol=1e-6)
+    assert avances[-1] == 1.0
+    assert np.all(np.diff(ventas) > 0)
+
+
+def test_zero_budget_allocates_nothing_without_iterating():
+    curves = _curves()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        np.testing.assert_array_equal(allocate(curves, 0.0), np.zeros(3))
+        np.testing.assert_array_equal(allocate(curves, 0.0, objective='roi'), np.zeros(3))
+        # En un lote, la fila sin presupuesto queda a cero y el resto se resuelve igual
+        lote = allocate(curves, np.array([0.0, 3500.0]))
+    np.testing.assert_array_equal(lote[0], np.zeros(3))
+    assert lote[1].sum() == pytest.approx(3500.0)
+    individual = allocate(curves, 3500.0)
+    assert curves.response(lote[1]).sum() == pytest.approx(curves.response(individual).sum(), rel=1e-6)
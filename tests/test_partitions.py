@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+from mmm.aggregates import build_cube
+from mmm.columns import FECHA
+from mmm.ingest import load_dataset
+from mmm.partitions import SUMADAS, combined_cube, combined_rows, discover, select, write_partitions
+from mmm.schema import validate
+
+FUENTE = os.path.join(os.path.dirname(__file__), '..', 'bbdd_mmm_20240111.xlsx')
+
+
+@pytest.fixture(scope='module')
+def extracto():
+    return validate(pd.read_excel(FUENTE)).sort_values(FECHA, kind='stable', ignore_index=True)
+
+
+def _regiones(root, extracto):
+    # Dos regiones con los mismos controles; la segunda invierte y vende el doble
+    norte = extracto.copy()
+    norte[SUMADAS] = norte[SUMADAS] * 2
+    write_partitions(extracto, 'marca', 'sur', root)
+    write_partitions(norte, 'marca', 'norte', root)
+    return norte
+
+
+def test_one_region_reads_back_the_single_file_load(tmp_path, extracto):
+    root = str(tmp_path / 'particiones')
+    _regiones(root, extracto)
+    path = tmp_path / 'bbdd_mmm_20240111.xlsx'
+    extracto.to_excel(path, index=False)
+    esperado, _ = load_dataset(str(path), str(tmp_path / 'cache'))
+    filas = combined_rows(select(discover(root), ['marca'], ['sur']))
+    pd.testing.assert_frame_equal(filas, esperado[filas.columns], check_dtype=False, rtol=1e-6)
+
+
+def test_merged_regions_equal_a_single_file_of_both(tmp_path, extracto):
+    root = str(tmp_path / 'particiones')
+    norte = _regiones(root, extracto)
+    seleccion = select(discover(root), ['marca'], ['norte', 'sur'])
+
+    # Filas: medios y ventas sumados por semana, controles iguales en las dos regiones
+    sumado = extracto.copy()
+    sumado[SUMADAS] = extracto[SUMADAS] + norte[SUMADAS]
+    path = tmp_path / 'bbdd_mmm_20240111.xlsx'
+    sumado.to_excel(path, index=False)
+    esperado, _ = load_dataset(str(path), str(tmp_path / 'cache'))
+    filas = combined_rows(seleccion, workers=2)
+    pd.testing.assert_frame_equal(filas, esperado[filas.columns], check_dtype=False, rtol=1e-6)
+
+    # Cubo: sumas y recuentos del fichero con las filas de las dos regiones
+    esperado = build_cube(pd.concat([extracto, norte], ignore_index=True))
+    cubo = combined_cube(seleccion, workers=2)
+    pd.testing.assert_frame_equal(cubo[esperado.columns], esperado, check_dtype=False, rtol=1e-9)
@@ -0,0 +1,34 @@
+import tracemalloc
+
+import numpy as np
+
+from mmm.profiling import Profiler
+
+
+def test_disabled_profiler_does_not_stop_another_sessions_tracing():
+    midiendo = Profiler(enabled=True)
+    assert tracemalloc.is_tracing()
+    otra = Profiler(enabled=False)
+    with midiendo.span('asignacion'):
+        bloque = np.ones(1 << 20)
+    otra.close()
+    assert tracemalloc.is_tracing()
+    assert midiendo.spans[0]['peak_mb'] >= bloque.nbytes / 2 ** 20
+
+    segunda = Profiler(enabled=True)
+    midiendo.close()
+    assert tracemalloc.is_tracing()
+    segunda.close()
+    segunda.close()  # cerrar dos veces no descuenta dos veces
+    assert not tracemalloc.is_tracing()
+
+
+def test_counters_only_accumulate_when_enabled():
+    prof = Profiler(enabled=True, trace_memory=False)
+    prof.add('load_data_hits')
+    prof.add('load_data_hits')
+    prof.add('load_data_misses', 3)
+    assert prof.counters == {'load_data_hits': 2, 'load_data_misses': 3}
+    apagado = Profiler()
+    apagado.add('load_data_hits')
+    assert apagado.counters == {}
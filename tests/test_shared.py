@@ -0,0 +1,47 @@
+import importlib
+import sys
+import types
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mmm.shared import init_worker, pool_context, share_arrays, worker_arrays
+
+
+def _loaded(modulos):
+    return [nombre for nombre in modulos if nombre in sys.modules]
+
+
+def _worker_sum(nombre):
+    return float(worker_arrays[nombre].sum()), worker_arrays[nombre].flags.writeable
+
+
+def test_pool_workers_do_not_import_the_app_script(tmp_path, monkeypatch):
+    # Bajo `streamlit run` el __main__ es el script de la app; los workers no deben ejecutarlo
+    script = tmp_path / 'app.py'
+    script.write_text('import streamlit\n')
+    main = types.ModuleType('__main__')
+    main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, '__main__', main)
+    with ProcessPoolExecutor(max_workers=1, mp_context=pool_context()) as pool:
+        assert pool.submit(_loaded, ['streamlit', 'plotly']).result() == []
+    assert main.__file__ == str(script)
+
+
+def test_pool_tasks_defined_in_a_module_run_with_m_still_work(tmp_path, monkeypatch):
+    # `python -m mmm.export`: el __main__ se importa por nombre y sus tareas se deserializan
+    (tmp_path / 'tarea_main.py').write_text('def doble(x):\n    return 2 * x\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    main = importlib.import_module('tarea_main')
+    main.doble.__module__ = '__main__'
+    monkeypatch.setitem(sys.modules, '__main__', main)
+    with ProcessPoolExecutor(max_workers=1, mp_context=pool_context()) as pool:
+        assert pool.submit(main.doble, 21).result() == 42
+
+
+def test_workers_read_shared_arrays_read_only():
+    valores = np.arange(10.0)
+    with share_arrays(valores=valores) as specs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=pool_context(),
+                                 initializer=init_worker, initargs=(specs,)) as pool:
+            assert pool.submit(_worker_sum, 'valores').result() == (45.0, False)
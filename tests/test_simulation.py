@@ -0,0 +1,67 @@
+import numpy as np
+
+from mmm.model import MAX_DESIGN_BYTES, fit_arrays
+from mmm.optimizer import curve_table, response_curves
+from mmm.simulation import (CHUNK_SIZE, _chunk_size, build_scenarios, channel_response, simulate,
+                            simulate_plan, simulate_totals)
+
+
+def _modelo(seed=0, n_semanas=156):
+    rng = np.random.default_rng(seed)
+    gasto = rng.uniform(0, 1000, (n_semanas, 3)) * (rng.uniform(size=(n_semanas, 3)) > 0.3)
+    controles = rng.normal(size=(n_semanas, 2))
+    ventas = 20000 + gasto @ np.array([3.0, 1.5, 0.5]) + controles @ np.array([300.0, -100.0])
+    ventas = ventas + rng.normal(0, 200, n_semanas)
+    modelo = fit_arrays(gasto, controles, ventas, decay=np.array([0.3, 0.5, 0.1]),
+                        half_sat=np.array([0.4, 0.6, 0.8]), slope=np.array([1.0, 1.5, 2.0]),
+                        controls=['a', 'b'], channels=['x', 'y', 'z'])
+    return modelo, gasto, controles
+
+
+def test_table_answers_sliders_like_the_full_model():
+    modelo, gasto, controles = _modelo()
+    tabla = curve_table(response_curves(modelo, gasto))
+    rng = np.random.default_rng(1)
+    multiplicadores = rng.uniform(0, 3, (50, 3))
+    pausados = rng.uniform(size=(50, 3)) < 0.2
+    exactas, contribuciones = simulate_plan(modelo, gasto, controles, multipliers=multiplicadores,
+                                            paused=pausados)
+    ventas, interpoladas = simulate_totals(tabla, modelo.baseline(controls=controles).sum(),
+                                           multipliers=multiplicadores, paused=pausados)
+    np.testing.assert_allclose(interpoladas, contribuciones, rtol=1e-3, atol=1e-6 * exactas.mean())
+    np.testing.assert_allclose(ventas, exactas, rtol=1e-5)
+
+
+def test_channel_marginal_roi_matches_the_exact_gradient():
+    modelo, gasto, _ = _modelo()
+    curvas = response_curves(modelo, gasto)
+    tabla = curve_table(curvas)
+    multiplicadores = np.array([[0.5, 1.0, 2.5]])
+    _, marginal = channel_response(tabla, multiplicadores)
+    np.testing.assert_allclose(marginal, curvas.gradient(multiplicadores * curvas.reference), rtol=1e-2)
+    # Un canal en pausa no aporta ventas
+    contribuciones, _ = channel_response(tabla, paused=np.array([[True, False, False]]))
+    assert contribuciones[0, 0] == 0.0 and contribuciones[0, 1] > 0
+
+
+def test_chunks_fit_the_memory_budget_without_changing_results():
+    assert _chunk_size(156, 3) == CHUNK_SIZE
+    # 100× el extracto con 100 canales: el bloque de 1024 escenarios ocuparía ~17 GiB por array
+    bloque = _chunk_size(22_600, 100)
+    assert 1 <= bloque < CHUNK_SIZE and bloque * 22_600 * 100 * 8 * 5 <= MAX_DESIGN_BYTES
+
+    modelo, gasto, controles = _modelo()
+    multiplicadores = np.random.default_rng(2).uniform(0, 2, (20, 3))
+    desplazamientos = np.tile([0, 2, -1], (20, 1))
+    for totals in (True, False):
+        enteros = simulate_plan(modelo, gasto, controles, multiplicadores, desplazamientos, totals=totals)
+        troceados = simulate_plan(modelo, gasto, controles, multiplicadores, desplazamientos,
+                                  totals=totals, chunk_size=7)
+        for a, b in zip(enteros, troceados):
+            np.testing.assert_allclose(a, b, rtol=1e-12)
+    escenarios = build_scenarios(gasto, multiplicadores, desplazamientos)
+    for a, b in zip(simulate(modelo, escenarios, controles, totals=True),
+                    simulate(modelo, escenarios, controles, totals=True, chunk_size=7)):
+        np.testing.assert_allclose(a, b, rtol=1e-12)
+    curvas = response_curves(modelo, gasto)
+    np.testing.assert_allclose(curve_table(curvas).sales, curve_table(curvas, chunk_size=5).sales, rtol=1e-12)
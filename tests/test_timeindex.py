@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mmm.columns import FECHA
+from mmm.timeindex import build_time_index
+
+
+def test_date_slice_matches_boolean_mask():
+    fechas = pd.Series(pd.date_range('2019-01-07', periods=200, freq='W-MON'))
+    data = pd.DataFrame({FECHA: fechas, 'valor': np.arange(200)})
+    indice = build_time_index(data)
+    for inicio, fin in [('2019-03-01', '2020-06-30'), ('2019-01-07', '2019-01-07'),
+                        ('2018-01-01', '2030-01-01'), ('2021-01-01', '2020-01-01')]:
+        esperado = data[(fechas >= inicio) & (fechas <= fin)]
+        pd.testing.assert_frame_equal(data.iloc[indice.date_slice(inicio, fin)], esperado)
+
+
+def test_unsorted_dates_are_rejected():
+    data = pd.DataFrame({FECHA: pd.to_datetime(['2020-01-08', '2020-01-01'])})
+    with pytest.raises(ValueError):
+        build_time_index(data)
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from mmm.columns import VENTAS
+from mmm.model import fit_arrays, solve_batch, standardize
+from mmm.uncertainty import block_bootstrap_weights, refit_roi, roi_replicates, rolling_origin_weights
+
+
+def _datos(seed=0, n_semanas=120):
+    rng = np.random.default_rng(seed)
+    gasto = rng.uniform(0, 1000, (n_semanas, 3)) * (rng.uniform(size=(n_semanas, 3)) > 0.3)
+    controles = rng.normal(size=(n_semanas, 2))
+    ventas = 20000 + gasto @ np.array([3.0, 1.5, 0.5]) + controles @ np.array([300.0, -100.0])
+    ventas = ventas + rng.normal(0, 200, n_semanas)
+    modelo = fit_arrays(gasto, controles, ventas, decay=np.array([0.3, 0.5, 0.1]),
+                        half_sat=np.array([0.4, 0.6, 0.8]), slope=np.array([1.0, 1.5, 2.0]),
+                        controls=['a', 'b'], channels=['x', 'y', 'z'])
+    data = pd.DataFrame(np.column_stack([gasto, controles, ventas]),
+                        columns=['x', 'y', 'z', 'a', 'b', VENTAS])
+    return modelo, data
+
+
+def test_weights_are_reproducible_resamples():
+    pesos = block_bootstrap_weights(100, 20, block_length=8, seed=3)
+    np.testing.assert_array_equal(pesos, block_bootstrap_weights(100, 20, block_length=8, seed=3))
+    assert not np.array_equal(pesos, block_bootstrap_weights(100, 20, block_length=8, seed=4))
+    # Cada réplica remuestrea tantas semanas como el histórico
+    assert np.all(pesos.sum(axis=1) == 100) and np.all(pesos == np.round(pesos))
+
+    ventanas = rolling_origin_weights(100, min_train=60, step=10)
+    np.testing.assert_array_equal(ventanas.sum(axis=1), [60, 70, 80, 90, 100])
+    np.testing.assert_array_equal(ventanas, np.arange(100) < ventanas.sum(axis=1)[:, None])
+
+
+def test_refit_roi_matches_a_direct_refit_on_the_resampled_weeks():
+    modelo, data = _datos()
+    pesos = np.concatenate([block_bootstrap_weights(len(data), 4, seed=1),
+                            rolling_origin_weights(len(data), min_train=100, step=10)])
+    avances = []
+    roi = roi_replicates(modelo, data, pesos, workers=1, chunk_size=2,
+                         progress=lambda fraccion, _: avances.append(fraccion))
+    assert avances[-1] == 1.0 and not np.isnan(roi).any()
+
+    # Reajuste directo: las semanas repetidas tantas veces como indica su peso
+    gasto = data[['x', 'y', 'z']].to_numpy()
+    medios = modelo.transform(gasto)
+    controles, _, _ = standardize(data[['a', 'b']].to_numpy())
+    y = data[VENTAS].to_numpy() / modelo.y_scale
+    for fila, esperado in zip(pesos, roi):
+        semanas = np.repeat(np.arange(len(data)), fila.astype(int))
+        coef, _, _ = solve_batch(medios[None, semanas], controles[semanas], y[semanas], modelo.alpha)
+        directo = coef[0, :3] * medios.sum(axis=0) * modelo.y_scale / gasto.sum(axis=0)
+        np.testing.assert_allclose(esperado, directo, rtol=1e-6, atol=1e-9)
+
+    # El generador va rellenando las réplicas pendientes (NaN) tarea a tarea
+    hechas = [(n, np.isnan(parcial).any(axis=1).sum()) for n, _, parcial in
+              refit_roi(modelo, data, pesos[:3], workers=1, chunk_size=2)]
+    assert len(hechas) == 2 and hechas[-1] == (3, 0)
+    assert all(pendientes == 3 - n for n, pendientes in hechas)
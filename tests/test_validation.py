@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from mmm.columns import FECHA, VENTAS
+from mmm.model import fit_arrays
+from mmm.validation import cross_validate, fold_weights, summarize
+
+CANALES_TEST = ['tv', 'radio']
+CONTROLES_TEST = ['precio', 'festivo']
+
+
+def _datos(n_semanas=120, seed=0):
+    rng = np.random.default_rng(seed)
+    gasto = rng.uniform(0, 1000, (n_semanas, 2))
+    # La inversión y los controles crecen con el tiempo: las escalas de la serie completa
+    # difieren de las de cada ventana de entrenamiento
+    gasto *= np.linspace(0.5, 2.0, n_semanas)[:, None]
+    controles = np.column_stack([np.linspace(10, 20, n_semanas) + rng.normal(0, 1, n_semanas),
+                                 rng.uniform(size=n_semanas) < 0.1])
+    ventas = 5000 + gasto @ np.array([2.0, 1.0]) - 80 * controles[:, 0] + rng.normal(0, 150, n_semanas)
+    data = pd.DataFrame(np.column_stack([gasto, controles]), columns=CANALES_TEST + CONTROLES_TEST)
+    data[VENTAS] = ventas
+    data[FECHA] = pd.date_range('2020-01-06', periods=n_semanas, freq='W-MON')
+    return data
+
+
+CONFIG = dict(decay=np.array([0.4, 0.2]), half_sat=np.array([0.6, 0.9]), slope=np.array([1.2, 1.8]))
+
+
+def _cv(data, configs, **kwargs):
+    return cross_validate(data, configs, min_train=60, horizon=8, step=10, controls=CONTROLES_TEST,
+                          channels=CANALES_TEST, workers=1, **kwargs)
+
+
+def test_each_fold_equals_an_independent_fit_on_its_training_weeks():
+    data = _datos()
+    resultados = _cv(data, [dict(CONFIG, alpha=0.5)])
+    gasto, controles = data[CANALES_TEST].to_numpy(), data[CONTROLES_TEST].to_numpy()
+    ventas = data[VENTAS].to_numpy()
+    origenes, _, _ = fold_weights(len(data), 60, 8, 10)
+    assert len(resultados) == len(origenes) > 1
+    for origen, fila in zip(origenes, resultados.itertuples()):
+        modelo = fit_arrays(gasto[:origen], controles[:origen], ventas[:origen], alpha=0.5,
+                            controls=CONTROLES_TEST, channels=CANALES_TEST, **CONFIG)
+        prediccion = modelo.predict(gasto[:origen + 8], controles[:origen + 8])[origen:]
+        error = prediccion - ventas[origen:origen + 8]
+        assert fila.train_weeks == origen
+        assert fila.rmse == pytest.approx(np.sqrt((error ** 2).mean()), rel=1e-6)
+        assert fila.mape == pytest.approx(np.mean(np.abs(error) / ventas[origen:origen + 8]), rel=1e-6)
+
+
+def test_summary_ranks_configurations_by_error():
+    data = _datos()
+    configs = [dict(CONFIG, alpha=0.5, label='bueno'),
+               dict(decay=np.array([0.0, 0.0]), half_sat=np.array([5.0, 5.0]), slope=np.array([3.0, 3.0]),
+                    alpha=100.0, label='malo')]
+    resumen = summarize(_cv(data, configs))
+    assert list(resumen['label']) == ['bueno', 'malo']
+
+
+def test_not_enough_weeks_for_a_fold():
+    with pytest.raises(ValueError):
+        cross_validate(_datos(50), [dict(CONFIG, alpha=1.0)], min_train=60, controls=CONTROLES_TEST,
+                       channels=CANALES_TEST, workers=1)
+
+
+def test_results_do_not_depend_on_the_chunk_size():
+    data = _datos()
+    configs = [dict(CONFIG, alpha=alpha) for alpha in (0.1, 1.0)]
+    por_defecto = _cv(data, configs)
+    pd.testing.assert_frame_equal(_cv(data, configs, chunk_size=1), por_defecto)